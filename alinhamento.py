@@ -1,21 +1,31 @@
-import os, time, json, re, random
-import pandas as pd
-import gspread
-from gspread_dataframe import set_with_dataframe
-from google.oauth2.service_account import Credentials
-from google import genai
+from __future__ import annotations
+
+import os, time, json, re, random, hashlib, base64
+from array import array
+from datetime import date, datetime
 from string import Template
+from typing import TYPE_CHECKING
+
+import feed
+import perfil
+from texto import normalize_ws
+
+# pandas, gspread e google-genai são importados no primeiro uso, e a
+# autenticação (Sheets e Gemini) também só acontece quando é preciso: o módulo
+# fica importável sem credenciais, e um run sem nada para classificar não paga
+# o import do SDK do Gemini nem cria o client.
+if TYPE_CHECKING:
+    import pandas as pd
 
 GENAI_API_KEY = os.getenv("GENAI_API_KEY", "").strip()
-assert GENAI_API_KEY, "Defina o secret GENAI_API_KEY."
 MODEL_NAME = os.getenv("GENAI_MODEL", "gemini-2.5-flash").strip()
 
 SPREADSHEET_ID_CLIENTES = os.getenv("SPREADSHEET_ID_CLIENTES", "").strip()
-assert SPREADSHEET_ID_CLIENTES, "Defina o secret SPREADSHEET_ID_CLIENTES."
 
 CREDENTIALS_JSON = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "credentials.json")
 
 EMENTA_COL = os.getenv("ALIGN_COL_EMENTA", "Ementa")
+KW_COL = "Palavras Chave"
 OUT_ALINH_COL = os.getenv("ALIGN_COL_SAIDA1", "Alinhamento")
 OUT_JUST_COL  = os.getenv("ALIGN_COL_SAIDA2", "Justificativa")
 
@@ -138,17 +148,38 @@ $conteudo
 </conteudo>""".strip()
 )
 
-genai_client = genai.Client(api_key=GENAI_API_KEY)
-
 SCOPES = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive",
 ]
-creds = Credentials.from_service_account_file(CREDENTIALS_JSON, scopes=SCOPES)
-gc = gspread.authorize(creds)
-sh = gc.open_by_key(SPREADSHEET_ID_CLIENTES)
 
+_genai_client = None
+_sh = None
+
+def get_genai_client():
+    global _genai_client
+    if _genai_client is None:
+        assert GENAI_API_KEY, "Defina o secret GENAI_API_KEY."
+        from google import genai
+        _genai_client = genai.Client(api_key=GENAI_API_KEY)
+    return _genai_client
+
+def get_spreadsheet():
+    global _sh
+    if _sh is None:
+        assert SPREADSHEET_ID_CLIENTES, "Defina o secret SPREADSHEET_ID_CLIENTES."
+        import gspread
+        from google.oauth2.service_account import Credentials
+        creds = Credentials.from_service_account_file(CREDENTIALS_JSON, scopes=SCOPES)
+        gc = gspread.authorize(creds)
+        _sh = gc.open_by_key(SPREADSHEET_ID_CLIENTES)
+    return _sh
+
+@perfil.perfilado("sheets:ler aba")
 def read_sheet_df(ws, read_range: str = "") -> pd.DataFrame:
+    import gspread
+    import pandas as pd
+
     def _once():
         values = ws.get(read_range) if read_range else ws.get_all_values()
         if not values:
@@ -175,39 +206,474 @@ def build_content_from_ementa(ementa: str) -> str:
     e = str(ementa or "").strip()
     return f"Ementa: {e}" if e else ""
 
-def call_gemini(prompt_text: str) -> dict:
+def _json_da_saida(raw: str) -> dict | None:
+    """O objeto JSON do texto do modelo; None se não há um. JSON quebrado
+    levanta ValueError (vale nova tentativa)."""
+    m = re.search(r"\{.*\}", raw.strip(), flags=re.S)
+    if not m:
+        return None
+    data = json.loads(m.group(0))
+    if not isinstance(data, dict):
+        raise ValueError("JSON sem objeto")
+    return data
+
+_PEDIDOS = 0  # chamadas ao modelo neste processo (orçamento do ALIGN_PRIORIDADE)
+
+@perfil.perfilado("modelo:pedido")
+def _resposta_json(prompt_text: str, model: str = "") -> tuple[dict | None, str]:
+    """(JSON da resposta, "") ou (None, motivo): "sem_json" quando a saída veio
+    sem objeto JSON, "falha" quando as tentativas acabaram."""
+    global _PEDIDOS
+    model = model or MODEL_NAME
+    client = get_genai_client()  # fora do retry: sem chave, falha na hora
     delay = 1.0
     for _ in range(5):
+        config = {"response_mime_type": "application/json"}
+        contents, cache = _com_prefixo_em_cache(prompt_text, model)
+        if cache:
+            config["cached_content"] = cache
         try:
-            stream = genai_client.models.generate_content_stream(
-                model=MODEL_NAME,
-                contents=prompt_text,
-                config={"response_mime_type": "application/json"},
-            )
-            raw = "".join((chunk.text or "") for chunk in stream).strip()
-            m = re.search(r"\{.*\}", raw, flags=re.S)
-            if not m:
-                return {"alinhamento": "Parcial", "justificativa": "Saída sem JSON; revisar."}
-            data = json.loads(m.group(0))
-            alinh = str(data.get("alinhamento", "")).strip() or "Parcial"
-            just  = str(data.get("justificativa", "")).strip() or "Sem justificativa; revisar."
-            if alinh not in ("Alinha", "Parcial", "Não Alinha", "Não se aplica"):
-                alinh = "Parcial"
-            return {"alinhamento": alinh, "justificativa": just}
-        except Exception:
+            _PEDIDOS += 1
+            t0, partes, uso = time.perf_counter(), [], None
+            stream = client.models.generate_content_stream(model=model, contents=contents, config=config)
+            for chunk in stream:
+                partes.append(chunk.text or "")
+                uso = getattr(chunk, "usage_metadata", None) or uso
+            _registrar_uso(contents is not prompt_text, time.perf_counter() - t0, uso)
+            data = _json_da_saida("".join(partes))
+            return (data, "") if data is not None else (None, "sem_json")
+        except Exception as e:
+            if cache and _cache_sumiu(e):
+                _descartar_prefixo(prompt_text, model)  # expirou/sumiu: volta ao prompt inteiro
             time.sleep(delay + random.random() * 0.25)
             delay = min(delay * 2, 20)
-    return {"alinhamento": "Parcial", "justificativa": "Falha após tentativas; revisar."}
+    return None, "falha"
+
+# fim da justificativa das linhas que o modelo não classificou de verdade
+# (falha, saída sem JSON): ficam "Parcial" na aba, mas não servem de modelo
+_REVISAR = "; revisar."
+
+def _veredito(data: dict) -> dict:
+    """Normaliza um {"alinhamento", "justificativa"[, "confianca"]} do modelo."""
+    alinh = str(data.get("alinhamento", "")).strip()
+    just  = str(data.get("justificativa", "")).strip() or "Sem justificativa" + _REVISAR
+    valido = alinh in ("Alinha", "Parcial", "Não Alinha", "Não se aplica")
+    try:
+        conf = min(1.0, max(0.0, float(data["confianca"])))
+    except (KeyError, TypeError, ValueError):
+        conf = None
+    return {"alinhamento": alinh if valido else "Parcial", "justificativa": just,
+            "valido": valido, "confianca": conf}
+
+def call_gemini(prompt_text: str, model: str = "") -> dict:
+    """Classificação de um prompt. Além de alinhamento/justificativa devolve
+    "valido" (False quando a saída não trouxe JSON reconhecível ou as
+    tentativas acabaram) e "confianca" (0–1, se o modelo mandou)."""
+    data, erro = _resposta_json(prompt_text, model)
+    if data is None:
+        just = ("Saída sem JSON" if erro == "sem_json" else "Falha após tentativas") + _REVISAR
+        return {"alinhamento": "Parcial", "justificativa": just, "valido": False, "confianca": None}
+    return _veredito(data)
+
+# ---------------------- prefixo do prompt em cache ----------------------
+# Cada linha reenviava o prompt inteiro: instruções fixas mais o parágrafo do
+# cliente em CLIENTE_DESCRICOES, centenas de tokens iguais em toda linha da aba.
+# Com ALIGN_CACHE_PREFIXO=1, no começo de cada aba o trecho até "Conteúdo:" vira
+# um contexto em cache no provedor, um por (cliente, versão do prompt, modelo),
+# e cada linha manda só o bloco <conteudo> (e o que vier depois, como o pedido
+# de confiança da cascata). O cache vale ALIGN_CACHE_TTL_MIN, é renovado quando
+# uma aba posterior do mesmo cliente o reaproveita perto do fim e é apagado ao
+# fim do passo de alinhamento. Prefixo que o provedor recusa (curto demais para
+# cache, por exemplo) segue no prompt inteiro. "local" guarda o prefixo aqui
+# mesmo e manda o prompt inteiro, para testar sem o provedor. Tokens de entrada
+# e latência por linha, com e sem cache, saem no log.
+ALIGN_CACHE_PREFIXO = os.getenv("ALIGN_CACHE_PREFIXO", "0").strip().lower()
+ALIGN_CACHE_TTL_MIN = float(os.getenv("ALIGN_CACHE_TTL_MIN", "30"))
+
+_MARCA_CONTEUDO = "Conteúdo:\n<conteudo>"
+_PROMPT_VERSAO = hashlib.sha1(PROMPT.template.encode("utf-8")).hexdigest()[:8]
+# (modelo, sha1 do prefixo) -> {"nome", "prefixo", "expira"}; None = provedor recusou
+_PREFIXOS: dict[tuple[str, str], dict | None] = {}
+
+def _zerar_uso() -> dict:
+    return {c: {"linhas": 0, "tokens": 0, "do_cache": 0, "com_uso": 0, "t": 0.0} for c in ("com", "sem")}
+
+_USO = _zerar_uso()
+
+def _registrar_uso(com_cache: bool, dt: float, uso) -> None:
+    u = _USO["com" if com_cache else "sem"]
+    u["linhas"] += 1
+    u["t"] += dt
+    if uso is not None and getattr(uso, "prompt_token_count", None):
+        u["com_uso"] += 1
+        u["tokens"] += uso.prompt_token_count
+        u["do_cache"] += getattr(uso, "cached_content_token_count", None) or 0
+
+def _chave_prefixo(prefixo: str, model: str) -> tuple[str, str]:
+    return model, hashlib.sha1(prefixo.encode("utf-8")).hexdigest()
+
+@perfil.perfilado("modelo:cache do prefixo")
+def _preparar_prefixo(cliente: str, desc_cli: str) -> None:
+    """Cria (ou renova) o cache do prefixo deste cliente para os modelos do passo."""
+    if ALIGN_CACHE_PREFIXO in ("0", ""):
+        return
+    prefixo = PROMPT.template[:PROMPT.template.index(_MARCA_CONTEUDO)].replace(
+        "$cliente_descricao", desc_cli)
+    ttl = int(ALIGN_CACHE_TTL_MIN * 60)
+    for model in dict.fromkeys(m for m in (MODEL_NAME, ALIGN_CASCATA_MODELO) if m):
+        chave = _chave_prefixo(prefixo, model)
+        atual = _PREFIXOS.get(chave, {})
+        if atual is None or (atual and atual["expira"] - time.time() > ttl / 2):
+            continue
+        try:
+            if ALIGN_CACHE_PREFIXO == "local":
+                nome = ""
+            elif atual:
+                get_genai_client().caches.update(name=atual["nome"], config={"ttl": f"{ttl}s"})
+                nome = atual["nome"]
+            else:
+                from google.genai import types
+                nome = get_genai_client().caches.create(model=model, config=types.CreateCachedContentConfig(
+                    contents=[prefixo], ttl=f"{ttl}s",
+                    display_name=f"alinhamento-{cliente}-{_PROMPT_VERSAO}"[:128])).name
+            _PREFIXOS[chave] = {"nome": nome, "prefixo": prefixo, "expira": time.time() + ttl}
+        except Exception as e:
+            print(f"[{cliente}] prefixo sem cache em {model} ({type(e).__name__}: {e}); prompt inteiro.")
+            _PREFIXOS[chave] = None
+
+def _com_prefixo_em_cache(prompt_text: str, model: str) -> tuple[str, str]:
+    """(o que mandar como contents, nome do cache ou ""). Sem cache para o
+    prefixo deste prompt, devolve o próprio prompt_text."""
+    i = prompt_text.find(_MARCA_CONTEUDO)
+    if i < 0 or not _PREFIXOS:
+        return prompt_text, ""
+    entrada = _PREFIXOS.get(_chave_prefixo(prompt_text[:i], model))
+    if not entrada or entrada["expira"] <= time.time():
+        return prompt_text, ""
+    if not entrada["nome"]:  # local
+        return entrada["prefixo"] + prompt_text[i:], ""
+    return prompt_text[i:], entrada["nome"]
+
+def _descartar_prefixo(prompt_text: str, model: str) -> None:
+    i = prompt_text.find(_MARCA_CONTEUDO)
+    _PREFIXOS[_chave_prefixo(prompt_text[:i], model)] = None
+
+def _cache_sumiu(e: Exception) -> bool:
+    """Erro de um pedido com cached_content que aponta para o cache (apagado,
+    expirado, de outro projeto). 429, 5xx e erro de rede não: o cache segue
+    válido e a próxima tentativa o usa de novo."""
+    code = getattr(e, "code", None)
+    if code == 429 or (isinstance(code, int) and code >= 500):
+        return False
+    if code == 404:
+        return True
+    msg = str(e).lower()
+    return "cache" in msg and any(x in msg for x in ("expire", "not found", "not exist", "permission"))
+
+def _fechar_prefixos() -> None:
+    """Apaga os caches do passo e loga tokens/latência por linha."""
+    global _USO
+    for entrada in _PREFIXOS.values():
+        if entrada and entrada["nome"]:
+            try:
+                get_genai_client().caches.delete(name=entrada["nome"])
+            except Exception:
+                pass  # expira sozinho com o TTL
+    _PREFIXOS.clear()
+    partes = []
+    for rotulo, c in (("com prefixo em cache", "com"), ("prompt inteiro", "sem")):
+        u = _USO[c]
+        if u["linhas"]:
+            tokens = (f"{u['tokens'] / u['com_uso']:.0f} tokens de entrada/linha "
+                      f"({u['do_cache'] / u['com_uso']:.0f} do cache), " if u["com_uso"] else "")
+            partes.append(f"{rotulo}: {u['linhas']} chamadas, {tokens}{u['t'] / u['linhas']:.2f}s/linha")
+    if partes:
+        print(f"[uso] {'; '.join(partes)}.")
+    _USO = _zerar_uso()
+
+# ---------------------- cascata de modelos ----------------------
+# Toda linha ia para MODEL_NAME, fácil ou difícil. Com ALIGN_CASCATA_MODELO
+# (ex.: um modelo "lite") cada linha passa primeiro por ele, que também informa
+# a própria confiança; só sobe para MODEL_NAME o que voltar "Parcial", inválido
+# ou com confiança abaixo de ALIGN_CASCATA_CONFIANCA. Uma fração
+# ALIGN_CASCATA_AMOSTRA das linhas resolvidas no primeiro nível também vai ao
+# modelo forte (e fica com a resposta dele), para medir a concordância.
+# Contagens, latência média e concordância saem no log ao fim de cada passo.
+ALIGN_CASCATA_MODELO = os.getenv("ALIGN_CASCATA_MODELO", "").strip()
+ALIGN_CASCATA_CONFIANCA = float(os.getenv("ALIGN_CASCATA_CONFIANCA", "0.8"))
+ALIGN_CASCATA_AMOSTRA = float(os.getenv("ALIGN_CASCATA_AMOSTRA", "0.05"))
+
+_CONFIANCA_SUFIXO = """
+
+Inclua também no JSON o campo "confianca": número de 0 a 1 com a sua segurança na classe escolhida."""
+
+def _zerar_cascata() -> dict:
+    return {"rapido": 0, "resolvidas": 0, "escaladas": 0, "t_rapido": 0.0, "t_forte": 0.0,
+            "forte": 0, "amostra": 0, "concordam": 0, "motivos": {}}
+
+_CASCATA = _zerar_cascata()
+
+def _cascata(prompt_text: str) -> dict:
+    t0 = time.perf_counter()
+    r1 = call_gemini(prompt_text + _CONFIANCA_SUFIXO, ALIGN_CASCATA_MODELO)
+    _CASCATA["rapido"] += 1
+    _CASCATA["t_rapido"] += time.perf_counter() - t0
+
+    if not r1["valido"]:
+        motivo = "inválido"
+    elif r1["alinhamento"] == "Parcial":
+        motivo = "parcial"
+    elif r1["confianca"] is None or r1["confianca"] < ALIGN_CASCATA_CONFIANCA:
+        motivo = "confiança"
+    elif random.random() < ALIGN_CASCATA_AMOSTRA:
+        motivo = None  # amostra de concordância
+    else:
+        _CASCATA["resolvidas"] += 1
+        return r1
+
+    t0 = time.perf_counter()
+    r2 = call_gemini(prompt_text)
+    _CASCATA["forte"] += 1
+    _CASCATA["t_forte"] += time.perf_counter() - t0
+    if motivo:
+        _CASCATA["escaladas"] += 1
+        _CASCATA["motivos"][motivo] = _CASCATA["motivos"].get(motivo, 0) + 1
+    else:
+        _CASCATA["amostra"] += 1
+        if r2["alinhamento"] == r1["alinhamento"]:
+            _CASCATA["concordam"] += 1
+        else:
+            print(f"[cascata] amostra discorda: {r1['alinhamento']} → {r2['alinhamento']}.")
+    return r2
+
+def _log_cascata():
+    global _CASCATA
+    c = _CASCATA
+    if not c["rapido"]:
+        return
+    media = lambda t, n: f"{t / n:.2f}s" if n else "-"
+    motivos = ", ".join(f"{k}: {v}" for k, v in sorted(c["motivos"].items())) or "nenhum"
+    conc = f"{c['concordam']}/{c['amostra']}" if c["amostra"] else "sem amostra"
+    print(f"[cascata] {c['rapido']} linhas: {c['resolvidas']} resolvidas por {ALIGN_CASCATA_MODELO} "
+          f"(média {media(c['t_rapido'], c['rapido'])}), {c['escaladas']} escaladas para {MODEL_NAME} "
+          f"({motivos}), {c['forte']} chamadas ao forte (média {media(c['t_forte'], c['forte'])}); "
+          f"concordância na amostra: {conc}.")
+    _CASCATA = _zerar_cascata()
+
+def _conteudo_seguro(ementa: str) -> str:
+    # Sanitiza o conteúdo para não quebrar o delimitador XML do prompt.
+    return build_content_from_ementa(ementa).replace("</conteudo>", "</conteudo\u200b>")
 
 def classify_ementa(ementa: str, desc_cli: str) -> dict:
-    conteudo = build_content_from_ementa(ementa)
-    if not conteudo:
+    conteudo_safe = _conteudo_seguro(ementa)
+    if not conteudo_safe:
         return {"alinhamento": "Não se aplica", "justificativa": "Ementa ausente ou vazia; não há conteúdo classificável."}
-    # Sanitiza o conteúdo para não quebrar o delimitador XML do prompt.
-    conteudo_safe = conteudo.replace("</conteudo>", "</conteudo\u200b>")
     prompt_text = PROMPT.substitute(cliente_descricao=desc_cli, conteudo=conteudo_safe)
+    if ALIGN_CASCATA_MODELO:
+        return _cascata(prompt_text)
     return call_gemini(prompt_text)
 
+# ---------------------- ementas quase iguais ----------------------
+# Séries de "Requer informações ao Ministro...", PLs protocolados em massa com
+# o mesmo texto e apensados chegavam cada um ao modelo. Com ALIGN_SIMILARES=1,
+# cada ementa vira uma assinatura MinHash (trigramas de palavras normalizadas)
+# e, por LSH, é comparada com as já classificadas para o mesmo cliente: no
+# run e em runs anteriores (índice em ALIGN_SIMILARES_DIR, um arquivo por
+# cliente, com as ALIGN_SIMILARES_MAX mais recentes). Acima de
+# ALIGN_SIMILARES_LIMIAR (Jaccard estimado) e com as mesmas Palavras Chave a
+# classificação é copiada, com nota na Justificativa. As palavras-chave são a
+# trava: "ensino de matemática" e "ensino de música" diferem em uma palavra só
+# (~0,9 de similaridade) e não têm o mesmo alinhamento. Uma fração ALIGN_SIMILARES_AMOSTRA das cópias é
+# classificada mesmo assim (fica a resposta do modelo) e a concordância vai
+# para o log.
+ALIGN_SIMILARES = os.getenv("ALIGN_SIMILARES", "0").strip() in ("1","true","True","yes","on")
+ALIGN_SIMILARES_LIMIAR = float(os.getenv("ALIGN_SIMILARES_LIMIAR", "0.9"))
+ALIGN_SIMILARES_AMOSTRA = float(os.getenv("ALIGN_SIMILARES_AMOSTRA", "0.05"))
+ALIGN_SIMILARES_DIR = os.getenv("ALIGN_SIMILARES_DIR", ".cache/similares").strip()
+ALIGN_SIMILARES_MAX = int(os.getenv("ALIGN_SIMILARES_MAX", "3000"))
+
+_MH_PERMS, _MH_LINHAS = 64, 4  # 16 bandas de 4: candidatos a partir de ~0,5
+_MH_PRIMO = (1 << 61) - 1
+_mh_rng = random.Random(20240601)  # fixo: as assinaturas gravadas têm que bater
+_MH_COEF = [(_mh_rng.randrange(1, _MH_PRIMO), _mh_rng.randrange(_MH_PRIMO)) for _ in range(_MH_PERMS)]
+_NOTA_SIMILAR = "[Mesma classificação de"
+
+def _minhash(ementa: str) -> array:
+    toks = normalize_ws(ementa).split()
+    shingles = {" ".join(toks[i:i + 3]) for i in range(max(1, len(toks) - 2))}
+    hs = [int.from_bytes(hashlib.blake2b(x.encode(), digest_size=8).digest(), "big") for x in shingles]
+    return array("I", (min((a * h + b) % _MH_PRIMO for h in hs) & 0xFFFFFFFF for a, b in _MH_COEF))
+
+class _IndiceSimilares:
+    """Classificações de um cliente, indexadas por bandas da assinatura."""
+
+    def __init__(self, cliente: str):
+        self.path = os.path.join(ALIGN_SIMILARES_DIR, re.sub(r"[^\w-]+", "_", cliente) + ".json")
+        self.itens: list[list] = []  # [ref, alinhamento, justificativa, assinatura, palavras-chave]
+        self.bandas: dict[tuple, list[int]] = {}
+        self.reusadas = self.auditadas = self.concordam = 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for ref, alinh, just, b64, kw in json.load(f):
+                    self.adicionar(ref, alinh, just, array("I", base64.b64decode(b64)), kw)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Índice de similares {self.path} ilegível ({e}); começando vazio.")
+
+    def adicionar(self, ref: str, alinh: str, just: str, sig: array, kw: str) -> None:
+        i = len(self.itens)
+        self.itens.append([ref, alinh, just, sig, kw])
+        for b in range(0, _MH_PERMS, _MH_LINHAS):
+            self.bandas.setdefault((b, *sig[b:b + _MH_LINHAS]), []).append(i)
+
+    def buscar(self, sig: array, kw: str):
+        """(item, similaridade) do mais parecido acima do limiar e com as mesmas
+        palavras-chave, ou None."""
+        cands = {i for b in range(0, _MH_PERMS, _MH_LINHAS)
+                 for i in self.bandas.get((b, *sig[b:b + _MH_LINHAS]), ())
+                 if self.itens[i][4] == kw}
+        melhor = max(((sum(x == y for x, y in zip(sig, self.itens[i][3])) / _MH_PERMS, i)
+                      for i in cands), default=None)
+        if melhor and melhor[0] >= ALIGN_SIMILARES_LIMIAR:
+            return self.itens[melhor[1]], melhor[0]
+        return None
+
+    def salvar(self) -> None:
+        os.makedirs(ALIGN_SIMILARES_DIR, exist_ok=True)
+        dados = [[r, a, j, base64.b64encode(sig.tobytes()).decode(), kw]
+                 for r, a, j, sig, kw in self.itens[-ALIGN_SIMILARES_MAX:]]
+        with open(self.path + ".part", "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(self.path + ".part", self.path)
+
+    def log(self, title: str) -> None:
+        if self.reusadas or self.auditadas:
+            print(f"[{title}] similares: {self.reusadas} classificações copiadas; "
+                  f"auditoria {self.concordam}/{self.auditadas} concordam.")
+
+def _indice_similares(cliente: str) -> _IndiceSimilares | None:
+    return _IndiceSimilares(cliente) if ALIGN_SIMILARES else None
+
+def _classificar(ementa: str, desc_cli: str, indice: _IndiceSimilares | None = None,
+                 ref: str = "", kw: str = "") -> dict:
+    """classify_ementa, copiando a classificação de uma ementa quase igual
+    (e com as mesmas palavras-chave `kw`) quando há índice."""
+    if indice is None or not str(ementa).strip():
+        return classify_ementa(ementa, desc_cli)
+    sig = _minhash(ementa)
+    achado = indice.buscar(sig, kw)
+    if achado and random.random() >= ALIGN_SIMILARES_AMOSTRA:
+        (ref_orig, alinh, just, _, _), sim = achado
+        indice.reusadas += 1
+        return {"alinhamento": alinh,
+                "justificativa": f"{just} {_NOTA_SIMILAR} {ref_orig or 'ementa anterior'} "
+                                 f"(ementa {sim:.0%} similar).]"}
+    res = classify_ementa(ementa, desc_cli)
+    if achado:
+        indice.auditadas += 1
+        if achado[0][1] == res["alinhamento"]:
+            indice.concordam += 1
+        else:
+            print(f"[similares] auditoria discorda ({achado[0][0]} → {ref}): "
+                  f"{achado[0][1]} → {res['alinhamento']}.")
+    if res.get("valido", True):
+        indice.adicionar(ref, res["alinhamento"], res["justificativa"], sig, kw)
+    return res
+
+# ---------------------- uma chamada por ementa, vários clientes ----------------------
+# A mesma proposição cai em várias abas de cliente (uma por cliente cujas
+# palavras-chave bateram) e cada aba pedia a classificação à parte, reenviando
+# a mesma ementa. Com ALIGN_MULTICLIENTE=1 os pares (UID, cliente) pendentes de
+# todas as abas são juntados por UID antes de classificar; ementa que está em
+# mais de uma aba vai num pedido só, com as descrições apenas dos clientes
+# envolvidos, e volta com um veredito por cliente. Os vereditos ficam em
+# _PRE_CLASSIFICADAS até a aba de cada cliente ser escrita; cliente que faltar
+# ou vier inválido na resposta segue o caminho individual (cascata, similares).
+ALIGN_MULTICLIENTE = os.getenv("ALIGN_MULTICLIENTE", "0").strip() in ("1","true","True","yes","on")
+
+_REGRAS = PROMPT.template[PROMPT.template.index("Regras de evidência:"):
+                          PROMPT.template.index("Formato de saída:")]
+
+PROMPT_MULTI = Template(
+"""Você é analista de políticas públicas e faz triagem de atos do DOU, matérias legislativas e notícias para vários clientes.
+
+Clientes (identificador: missão/escopo):
+$clientes
+
+Tarefa:
+Classificar o alinhamento do **Conteúdo** com a missão de CADA cliente listado, separadamente. A decisão para um cliente não influencia a dos outros; "o cliente" nas regras abaixo é sempre aquele que está sendo classificado.
+
+""" + _REGRAS + """Formato de saída:
+Retorne **somente** JSON válido com uma chave por cliente, usando exatamente os identificadores listados acima:
+{
+  "<identificador>": {
+    "alinhamento": "Alinha" | "Parcial" | "Não Alinha" | "Não se aplica",
+    "justificativa": "1–3 frases citando elementos do Conteúdo (termos/trechos) que sustentam a decisão"
+  }
+}
+
+Conteúdo:
+<conteudo>
+$conteudo
+</conteudo>""".strip()
+)
+
+# (aba, UID) -> veredito já obtido no pedido conjunto
+_PRE_CLASSIFICADAS: dict[tuple[str, str], dict] = {}
+
+def classify_multi(ementa: str, clientes: list[str]) -> dict[str, dict]:
+    """{cliente: veredito} para os clientes (títulos de aba) que vieram válidos."""
+    conteudo_safe = _conteudo_seguro(ementa)
+    if not conteudo_safe:
+        return {}
+    blocos = "\n\n".join(f"- {c}: {CLIENTE_DESCRICOES.get(c, (c, ''))[1]}" for c in clientes)
+    data, _ = _resposta_json(PROMPT_MULTI.substitute(clientes=blocos, conteudo=conteudo_safe))
+    out = {}
+    for c in clientes:
+        v = (data or {}).get(c)
+        if isinstance(v, dict):
+            res = _veredito(v)
+            if res["valido"]:
+                out[c] = res
+    return out
+
+def _preclassificar(grupos: dict[str, tuple[str, list[str]]]) -> None:
+    """grupos: {UID: (ementa, [abas em que está pendente])}. Classifica de uma
+    vez as ementas pendentes em mais de uma aba e guarda em _PRE_CLASSIFICADAS."""
+    multi = {uid: g for uid, g in grupos.items() if len(set(g[1])) > 1}
+    if not multi:
+        return
+    pares = obtidos = 0
+    for uid, (ementa, abas) in multi.items():
+        if _prazo_do_run():
+            print("[multicliente] prazo do run; as ementas restantes ficam para o pedido individual.")
+            break
+        abas = sorted(set(abas))
+        pares += len(abas)
+        try:
+            res = classify_multi(ementa, abas)
+        except Exception as e:
+            print(f"[multicliente] {uid}: {type(e).__name__}: {e}; fica para o pedido individual.")
+            continue
+        for aba, r in res.items():
+            _PRE_CLASSIFICADAS[(aba, uid)] = r
+        obtidos += len(res)
+        if SLEEP_SEC:
+            time.sleep(SLEEP_SEC)
+    print(f"[multicliente] {len(multi)} ementas em mais de uma aba: {obtidos}/{pares} vereditos "
+          f"em {len(multi)} chamadas (seriam {pares}); {pares - obtidos} voltam ao pedido individual.")
+
+def _classificar_aba(aba: str, uid: str, ementa: str, desc_cli: str,
+                     indice: _IndiceSimilares | None = None, kw: str = "") -> dict:
+    """Veredito do pedido conjunto, se houver; senão o caminho individual."""
+    res = _PRE_CLASSIFICADAS.pop((aba, uid), None) if uid else None
+    if res is None:
+        return _classificar(ementa, desc_cli, indice, uid, kw)
+    if indice is not None and str(ementa).strip():
+        indice.adicionar(uid, res["alinhamento"], res["justificativa"], _minhash(ementa), kw)
+    return res
+
 def _range_start_row(read_range: str) -> int:
     if not read_range:
         return 1
@@ -239,19 +705,196 @@ def _delete_rows_in_chunks(ws, rows_1based, chunk_size=80):
         time.sleep(0.2)
     return deleted
 
-def process_sheet(ws):
+# ---------------------- lotes assíncronos (backlog grande) ----------------------
+# Aba de cliente nova ou mudança no prompt deixam milhares de linhas para
+# classificar, e mandá-las uma a uma pelo streaming é lento e esbarra na cota
+# por minuto que o run normal também usa. Com ALIGN_LOTE as linhas pendentes de
+# uma aba viram um arquivo JSONL (uma requisição por UID) enviado à interface
+# de lote do provedor; as linhas ficam fora da classificação normal até o lote
+# voltar. Cada run consulta os lotes abertos (registrados em ALIGN_LOTE_DIR,
+# que o workflow guarda entre runs), grava os prontos nas abas com um
+# batch_update por aba e esquece os que falharam ou expiraram; o que não veio
+# no resultado volta a ser pendente. ALIGN_LOTE: "0" desliga, "auto" manda
+# para lote só aba com ALIGN_LOTE_MIN ou mais pendentes, "1" manda todas.
+# ALIGN_LOTE_BACKEND=local roda o lote aqui mesmo (testes, sem o provedor).
+ALIGN_LOTE = os.getenv("ALIGN_LOTE", "0").strip().lower()
+ALIGN_LOTE_MIN = int(os.getenv("ALIGN_LOTE_MIN", "300"))
+ALIGN_LOTE_BACKEND = os.getenv("ALIGN_LOTE_BACKEND", "gemini").strip().lower()
+ALIGN_LOTE_DIR = os.getenv("ALIGN_LOTE_DIR", ".cache/lotes").strip()
+
+class _LoteGemini:
+    """Batch API do Gemini: JSONL enviado pela Files API, resultado em arquivo."""
+
+    def submeter(self, arquivo: str, nome: str) -> str:
+        from google.genai import types
+        client = get_genai_client()
+        up = client.files.upload(file=arquivo,
+                                 config=types.UploadFileConfig(display_name=nome, mime_type="jsonl"))
+        return client.batches.create(model=MODEL_NAME, src=up.name,
+                                     config={"display_name": nome}).name
+
+    def estado(self, nome: str) -> str:
+        st = get_genai_client().batches.get(name=nome).state.name
+        if st == "JOB_STATE_SUCCEEDED":
+            return "pronto"
+        if st in ("JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"):
+            return "falhou"
+        return "rodando"
+
+    def linhas(self, nome: str):
+        client = get_genai_client()
+        saida = client.files.download(file=client.batches.get(name=nome).dest.file_name)
+        return saida.decode("utf-8").splitlines()
+
+class _LoteLocal:
+    """Mesmo contrato, sem o provedor: o lote é processado (pelo streaming de
+    sempre) na primeira consulta, e a saída imita o arquivo do Gemini."""
+
+    def submeter(self, arquivo: str, nome: str) -> str:
+        return arquivo
+
+    def estado(self, nome: str) -> str:
+        if not os.path.exists(nome + ".saida"):
+            with open(nome, encoding="utf-8") as f, open(nome + ".saida", "w", encoding="utf-8") as out:
+                for linha in f:
+                    req = json.loads(linha)
+                    texto = req["request"]["contents"][0]["parts"][0]["text"]
+                    data, _ = _resposta_json(texto)
+                    resp = {"candidates": [{"content": {"parts": [{"text": json.dumps(data)}]}}]}
+                    out.write(json.dumps({"key": req["key"], "response": resp} if data is not None
+                                         else {"key": req["key"], "error": {"message": "sem JSON"}}) + "\n")
+        return "pronto"
+
+    def linhas(self, nome: str):
+        with open(nome + ".saida", encoding="utf-8") as f:
+            return f.read().splitlines()
+
+_LOTE_BACKENDS = {"gemini": _LoteGemini, "local": _LoteLocal}
+
+def _lotes_path() -> str:
+    return os.path.join(ALIGN_LOTE_DIR, "lotes.json")
+
+def _lotes_ler() -> list[dict]:
+    try:
+        with open(_lotes_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def _lotes_gravar(lotes: list[dict]) -> None:
+    os.makedirs(ALIGN_LOTE_DIR, exist_ok=True)
+    tmp = _lotes_path() + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(lotes, f, ensure_ascii=False)
+    os.replace(tmp, _lotes_path())
+
+def _vai_para_lote(pendentes: int) -> bool:
+    if ALIGN_LOTE == "auto":
+        return pendentes >= ALIGN_LOTE_MIN
+    return ALIGN_LOTE in ("1", "true", "yes", "on") and pendentes > 0
+
+def _em_lote(aba: str) -> set[str]:
+    """UIDs da aba que estão num lote ainda aberto."""
+    return {uid for lote in _lotes_ler() if lote["aba"] == aba for uid in lote["uids"]}
+
+@perfil.perfilado("lotes:submeter")
+def _lote_submeter(aba: str, desc_cli: str, linhas: list[tuple[str, str]]) -> None:
+    """Envia [(UID, ementa)] de uma aba como um lote e o registra."""
+    os.makedirs(ALIGN_LOTE_DIR, exist_ok=True)
+    nome = f"alinhamento-{re.sub(r'[^A-Za-z0-9]+', '_', aba)}-{time.strftime('%Y%m%d%H%M%S')}"
+    arquivo = os.path.join(ALIGN_LOTE_DIR, nome + ".jsonl")
+    with open(arquivo, "w", encoding="utf-8") as f:
+        for uid, ementa in linhas:
+            prompt_text = PROMPT.substitute(cliente_descricao=desc_cli, conteudo=_conteudo_seguro(ementa))
+            f.write(json.dumps({"key": uid, "request": {
+                "contents": [{"role": "user", "parts": [{"text": prompt_text}]}],
+                "generation_config": {"response_mime_type": "application/json"},
+            }}, ensure_ascii=False) + "\n")
+    backend = ALIGN_LOTE_BACKEND if ALIGN_LOTE_BACKEND in _LOTE_BACKENDS else "gemini"
+    job = _LOTE_BACKENDS[backend]().submeter(arquivo, nome)
+    _lotes_gravar(_lotes_ler() + [{"nome": job, "backend": backend, "aba": aba, "arquivo": arquivo,
+                                   "criado_em": time.time(), "uids": [u for u, _ in linhas]}])
+    print(f"[{aba}] {len(linhas)} linhas enviadas no lote {job}; resultado num dos próximos runs.")
+
+def _lote_veredito(linha: str) -> tuple[str, dict | None]:
+    """(UID, veredito válido ou None) de uma linha do arquivo de saída."""
+    item = json.loads(linha)
+    try:
+        partes = item["response"]["candidates"][0]["content"]["parts"]
+        data = _json_da_saida("".join(p.get("text", "") for p in partes))
+    except (KeyError, IndexError, TypeError, ValueError):
+        data = None
+    res = _veredito(data) if data is not None else None
+    return str(item.get("key", "")), res if res and res["valido"] else None
+
+@perfil.perfilado("lotes:aplicar")
+def aplicar_lotes() -> None:
+    """Consulta os lotes abertos e grava nas abas os que terminaram."""
+    lotes = _lotes_ler()
+    if not lotes:
+        return
+    from monitor_legislativo import _atualizar_celulas, _uids_nas_abas
+    abertos = []
+    for lote in lotes:
+        nome, aba = lote["nome"], lote["aba"]
+        try:
+            backend = _LOTE_BACKENDS[lote["backend"]]()
+            estado = backend.estado(nome)
+            if estado == "rodando":
+                horas = (time.time() - lote["criado_em"]) / 3600
+                print(f"[lote] {aba}: {nome} ainda em andamento ({horas:.1f} h).")
+                abertos.append(lote)
+                continue
+            if estado == "falhou":
+                print(f"::warning::[lote] {aba}: {nome} falhou ou expirou; as linhas voltam ao backlog.")
+                _pendencia_marcar(aba, len(lote["uids"]))
+            else:
+                valores = {}
+                for linha in backend.linhas(nome):
+                    if linha.strip():
+                        uid, res = _lote_veredito(linha)
+                        if res is not None:
+                            valores[uid] = {OUT_ALINH_COL: res["alinhamento"], OUT_JUST_COL: res["justificativa"]}
+                n = _atualizar_celulas(_uids_nas_abas(get_spreadsheet(), [aba]), valores,
+                                       evento="classificacao").get(aba, 0)
+                faltam = len(set(lote["uids"]) - set(valores))
+                print(f"[lote] {aba}: {n} linhas classificadas pelo lote {nome}; "
+                      f"{faltam} sem resultado voltam ao backlog.")
+                if faltam:
+                    _pendencia_marcar(aba, faltam)
+                elif DELETE_NAO_SE_APLICA:
+                    _ABAS_PENDENTES.add(aba)  # o process_sheet apaga os "Não se aplica"
+        except Exception as e:
+            # consulta falhou (rede, cota): tenta de novo no próximo run
+            print(f"[lote] {aba}: {nome} não consultado ({type(e).__name__}: {e}).")
+            abertos.append(lote)
+            continue
+        for arq in (lote["arquivo"], lote["arquivo"] + ".saida"):
+            if os.path.exists(arq):
+                os.remove(arq)
+    _lotes_gravar(abertos)
+
+def _abas_alinhaveis(worksheets) -> list:
+    """Todas as abas exceto a última (e 'Giro de notícias', que process_sheet pula)."""
+    return worksheets[:-1]
+
+def _preparar_aba(ws, df: pd.DataFrame | None = None):
+    """Lê a aba e separa o que classificar: (title, desc_cli, df, linhas
+    pendentes, índice de similares), ou None se não há o que fazer nela. O
+    que couber em lote (ALIGN_LOTE) é submetido aqui e sai das pendentes."""
     title = ws.title.strip()
     if title.lower() == "giro de notícias":
         print(f"⏭️ Pulando aba '{title}'.")
-        return
+        return None
 
     nome_cli, desc_cli = CLIENTE_DESCRICOES.get(title, (title, ""))
 
     print(f"\n▶️ Aba: {title} | Cliente: {nome_cli}")
-    df = read_sheet_df(ws, READ_RANGE)
+    if df is None:
+        df = read_sheet_df(ws, READ_RANGE)
     if df.empty:
         print(f"[{title}] vazia ou fora do range — pulando.")
-        return
+        return None
 
     df.columns = [c.strip() for c in df.columns]
 
@@ -262,33 +905,65 @@ def process_sheet(ws):
 
     if EMENTA_COL not in df.columns:
         print(f"[{title}] coluna '{EMENTA_COL}' não encontrada — pulando.")
-        return
+        return None
 
     to_process = [
         i for i in range(len(df))
         if not str(df.at[i, OUT_ALINH_COL]).strip() and str(df.at[i, EMENTA_COL]).strip()
     ]
 
+    if ALIGN_LOTE not in ("0", "") and "UID" in df.columns:
+        em_lote = _em_lote(title)
+        if em_lote:
+            to_process = [i for i in to_process if str(df.at[i, "UID"]).strip() not in em_lote]
+        com_uid = [i for i in to_process if str(df.at[i, "UID"]).strip()]
+        if _vai_para_lote(len(com_uid)):
+            _lote_submeter(title, desc_cli, [(str(df.at[i, "UID"]).strip(), df.at[i, EMENTA_COL])
+                                             for i in com_uid])
+            to_process = sorted(set(to_process) - set(com_uid))
+
     print(f"[{title}] linhas para classificar: {len(to_process)}")
-    if to_process:
-        for start in range(0, len(to_process), BATCH_SIZE):
-            batch_idx = to_process[start:start + BATCH_SIZE]
-            for i in batch_idx:
-                res = classify_ementa(df.at[i, EMENTA_COL], desc_cli)
-                df.at[i, OUT_ALINH_COL] = res["alinhamento"]
-                df.at[i, OUT_JUST_COL]  = res["justificativa"]
-                if SLEEP_SEC:
-                    time.sleep(SLEEP_SEC)
-
-            set_with_dataframe(
-                ws,
-                df.iloc[:max(batch_idx) + 1],
-                include_index=False,
-                include_column_header=True,
-                resize=False
-            )
-            print(f"[{title}] 💾 salvo linhas até {max(batch_idx) + 2}")
+    indice = _indice_similares(title) if to_process else None
+    if indice is not None:
+        # as já classificadas da própria aba também servem de referência
+        conhecidas = {it[0] for it in indice.itens}
+        for i in range(len(df)):
+            ref = str(df.at[i, "UID"]) if "UID" in df.columns else ""
+            alinh, just = str(df.at[i, OUT_ALINH_COL]).strip(), str(df.at[i, OUT_JUST_COL])
+            if (alinh and ref not in conhecidas and str(df.at[i, EMENTA_COL]).strip()
+                    and _NOTA_SIMILAR not in just and not just.endswith(_REVISAR)):
+                indice.adicionar(ref, alinh, just, _minhash(df.at[i, EMENTA_COL]),
+                                 str(df.at[i, KW_COL]) if KW_COL in df.columns else "")
+    return title, desc_cli, df, to_process, indice
+
+def _classificar_linha(title: str, desc_cli: str, df: pd.DataFrame, i: int, indice) -> None:
+    ref = str(df.at[i, "UID"]) if "UID" in df.columns else ""
+    kw = str(df.at[i, KW_COL]) if KW_COL in df.columns else ""
+    res = _classificar_aba(title, ref, df.at[i, EMENTA_COL], desc_cli, indice, kw)
+    df.at[i, OUT_ALINH_COL] = res["alinhamento"]
+    df.at[i, OUT_JUST_COL]  = res["justificativa"]
+    if SLEEP_SEC:
+        time.sleep(SLEEP_SEC)
 
+@perfil.perfilado("sheets:salvar")
+def _salvar_linhas(ws, title: str, df: pd.DataFrame, batch_idx: list[int]) -> None:
+    from gspread_dataframe import set_with_dataframe
+    set_with_dataframe(
+        ws,
+        df.iloc[:max(batch_idx) + 1],
+        include_index=False,
+        include_column_header=True,
+        resize=False
+    )
+    print(f"[{title}] 💾 salvo linhas até {max(batch_idx) + 2}")
+    if "UID" in df.columns:
+        feed.publicar("classificacao", title, {
+            str(df.at[i, "UID"]).strip(): {OUT_ALINH_COL: str(df.at[i, OUT_ALINH_COL]),
+                                           OUT_JUST_COL: str(df.at[i, OUT_JUST_COL])}
+            for i in batch_idx if str(df.at[i, "UID"]).strip()})
+
+@perfil.perfilado("sheets:remover")
+def _remover_nao_se_aplica(ws, title: str, df: pd.DataFrame) -> None:
     if not DELETE_NAO_SE_APLICA:
         return
 
@@ -309,17 +984,396 @@ def process_sheet(ws):
     sheet_rows_to_delete = [data_start_row + i for i in idx_to_drop]
     deleted = _delete_rows_in_chunks(ws, sheet_rows_to_delete, chunk_size=DELETE_CHUNK_SIZE)
     print(f"[{title}] ✅ removidas {deleted} linhas.")
+    if "UID" in df.columns:
+        feed.publicar("remocao", title, {str(df.at[i, "UID"]).strip(): {}
+                                          for i in idx_to_drop if str(df.at[i, "UID"]).strip()})
+
+def process_sheet(ws, df: pd.DataFrame | None = None) -> int:
+    """Classifica as pendentes da aba. Devolve quantas ficaram sem
+    classificação porque o prazo do run chegou (0 normalmente)."""
+    aba = _preparar_aba(ws, df)
+    if aba is None:
+        return 0
+    title, desc_cli, df, to_process, indice = aba
+    sobra = 0
+    if to_process:
+        _preparar_prefixo(title, desc_cli)
+        for start in range(0, len(to_process), BATCH_SIZE):
+            batch_idx = []
+            for i in to_process[start:start + BATCH_SIZE]:
+                if _prazo_do_run():
+                    break
+                _classificar_linha(title, desc_cli, df, i, indice)
+                batch_idx.append(i)
+            if batch_idx:
+                _salvar_linhas(ws, title, df, batch_idx)
+            if len(batch_idx) < len(to_process[start:start + BATCH_SIZE]):
+                sobra = len(to_process) - start - len(batch_idx)
+                print(f"::warning::[{title}] prazo do run: {sobra} linhas ficam para o próximo passo.")
+                break
+        if indice is not None:
+            indice.salvar()
+            indice.log(title)
+    _remover_nao_se_aplica(ws, title, df)
+    return sobra
+
+# ---------------------- fila global por prioridade ----------------------
+# process_sheet percorre as abas na ordem da planilha e as linhas de cima para
+# baixo: com backlog grande o passo gastava o tempo numa aba de pouco valor
+# enquanto linhas novas e cheias de palavras-chave de outras abas esperavam o
+# próximo ciclo. Com ALIGN_PRIORIDADE=1 as pendentes de todas as abas entram
+# numa fila só, da maior nota para a menor:
+#     peso do cliente × (1 + nº de palavras-chave, até 5) × 0,5^(idade / meia-vida)
+# com a idade em dias desde o mais novo de "Ingest At"/"Data Apresentação",
+# meia-vida ALIGN_PRIORIDADE_MEIA_VIDA_DIAS e pesos em ALIGN_PESOS
+# ("IU=2,FMCSV=1.5"; 1 para os demais). A fila para quando acaba
+# ALIGN_ORCAMENTO_MIN (minutos do passo), ALIGN_ORCAMENTO_PEDIDOS (chamadas
+# ao modelo) ou o prazo do run (PRAZO_RUN_MIN), conferidos entre uma linha e
+# outra (0 desliga cada orçamento). O que foi classificado é gravado, e as abas
+# com sobra ficam em "alinhamento:pendentes" no estado, relidas pelo próximo
+# processar_backlog mesmo sem linha nova nelas.
+ALIGN_PRIORIDADE = os.getenv("ALIGN_PRIORIDADE", "0").strip() in ("1","true","True","yes","on")
+ALIGN_PRIORIDADE_MEIA_VIDA_DIAS = float(os.getenv("ALIGN_PRIORIDADE_MEIA_VIDA_DIAS", "7"))
+ALIGN_PESOS = {c.strip(): float(p) for c, p in (par.split("=", 1) for par in
+               os.getenv("ALIGN_PESOS", "").split(",") if "=" in par)}
+ALIGN_ORCAMENTO_MIN = float(os.getenv("ALIGN_ORCAMENTO_MIN", "0"))
+ALIGN_ORCAMENTO_PEDIDOS = int(os.getenv("ALIGN_ORCAMENTO_PEDIDOS", "0"))
+
+def _idade_dias(valores, hoje: date) -> float:
+    datas = []
+    for v in valores:
+        try:
+            datas.append(datetime.strptime(str(v).strip()[:10], "%Y-%m-%d").date())
+        except ValueError:
+            pass
+    return max(0, (hoje - max(datas)).days) if datas else 365.0
+
+def _prioridade(df: pd.DataFrame, i: int, peso: float, hoje: date) -> float:
+    col = lambda c: df.at[i, c] if c in df.columns else ""
+    n_kw = sum(1 for k in str(col(KW_COL)).split(";") if k.strip())
+    idade = _idade_dias((col("Ingest At"), col("Data Apresentação")), hoje)
+    return peso * (1 + min(n_kw, 5)) * 0.5 ** (idade / ALIGN_PRIORIDADE_MEIA_VIDA_DIAS)
+
+def _orcamento_esgotado(inicio: float, pedidos0: int) -> str:
+    """O orçamento que acabou ("" enquanto houver)."""
+    if ALIGN_ORCAMENTO_MIN and time.monotonic() - inicio >= ALIGN_ORCAMENTO_MIN * 60:
+        return f"ALIGN_ORCAMENTO_MIN ({ALIGN_ORCAMENTO_MIN:g} min)"
+    if ALIGN_ORCAMENTO_PEDIDOS and _PEDIDOS - pedidos0 >= ALIGN_ORCAMENTO_PEDIDOS:
+        return f"ALIGN_ORCAMENTO_PEDIDOS ({ALIGN_ORCAMENTO_PEDIDOS})"
+    return "prazo do run" if _prazo_do_run() else ""
+
+def _prazo_do_run() -> bool:
+    """Perto do prazo do run (PRAZO_RUN_MIN): nenhuma chamada ao modelo começa.
+    Conferido entre uma linha e outra em todos os caminhos de classificação."""
+    from monitor_legislativo import _parar
+    return _parar()
+
+def _pendencias_ler() -> dict[str, int]:
+    from monitor_legislativo import _estado_ler
+    return _estado_ler("alinhamento:pendentes", {}) or {}
+
+def _pendencia_marcar(aba: str, n: int) -> None:
+    """Aba com `n` linhas deixadas sem classificação: vai para _ABAS_PENDENTES e
+    para o estado, e o próximo processar_backlog a relê mesmo que este
+    processo morra antes."""
+    from monitor_legislativo import _estado_gravar
+    _ABAS_PENDENTES.add(aba)
+    pend = _pendencias_ler()
+    pend[aba] = pend.get(aba, 0) + n
+    _estado_gravar("alinhamento:pendentes", pend)
+
+def _pendencias_gravar(consideradas, sobra: dict[str, int]) -> None:
+    """Abas `consideradas` neste passo saem do estado, menos as que têm `sobra`."""
+    from monitor_legislativo import _estado_gravar
+    antes = _pendencias_ler()
+    depois = {a: n for a, n in antes.items() if a not in consideradas}
+    depois.update(sobra)
+    if depois != antes:
+        _estado_gravar("alinhamento:pendentes", depois)
+
+def _processar_por_prioridade(abas) -> None:
+    inicio, pedidos0, hoje = time.monotonic(), _PEDIDOS, date.today()
+    preparadas, fila = {}, []
+    for ws in abas:
+        aba = _preparar_aba(ws)
+        if aba is None:
+            continue
+        title, desc_cli, df, to_process, indice = aba
+        preparadas[title] = (ws, desc_cli, df, indice)
+        peso = ALIGN_PESOS.get(title, 1.0)
+        fila += [(-_prioridade(df, i, peso, hoje), title, i) for i in to_process]
+    fila.sort()
+
+    # ALIGN_MULTICLIENTE: o pedido conjunto sai quando a primeira aba da ementa chega na vez
+    abas_do_uid: dict[str, list[str]] = {}
+    for _, title, i in fila:
+        df = preparadas[title][2]
+        uid = str(df.at[i, "UID"]).strip() if "UID" in df.columns else ""
+        if uid:
+            abas_do_uid.setdefault(uid, []).append(title)
+    conjuntos, com_prefixo, sujas = 0, set(), {}
+    motivo, restantes = "", []
+    for item in fila:
+        _, title, i = item
+        ws, desc_cli, df, indice = preparadas[title]
+        uid = str(df.at[i, "UID"]).strip() if "UID" in df.columns else ""
+        motivo = motivo or _orcamento_esgotado(inicio, pedidos0)
+        if motivo and (title, uid) not in _PRE_CLASSIFICADAS:
+            restantes.append(item)  # veredito do pedido conjunto já pago ainda entra
+            continue
+        if ALIGN_MULTICLIENTE and len(abas_do_uid.get(uid, ())) > 1:
+            try:
+                for aba, r in classify_multi(df.at[i, EMENTA_COL], sorted(set(abas_do_uid[uid]))).items():
+                    _PRE_CLASSIFICADAS[(aba, uid)] = r
+                conjuntos += 1
+            except Exception as e:
+                print(f"[multicliente] {uid}: {type(e).__name__}: {e}; fica para o pedido individual.")
+            abas_do_uid[uid] = [title]  # um pedido conjunto por ementa
+        if (title, uid) not in _PRE_CLASSIFICADAS and title not in com_prefixo:
+            _preparar_prefixo(title, desc_cli)
+            com_prefixo.add(title)
+        _classificar_linha(title, desc_cli, df, i, indice)
+        suja = sujas.setdefault(title, [])
+        suja.append(i)
+        if len(suja) >= BATCH_SIZE:
+            _salvar_linhas(ws, title, df, suja)
+            sujas[title] = []
+
+    for title, (ws, desc_cli, df, indice) in preparadas.items():
+        if sujas.get(title):
+            _salvar_linhas(ws, title, df, sujas[title])
+        if indice is not None:
+            indice.salvar()
+            indice.log(title)
+        _remover_nao_se_aplica(ws, title, df)
+
+    feitas = len(fila) - len(restantes)
+    sobra: dict[str, int] = {}
+    for _, title, _ in restantes:
+        sobra[title] = sobra.get(title, 0) + 1
+    # todas as abas consideradas, não só as preparadas: a vazia, a sem coluna de
+    # ementa e a que foi toda para lote também saem das pendentes
+    _pendencias_gravar({ws.title.strip() for ws in abas}, sobra)
+    if conjuntos:
+        print(f"[multicliente] {conjuntos} pedidos conjuntos na fila por prioridade.")
+    if motivo:
+        print(f"::warning::[prioridade] {motivo} esgotado: {feitas} de {len(fila)} linhas classificadas; "
+              f"ficam para o próximo passo: " + ", ".join(f"{a}={n}" for a, n in sorted(sobra.items())) + ".")
+    else:
+        print(f"[prioridade] {feitas} linhas classificadas em ordem de prioridade, "
+              f"{_PEDIDOS - pedidos0} chamadas ao modelo em {time.monotonic() - inicio:.0f}s.")
+
+# ---------------------- pipeline (coleta + alinhamento) ----------------------
+# No pipeline.py o coletor chama classificar_novos() para cada aba de cliente
+# antes do insert, e a classificação vai no mesmo insert das linhas. Abas em
+# que isso não deu (sem as colunas de saída, erro no meio) ficam em
+# _ABAS_PENDENTES e são as únicas relidas por processar_backlog(). Linha sem
+# classificação que não passou por aqui (já estava na planilha, ou ficou de um
+# run que morreu) só é achada lendo a aba: a cada PIPELINE_VARREDURA_HORAS
+# (e no primeiro run, sem "alinhamento:ultima_varredura" no estado) o passo
+# relê todas as abas, como o alinhamento.py avulso fazia em todo run.
+# PIPELINE_BACKLOG: "auto" (pendentes + varredura periódica), "1" (todas,
+# como o main) ou "0". PIPELINE_VARREDURA_HORAS=0 desliga a varredura.
+PIPELINE_BACKLOG = os.getenv("PIPELINE_BACKLOG", "auto").strip().lower()
+PIPELINE_VARREDURA_HORAS = float(os.getenv("PIPELINE_VARREDURA_HORAS", "24"))
+
+_ABAS_PENDENTES: set[str] = set()
+_titulos_alinhaveis: set[str] | None = None
+
+def _aba_alinhavel(title: str) -> bool:
+    global _titulos_alinhaveis
+    if _titulos_alinhaveis is None:
+        _titulos_alinhaveis = {ws.title.strip() for ws in _abas_alinhaveis(get_spreadsheet().worksheets())}
+    return title.strip() in _titulos_alinhaveis and title.strip().lower() != "giro de notícias"
+
+@perfil.perfilado("alinhamento:no insert")
+def classificar_novos(title: str, header: list[str], registros) -> tuple[dict, set]:
+    """Classifica as linhas novas de uma aba antes do insert.
+
+    Devolve ({uid: {coluna: valor}}, {uids que não devem ser inseridos}); o
+    segundo conjunto são os "Não se aplica", que o process_sheet apagaria
+    logo depois de inseridos (com DELETE_NAO_SE_APLICA).
+    """
+    valores, descartar = {}, set()
+    try:
+        if not _aba_alinhavel(title):
+            return valores, descartar
+        if OUT_ALINH_COL not in header or OUT_JUST_COL not in header:
+            print(f"[{title}] sem as colunas '{OUT_ALINH_COL}'/'{OUT_JUST_COL}'; fica para o backlog.")
+            _ABAS_PENDENTES.add(title)
+            return valores, descartar
+
+        _, desc_cli = CLIENTE_DESCRICOES.get(title, (title, ""))
+        indice = _indice_similares(title)
+        if registros:
+            _preparar_prefixo(title, desc_cli)
+        for k, p in enumerate(registros):
+            if _prazo_do_run():
+                resto = sum(1 for q in registros[k:] if str(q.ementa).strip())
+                print(f"::warning::[{title}] prazo do run: {resto} linhas novas entram sem "
+                      f"classificação e ficam para o próximo passo.")
+                if resto:
+                    _pendencia_marcar(title, resto)
+                break
+            if not str(p.ementa).strip():
+                continue  # igual ao process_sheet: sem ementa, não classifica
+            res = _classificar_aba(title, p.uid, p.ementa, desc_cli, indice, p.palavras_chave)
+            if DELETE_NAO_SE_APLICA and _is_nao_se_aplica(res["alinhamento"]):
+                descartar.add(p.uid)
+            else:
+                valores[p.uid] = {OUT_ALINH_COL: res["alinhamento"], OUT_JUST_COL: res["justificativa"]}
+            if SLEEP_SEC:
+                time.sleep(SLEEP_SEC)
+        if indice is not None:
+            indice.salvar()
+            indice.log(title)
+    except Exception as e:
+        # insere o que já tem; o resto entra sem classificação e vai pro backlog
+        print(f"[{title}] classificação no insert interrompida ({type(e).__name__}: {e}).")
+        _pendencia_marcar(title, len(registros) - len(valores) - len(descartar))
+    print(f"[{title}] {len(valores) + len(descartar)} linhas novas classificadas no insert.")
+    return valores, descartar
+
+@perfil.perfilado("alinhamento:pré-classificação")
+def preclassificar_novos(abas: dict[str, tuple[list[str], list]]) -> None:
+    """Chamado pelo insert antes de classificar_novos, com as linhas novas de
+    todas as abas de cliente ({aba: (cabeçalho, registros)})."""
+    if not ALIGN_MULTICLIENTE:
+        return
+    try:
+        grupos: dict[str, tuple[str, list[str]]] = {}
+        for title, (header, registros) in abas.items():
+            if (not _aba_alinhavel(title)
+                    or OUT_ALINH_COL not in header or OUT_JUST_COL not in header):
+                continue
+            for p in registros:
+                if str(p.ementa).strip():
+                    grupos.setdefault(p.uid, (p.ementa, []))[1].append(title)
+        _preclassificar(grupos)
+    except Exception as e:
+        # sem o pedido conjunto cada aba classifica sozinha, como antes
+        print(f"[multicliente] pré-classificação interrompida ({type(e).__name__}: {e}).")
+
+@perfil.perfilado("alinhamento:backlog")
+def _processar_abas(abas) -> None:
+    """process_sheet em cada aba; com ALIGN_MULTICLIENTE as abas são lidas
+    antes e as ementas pendentes em várias delas vão num pedido só. Com
+    ALIGN_PRIORIDADE, uma fila só para todas as abas."""
+    if ALIGN_PRIORIDADE:
+        _processar_por_prioridade(abas)
+        _PRE_CLASSIFICADAS.clear()
+        return
+    if not ALIGN_MULTICLIENTE:
+        _processar_em_ordem(abas, {})
+        return
+    dfs, grupos = {}, {}
+    for ws in abas:
+        title = ws.title.strip()
+        if title.lower() == "giro de notícias":
+            continue
+        df = dfs[title] = read_sheet_df(ws, READ_RANGE)
+        df.columns = [c.strip() for c in df.columns]
+        if df.empty or "UID" not in df.columns or EMENTA_COL not in df.columns:
+            continue
+        em_lote = _em_lote(title) if ALIGN_LOTE not in ("0", "") else set()
+        pendentes = []
+        for i in range(len(df)):
+            uid, ementa = str(df.at[i, "UID"]).strip(), df.at[i, EMENTA_COL]
+            alinh = df.at[i, OUT_ALINH_COL] if OUT_ALINH_COL in df.columns else ""
+            if uid and uid not in em_lote and not str(alinh).strip() and str(ementa).strip():
+                pendentes.append((uid, ementa))
+        if _vai_para_lote(len(pendentes)):
+            continue  # a aba inteira vai para lote no process_sheet
+        for uid, ementa in pendentes:
+            grupos.setdefault(uid, (ementa, []))[1].append(title)
+    try:
+        _preclassificar(grupos)
+    except Exception as e:
+        print(f"[multicliente] pré-classificação interrompida ({type(e).__name__}: {e}).")
+    _processar_em_ordem(abas, dfs)
+    _PRE_CLASSIFICADAS.clear()
+
+def _processar_em_ordem(abas, dfs: dict) -> None:
+    """process_sheet aba a aba; as que o prazo do run não deixou terminar (ou
+    começar) continuam em "alinhamento:pendentes"."""
+    antes, sobra = _pendencias_ler(), {}
+    for ws in abas:
+        title = ws.title.strip()
+        if _prazo_do_run():
+            sobra[title] = antes.get(title, 0)
+            continue
+        n = process_sheet(ws, dfs.get(title))
+        if n:
+            sobra[title] = n
+    if sobra:
+        print("::warning::[alinhamento] prazo do run: ficam para o próximo passo: "
+              + ", ".join(sorted(sobra)) + ".")
+    _pendencias_gravar({ws.title.strip() for ws in abas}, sobra)
+
+def _varredura_vencida() -> bool:
+    if PIPELINE_VARREDURA_HORAS <= 0:
+        return False
+    from monitor_legislativo import _estado_ler, now_br
+    ultima = _estado_ler("alinhamento:ultima_varredura")
+    try:
+        return (now_br() - datetime.fromisoformat(ultima)).total_seconds() >= PIPELINE_VARREDURA_HORAS * 3600
+    except (TypeError, ValueError):
+        return True  # nunca varreu (ou estado ilegível)
+
+def _fim_do_passo() -> None:
+    _log_cascata()
+    _fechar_prefixos()
+
+def processar_backlog():
+    """Passo de alinhamento do pipeline, depois da coleta.
+
+    No modo serviço (daemon.py) roda uma vez por ciclo: as abas pendentes só
+    saem da lista depois de processadas, e a lista de abas alinháveis é
+    refeita no ciclo seguinte (para pegar aba de cliente nova).
+    """
+    global _titulos_alinhaveis
+    _titulos_alinhaveis = None
+    if PIPELINE_BACKLOG in ("0", "false", "no", "off"):
+        _fim_do_passo()
+        return
+    if PIPELINE_BACKLOG != "auto":
+        main()
+        _ABAS_PENDENTES.clear()
+        return
+    aplicar_lotes()
+    _ABAS_PENDENTES.update(_pendencias_ler())  # sobra de um passo que parou pelo orçamento
+    varredura = _varredura_vencida()
+    if not _ABAS_PENDENTES and not varredura:
+        print("\n✅ Nada pendente para o alinhamento (linhas novas já classificadas no insert).")
+        _fim_do_passo()
+        return
+    alinhaveis = _abas_alinhaveis(get_spreadsheet().worksheets())
+    if varredura:
+        print(f"[alinhamento] varredura completa: {len(alinhaveis)} abas relidas "
+              f"(PIPELINE_VARREDURA_HORAS={PIPELINE_VARREDURA_HORAS:g}).")
+        _ABAS_PENDENTES.update(ws.title.strip() for ws in alinhaveis)
+    abas = [ws for ws in alinhaveis if ws.title.strip() in _ABAS_PENDENTES]
+    _pendencias_gravar(_ABAS_PENDENTES - {ws.title.strip() for ws in abas}, {})  # abas que sumiram
+    _processar_abas(abas)
+    if varredura:
+        # o que o orçamento deixou para trás já está em "alinhamento:pendentes"
+        from monitor_legislativo import _estado_gravar, now_br
+        _estado_gravar("alinhamento:ultima_varredura", now_br().isoformat())
+    print(f"\n✅ Backlog processado: {', '.join(sorted(_ABAS_PENDENTES))}.")
+    _ABAS_PENDENTES.clear()
+    _fim_do_passo()
 
 def main():
-    worksheets = sh.worksheets()
+    worksheets = get_spreadsheet().worksheets()
     if not worksheets:
         print("Planilha sem abas.")
         return
 
-    for ws in worksheets[:-1]:
-        process_sheet(ws)
+    aplicar_lotes()
+    _processar_abas(_abas_alinhaveis(worksheets))
 
     print("\n✅ Concluído (todas as abas exceto a última).")
+    _fim_do_passo()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,75 @@
+"""Mede o ganho do pool de processos (PROCESSOS) sobre um corpus gravado.
+
+Corpus: o arquivo Parquet (ARQUIVO_DIR, padrão) ou um CSV/Parquet com a coluna
+"Ementa"; --html aponta um diretório de páginas de matéria do Senado já
+baixadas (*.html) para medir o parse da autoria. Compara, no mesmo corpus, o
+caminho de um núcleo com o pool em blocos e confere que o resultado é igual.
+
+    python benchmark_processos.py [corpus] [--html DIR] [--processos N] [--repeticoes R]
+"""
+import argparse
+import glob
+import os
+import time
+
+import monitor_legislativo as ml
+
+
+def _ler_ementas(corpus: str) -> list[str]:
+    import pandas as pd
+    if os.path.isdir(corpus):
+        df = ml.ler_arquivo(corpus, colunas=["Ementa"])
+    elif corpus.endswith(".parquet"):
+        df = pd.read_parquet(corpus)
+    else:
+        df = pd.read_csv(corpus, dtype=str, keep_default_na=False)
+    col = "Ementa" if "Ementa" in df.columns else "ementa"
+    return [str(e) for e in df[col] if str(e).strip()]
+
+
+def _medir(nome: str, fn, itens: list, repeticoes: int):
+    melhor, saida = float("inf"), None
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        saida = fn(itens)
+        melhor = min(melhor, time.perf_counter() - t0)
+    print(f"  {nome:<28} {melhor:8.2f}s  ({len(itens) / melhor:,.0f} itens/s)")
+    return melhor, saida
+
+
+def _comparar(titulo: str, fn, itens: list, repeticoes: int) -> None:
+    print(f"\n{titulo}: {len(itens)} itens")
+    t1, r1 = _medir("1 processo", lambda xs: ml._rodar_lote(fn, xs), itens, repeticoes)
+    ml._pool_cpu()  # sobe os processos fora da medição (custo fixo, uma vez por run)
+    tn, rn = _medir(f"{ml.PROCESSOS} processos", lambda xs: ml._mapear_cpu(fn, xs), itens, repeticoes)
+    assert r1 == rn, "resultado do pool difere do de um núcleo"
+    print(f"  ganho: {t1 / tn:.1f}x")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("corpus", nargs="?", default=ml.ARQUIVO_DIR)
+    ap.add_argument("--html", help="diretório com páginas de matéria (*.html)")
+    ap.add_argument("--processos", type=int, default=ml.PROCESSOS)
+    ap.add_argument("--repeticoes", type=int, default=3)
+    args = ap.parse_args()
+    ml.PROCESSOS = max(2, args.processos)
+
+    ementas = _ler_ementas(args.corpus)
+    if not ementas:
+        raise SystemExit(f"Corpus vazio: {args.corpus}")
+    _comparar("Matcher (palavras-chave/clientes/temas)", ml._extract_kw_client_theme, ementas, args.repeticoes)
+
+    if args.html:
+        paginas = []
+        for arq in sorted(glob.glob(os.path.join(args.html, "*.html"))):
+            with open(arq, encoding="utf-8", errors="replace") as f:
+                paginas.append(f.read())
+        if paginas:
+            _comparar("Autoria na página da matéria (BeautifulSoup)", ml._autoria_da_pagina,
+                      paginas, args.repeticoes)
+    ml._fechar_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Mede o caminho registros → abas (Proposicao) contra o antigo, em DataFrame.
+
+Gera N proposições sintéticas, cada uma em alguns clientes de CLIENT_THEME, e
+insere na aba geral e nas abas de clientes de uma planilha falsa em memória
+(sem Sheets, sem rede). O caminho antigo (DataFrame de dicts,
+_normalize_columns, um sort_values e um _align_df_to_ws_header por aba) está
+reproduzido aqui, só para comparação. O script confere que as linhas gravadas
+em cada aba são iguais nos dois caminhos e mostra o tempo e o pico de memória
+(tracemalloc).
+
+    python benchmark_registros.py [--linhas N] [--clientes-por-linha K] [--repeticoes R]
+"""
+import argparse
+import contextlib
+import io
+import random
+import re
+import time
+import tracemalloc
+from dataclasses import asdict
+
+import pandas as pd
+
+import monitor_legislativo as ml
+
+
+class _Aba:
+    """O mínimo de gspread.Worksheet que o insert usa."""
+
+    def __init__(self, header: list[str]):
+        self.linhas = [header]
+
+    def row_values(self, i):
+        return self.linhas[i - 1]
+
+    def batch_get(self, ranges, **kw):
+        return [[[r[0]] for r in self.linhas[1:] if r and r[0]]]
+
+    def col_values(self, i):
+        return [r[i - 1] if len(r) >= i else "" for r in self.linhas]
+
+    def insert_rows(self, rows, row=2, **kw):
+        self.linhas[row - 1:row - 1] = rows
+
+
+class _Planilha:
+    def __init__(self, nomes: list[str], header: list[str]):
+        self.abas = {n: _Aba(list(header)) for n in nomes}
+
+    def worksheet(self, nome):
+        return self.abas[nome]
+
+
+def _sintetico(n: int, por_linha: int, semente: int = 7) -> list[ml.Proposicao]:
+    rnd = random.Random(semente)
+    clientes = list(ml.CLIENT_THEME)
+    out = []
+    for i in range(n):
+        cs = rnd.sample(clientes, min(por_linha, len(clientes)))
+        dia = f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+        casa = rnd.choice(("Senado", "Câmara"))
+        out.append(ml.Proposicao(
+            uid=f"{casa}:{100000 + i}", casa=casa, sigla=rnd.choice(("PL", "PLP", "PDL", "PEC")),
+            numero=str(rnd.randint(1, 5000)), ano="2025", data_apresentacao=dia,
+            ementa=f"Dispõe sobre o tema {i} e altera a Lei nº {rnd.randint(1000, 15000)}.",
+            palavras_chave=f"kw{i % 50}", clientes="; ".join(cs), temas="Tema",
+            autor_principal=f"Autor {i % 300}", autor_partido="PX", autor_uf="DF",
+            autor_tipo="Parlamentar", coautores="", qtd_coautores="0",
+            link_pagina=f"https://exemplo/{i}", inteiro_teor_url="", ingest_at="2025-12-01 10:00:00",
+        ))
+    return out
+
+
+def _header() -> list[str]:
+    # ordem da aba diferente de NEEDED_COLUMNS, mais uma coluna só da planilha
+    return ml.NEEDED_COLUMNS[::-1] + ["Observações"]
+
+
+# caminho antigo, como estava antes dos registros Proposicao
+def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    for col in ml.NEEDED_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    for c in ml.NEEDED_COLUMNS:
+        df[c] = df[c].fillna("").astype(str)
+    return df[ml.NEEDED_COLUMNS].copy()
+
+
+def _align_df_to_ws_header(df: pd.DataFrame, ws) -> pd.DataFrame:
+    header = ml._sheet_header(ws) or ml.NEEDED_COLUMNS[:]
+    out = df.copy()
+    for h in header:
+        if h not in out.columns:
+            out[h] = ""
+    return out[header].fillna("").astype(str)
+
+
+def _inserir_df(df: pd.DataFrame, ws) -> None:
+    exists = ml._existing_uids(ws)
+    new_df = df[~df["UID"].isin(exists)].copy()
+    if new_df.empty:
+        return
+    new_df = new_df.sort_values(["Data Apresentação", "UID"], ascending=[False, False]).reset_index(drop=True)
+    ml._insert_rows_top(ws, _align_df_to_ws_header(new_df, ws).values.tolist())
+
+
+def _caminho_antigo(registros: list[ml.Proposicao], geral: _Planilha, clientes: _Planilha) -> None:
+    colunas = {a: c for c, a in ml._COLUNA_ATRIBUTO.items()}
+    dicts = [{colunas[k]: v for k, v in asdict(p).items()} for p in registros]
+    df = _normalize_columns(pd.DataFrame(dicts))
+    for casa in ("Senado", "Câmara"):
+        _inserir_df(df[df["Casa Atual"] == casa], geral.worksheet(casa))
+    for c in ml.CLIENT_THEME:
+        mask = df["Clientes"].str.contains(rf'(?:^|;\s*){re.escape(c)}(?:\s*;|$)', case=False, na=False)
+        if mask.any():
+            _inserir_df(df[mask].copy(), clientes.worksheet(c))
+
+
+def _caminho_registros(registros: list[ml.Proposicao], geral: _Planilha, clientes: _Planilha) -> None:
+    ordenados = ml._ordenar(registros)
+    for casa in ("Senado", "Câmara"):
+        ml._inserir_novos(geral.worksheet(casa), [p for p in ordenados if p.casa == casa], casa)
+    for c, sub in ml._por_cliente(ordenados).items():
+        if sub:
+            ml._inserir_novos(clientes.worksheet(c), sub, c)
+
+
+def _medir(nome: str, fn, registros: list, repeticoes: int):
+    melhor_t, melhor_pico, planilhas = float("inf"), 0, None
+    for _ in range(repeticoes):
+        geral = _Planilha(["Senado", "Câmara"], _header())
+        clientes = _Planilha(list(ml.CLIENT_THEME), _header())
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # o log por aba só atrapalha
+            fn(registros, geral, clientes)
+        dt = time.perf_counter() - t0
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if dt < melhor_t:
+            melhor_t, melhor_pico = dt, pico
+        planilhas = (geral, clientes)
+    print(f"  {nome:<12} {melhor_t:8.2f}s  pico {melhor_pico / 2**20:7.1f} MiB")
+    return melhor_t, planilhas
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--linhas", type=int, default=20000)
+    ap.add_argument("--clientes-por-linha", type=int, default=3)
+    ap.add_argument("--repeticoes", type=int, default=3)
+    args = ap.parse_args()
+
+    ml.feed.FEED_DIR = ""  # nada de eventos sintéticos no feed de verdade
+    registros = _sintetico(args.linhas, args.clientes_por_linha)
+    print(f"{len(registros)} proposições, {args.clientes_por_linha} clientes cada, "
+          f"{len(ml.CLIENT_THEME)} abas de clientes")
+    ta, (ga, ca) = _medir("DataFrame", _caminho_antigo, registros, args.repeticoes)
+    tr, (gr, cr) = _medir("registros", _caminho_registros, registros, args.repeticoes)
+    for antigo, novo in ((ga, gr), (ca, cr)):
+        for nome, aba in antigo.abas.items():
+            assert aba.linhas == novo.abas[nome].linhas, f"[{nome}] linhas diferentes entre os caminhos"
+    print(f"  ganho: {ta / tr:.1f}x (linhas idênticas em todas as abas)")
+
+
+if __name__ == "__main__":
+    main()
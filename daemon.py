@@ -0,0 +1,171 @@
+"""Modo serviço: o ciclo do pipeline.py em loop, com o estado quente.
+
+No GitHub Actions cada run começa do zero: instala dependências, importa,
+autentica o gspread, relê os UIDs das abas gerais, recompila as regex das
+palavras-chave e consulta de novo o partido de cada deputado. Na instância
+própria este processo fica no ar e roda o mesmo ciclo (coleta com isolamento
+por casa, insert com classificação, backlog) a cada DAEMON_INTERVALO_MIN,
+mais um atraso aleatório de até DAEMON_JITTER_MIN, guardando entre os ciclos
+a sessão HTTP, o cliente do gspread, os UIDs gravados (relidos a cada
+UIDS_RECARGA_HORAS), os partidos dos deputados e as regex. Com
+CLIENT_THEME_PATH, o arquivo de palavras-chave é relido quando muda.
+
+GET /healthz e /metrics (formato Prometheus) em DAEMON_HOST:DAEMON_PORTA;
+DAEMON_PORTA=0 desliga. SIGTERM/SIGINT terminam o ciclo em curso e saem.
+"""
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# entre ciclos os UIDs ficam em memória; a planilha é relida só de tempos em tempos
+os.environ.setdefault("UIDS_RECARGA_HORAS", "6")
+
+import monitor_legislativo
+import perfil
+import pipeline
+
+DAEMON_INTERVALO_MIN = float(os.getenv("DAEMON_INTERVALO_MIN", "60"))
+DAEMON_JITTER_MIN = float(os.getenv("DAEMON_JITTER_MIN", "5"))
+DAEMON_HOST = os.getenv("DAEMON_HOST", "127.0.0.1").strip()
+DAEMON_PORTA = int(os.getenv("DAEMON_PORTA", "8089"))
+
+_parar = threading.Event()
+_lock = threading.Lock()
+_metricas = {
+    "iniciado_em": time.time(),
+    "ciclos": {"ok": 0, "parcial": 0, "falha": 0},
+    "em_ciclo": False,
+    "ultimo_inicio": None,
+    "ultimo_fim": None,
+    "ultima_duracao": None,
+    "ultimo_resultado": None,
+    "ultimo_sucesso": None,
+    "proximo_ciclo": None,
+    "linhas": {"Senado": 0, "Camara": 0},
+}
+
+
+def _ciclo() -> None:
+    with _lock:
+        _metricas["em_ciclo"] = True
+        _metricas["ultimo_inicio"] = time.time()
+    resumo, resultado = None, "falha"
+    try:
+        try:
+            monitor_legislativo.recarregar_client_theme()
+        except Exception as e:
+            # arquivo com erro: segue com o mapa que já estava carregado
+            print(f"CLIENT_THEME_PATH ilegível ({type(e).__name__}: {e}); mantendo o anterior.")
+        resumo = pipeline.main()
+        oks = [c["ok"] for c in resumo.values()]
+        resultado = "ok" if all(oks) else "parcial"
+    except SystemExit:
+        pass  # as duas casas falharam: o main() já explicou no log
+    except (Exception, monitor_legislativo.PrazoEsgotado) as e:
+        print(f"::error::Ciclo falhou: {type(e).__name__}: {e}")
+    fim = time.time()
+    with _lock:
+        _metricas["em_ciclo"] = False
+        _metricas["ciclos"][resultado] += 1
+        _metricas["ultimo_fim"] = fim
+        _metricas["ultima_duracao"] = fim - _metricas["ultimo_inicio"]
+        _metricas["ultimo_resultado"] = resultado
+        if resultado != "falha":
+            _metricas["ultimo_sucesso"] = fim
+        for casa, c in (resumo or {}).items():
+            _metricas["linhas"][casa] += c["linhas"]
+    print(f"Ciclo {resultado} em {fim - _metricas['ultimo_inicio']:.0f}s.")
+    perfil.gravar()  # um trace por ciclo (PERFIL)
+
+
+def _saudavel() -> bool:
+    """Sem ciclo com coleta há mais de dois intervalos (+ jitter e prazo): doente."""
+    with _lock:
+        ref = _metricas["ultimo_sucesso"] or _metricas["iniciado_em"]
+    folga = 2 * (DAEMON_INTERVALO_MIN + DAEMON_JITTER_MIN) + monitor_legislativo.PRAZO_RUN_MIN
+    return time.time() - ref < folga * 60
+
+
+def _texto_metricas() -> str:
+    with _lock:
+        m = json.loads(json.dumps(_metricas))
+    linhas = [
+        "# TYPE monitor_ciclos_total counter",
+        *(f'monitor_ciclos_total{{resultado="{r}"}} {n}' for r, n in m["ciclos"].items()),
+        "# TYPE monitor_linhas_coletadas_total counter",
+        *(f'monitor_linhas_coletadas_total{{casa="{c}"}} {n}' for c, n in m["linhas"].items()),
+        "# TYPE monitor_em_ciclo gauge",
+        f"monitor_em_ciclo {int(m['em_ciclo'])}",
+        "# TYPE monitor_uids_conhecidos gauge",
+        f"monitor_uids_conhecidos {len(monitor_legislativo._UIDS_CONHECIDOS)}",
+        "# TYPE monitor_deputados_em_cache gauge",
+        f"monitor_deputados_em_cache {len(monitor_legislativo._DEPUTADOS)}",
+    ]
+    for nome, chave in (("ultimo_ciclo_duracao_seconds", "ultima_duracao"),
+                        ("ultimo_ciclo_timestamp_seconds", "ultimo_fim"),
+                        ("ultimo_sucesso_timestamp_seconds", "ultimo_sucesso"),
+                        ("proximo_ciclo_timestamp_seconds", "proximo_ciclo")):
+        if m[chave] is not None:
+            linhas += [f"# TYPE monitor_{nome} gauge", f"monitor_{nome} {m[chave]:.3f}"]
+    return "\n".join(linhas) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/healthz":
+            ok = _saudavel()
+            with _lock:
+                corpo = json.dumps({"status": "ok" if ok else "atrasado", **_metricas}).encode()
+            self._responder(200 if ok else 503, "application/json", corpo)
+        elif self.path == "/metrics":
+            self._responder(200, "text/plain; version=0.0.4", _texto_metricas().encode())
+        else:
+            self._responder(404, "text/plain", b"")
+
+    def _responder(self, status: int, tipo: str, corpo: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass  # health check a cada poucos segundos não é log
+
+
+def _servir_metricas():
+    if not DAEMON_PORTA:
+        return None
+    srv = ThreadingHTTPServer((DAEMON_HOST, DAEMON_PORTA), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    print(f"Health/metrics em http://{DAEMON_HOST}:{srv.server_port}/healthz e /metrics")
+    return srv
+
+
+def main():
+    if monitor_legislativo._DATA_OVERRIDE:
+        # a janela seria sempre o mesmo dia; backfill é com o script avulso
+        print("::error::DATA_OVERRIDE não combina com o modo serviço.")
+        sys.exit(2)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: _parar.set())
+    srv = _servir_metricas()
+    while not _parar.is_set():
+        _ciclo()
+        espera = (DAEMON_INTERVALO_MIN + random.uniform(0, DAEMON_JITTER_MIN)) * 60
+        with _lock:
+            _metricas["proximo_ciclo"] = time.time() + espera
+        print(f"Próximo ciclo em {espera / 60:.1f} min.")
+        _parar.wait(espera)
+    if srv:
+        srv.shutdown()
+    print("Encerrado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Feed de mudanças: o que o coletor e o alinhamento gravam nas abas, em NDJSON.
+
+O alerta e a newsletter descobriam proposição nova relendo as abas do Sheets,
+o que é lento e gasta a mesma cota de que o coletor precisa. Aqui cada linha
+inserida, cada classificação, cada célula atualizada (tramitação,
+enriquecimento) e cada linha removida vira uma linha JSON com `seq` crescente:
+
+    {"seq": 1042, "ts": "...", "tipo": "insercao", "aba": "IU", "uid": "Senado:123", "dados": {...}}
+
+tipo: insercao | classificacao | atualizacao | remocao. Os segmentos ficam em
+FEED_DIR (feed-<primeiro seq>.ndjson), e um novo começa quando o atual passa
+de FEED_SEGMENTO_MB. Só os FEED_SEGMENTOS mais novos são mantidos. Quem
+consome guarda o último `seq` visto e pede o que veio depois:
+
+    eventos = feed.ler(cursor)
+    cursor = eventos[-1]["seq"] if eventos else cursor
+
+Há duas situações que o consumidor precisa tratar:
+  - `eventos[0]["seq"] > cursor + 1`: a rotação já descartou eventos, e o
+    consumidor deve reler as abas.
+  - cursor à frente do último `seq`: o feed foi recriado (cache perdido), e
+    ler() devolve desde o começo.
+
+`python feed.py [cursor] [--seguir]` acompanha no terminal. Deixar FEED_DIR
+vazio desliga o feed.
+"""
+import argparse
+import bisect
+import contextlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+FEED_DIR = os.getenv("FEED_DIR", ".cache/feed").strip()
+FEED_SEGMENTO_MB = float(os.getenv("FEED_SEGMENTO_MB", "8"))
+FEED_SEGMENTOS = max(1, int(os.getenv("FEED_SEGMENTOS", "20")))
+
+_LOCK = threading.Lock()
+_rx_segmento = re.compile(r"feed-(\d+)\.ndjson$")
+# "seq" é sempre a primeira chave: o leitor pula linhas sem parsear o JSON
+_rx_seq = re.compile(r'\{"seq": (\d+)')
+
+
+@contextlib.contextmanager
+def _trava():
+    """Um escritor por vez, inclusive entre processos (daemon + alinhamento avulso)."""
+    with _LOCK, open(os.path.join(FEED_DIR, ".lock"), "a") as f:
+        try:
+            import fcntl
+        except ImportError:  # Windows: só a trava da thread
+            yield
+            return
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _segmentos(base_dir: str) -> list[tuple[int, str]]:
+    """(primeiro seq, caminho) de cada segmento, do mais antigo ao mais novo."""
+    try:
+        nomes = os.listdir(base_dir)
+    except FileNotFoundError:
+        return []
+    segs = [(int(m.group(1)), os.path.join(base_dir, n))
+            for n in nomes if (m := _rx_segmento.fullmatch(n))]
+    return sorted(segs)
+
+
+def _ultimo_seq(segs: list[tuple[int, str]]) -> int:
+    """`seq` da última linha completa do feed (0 se vazio)."""
+    primeiro, caminho = segs[-1]
+    with open(caminho, "rb") as f:
+        fim = f.seek(0, os.SEEK_END)
+        janela = 65536
+        while True:
+            f.seek(max(0, fim - janela))
+            linhas = f.read().splitlines()
+            if janela < fim:
+                linhas = linhas[1:]  # a primeira pode ter vindo cortada
+            for linha in reversed(linhas):
+                try:
+                    return int(json.loads(linha)["seq"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+            if janela >= fim:
+                # segmento novo cuja única linha ficou pela metade
+                return primeiro - 1
+            janela *= 4
+
+
+def publicar(tipo: str, aba: str, linhas: dict[str, dict]) -> None:
+    """Acrescenta um evento por UID de `linhas` ({uid: {coluna: valor}}).
+
+    Falha ao gravar o feed não derruba o run: o Sheets continua sendo a fonte.
+    """
+    if not FEED_DIR or not linhas:
+        return
+    try:
+        os.makedirs(FEED_DIR, exist_ok=True)
+        with _trava():
+            segs = _segmentos(FEED_DIR)
+            seq = _ultimo_seq(segs) if segs else 0
+            ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            texto = "".join(
+                json.dumps({"seq": seq + i, "ts": ts, "tipo": tipo, "aba": aba, "uid": uid,
+                            "dados": dados}, ensure_ascii=False) + "\n"
+                for i, (uid, dados) in enumerate(linhas.items(), start=1))
+            if not segs or os.path.getsize(segs[-1][1]) >= FEED_SEGMENTO_MB * 1024 * 1024:
+                caminho = os.path.join(FEED_DIR, f"feed-{seq + 1:012d}.ndjson")
+                segs.append((seq + 1, caminho))
+            else:
+                caminho = segs[-1][1]
+            with open(caminho, "a+b") as f:
+                # run que morreu no meio de uma escrita deixa a última linha sem "\n"
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        texto = "\n" + texto
+                f.write(texto.encode("utf-8"))
+            for _, velho in segs[:-FEED_SEGMENTOS]:
+                os.remove(velho)
+    except Exception as e:
+        print(f"::warning::Feed de mudanças não gravado ({type(e).__name__}: {e}).")
+
+
+def ler(desde: int = 0, limite: int = 1000, base_dir: str = FEED_DIR) -> list[dict]:
+    """Até `limite` eventos com seq > `desde`, em ordem."""
+    segs = _segmentos(base_dir) if base_dir else []
+    if not segs:
+        return []
+    if desde > _ultimo_seq(segs):
+        desde = 0  # feed recriado: o cursor antigo não vale mais
+    # primeiro segmento que pode ter desde + 1
+    i = max(0, bisect.bisect_right([s for s, _ in segs], desde + 1) - 1)
+    out = []
+    for _, caminho in segs[i:]:
+        try:
+            f = open(caminho, encoding="utf-8")
+        except FileNotFoundError:
+            continue  # removido pela rotação durante a leitura
+        with f:
+            for linha in f:
+                m = _rx_seq.match(linha)
+                if not m or int(m.group(1)) <= desde:
+                    continue
+                try:
+                    out.append(json.loads(linha))
+                except ValueError:
+                    continue  # linha ainda sendo escrita (ou cortada por uma queda)
+                if len(out) >= limite:
+                    return out
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("desde", nargs="?", type=int, default=0, help="último seq já visto")
+    ap.add_argument("--seguir", action="store_true", help="continua esperando eventos novos")
+    ap.add_argument("--intervalo", type=float, default=1.0, help="segundos entre consultas (--seguir)")
+    args = ap.parse_args()
+    cursor = args.desde
+    while True:
+        eventos = ler(cursor)
+        for ev in eventos:
+            sys.stdout.write(json.dumps(ev, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+        if eventos:
+            cursor = eventos[-1]["seq"]
+            continue
+        if not args.seguir:
+            return
+        time.sleep(args.intervalo)
+
+
+if __name__ == "__main__":
+    main()
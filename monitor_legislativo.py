@@ -1,7 +1,24 @@
-import os, re, sys, time, requests, pandas as pd, unicodedata
-from datetime import datetime, timedelta
+from __future__ import annotations
+
+import os, re, sys, time, hashlib, json, tempfile, threading, queue
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+from dataclasses import dataclass, fields, replace
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING
 from urllib.parse import urlparse
 
+import feed
+from texto import normalize as _normalize, normalize_ws as _normalize_ws
+import perfil
+
+# pandas, requests e bs4 são importados no primeiro uso: só importá-los custava
+# ~0,5s, e o módulo precisa ser importável (benchmarks, testes, um run sem nada
+# novo) sem pagar isso nem exigir credenciais.
+if TYPE_CHECKING:
+    import pandas as pd
+
 # Timezone BR
 try:
     from zoneinfo import ZoneInfo
@@ -37,8 +54,42 @@ def _dia_inicial():
     return _base_date() - timedelta(days=_JANELA_DIAS - 1)
 
 
-inicio_iso = lambda: _dia_inicial().strftime("%Y-%m-%d")
-inicio_compact = lambda: _dia_inicial().strftime("%Y%m%d")
+# Janela adaptativa. Com a janela fixa, os cinco runs do dia relistavam três
+# dias das duas casas, e uma queda de mais de três dias ainda exigia backfill
+# manual. Agora cada casa guarda o último dia coletado sem falha (e já gravado)
+# e o run lista só a partir dele, menos JANELA_SOBREPOSICAO_DIAS (proposições
+# cadastradas com atraso). Depois de uma queda longa a janela cresce sozinha,
+# até JANELA_MAX_DIAS, e é percorrida em blocos de JANELA_BLOCO_DIAS.
+# Sem marca gravada (primeiro run, estado perdido) vale a janela fixa acima.
+JANELA_MAX_DIAS = max(1, int(os.getenv("JANELA_MAX_DIAS", "30")))
+JANELA_SOBREPOSICAO_DIAS = max(0, int(os.getenv("JANELA_SOBREPOSICAO_DIAS", "1")))
+JANELA_BLOCO_DIAS = max(1, int(os.getenv("JANELA_BLOCO_DIAS", "7")))
+
+
+def _janela(casa: str) -> tuple[date, date]:
+    fim = _base_date()
+    if _DATA_OVERRIDE:
+        return fim, fim
+    marca = _estado_ler(f"coleta:{casa}")
+    if not marca:
+        return _dia_inicial(), fim
+    inicio = datetime.strptime(marca, "%Y-%m-%d").date() - timedelta(days=JANELA_SOBREPOSICAO_DIAS)
+    teto = fim - timedelta(days=JANELA_MAX_DIAS - 1)
+    if inicio < teto:
+        print(f"::warning::[{casa}] última coleta completa em {marca}, além do teto de "
+              f"{JANELA_MAX_DIAS} dias; coletando a partir de {teto}. "
+              f"Dias anteriores só com DATA_OVERRIDE.")
+        inicio = teto
+    return min(inicio, fim), fim
+
+
+def _blocos(inicio: date, fim: date, dias: int | None = None):
+    """Sub-janelas de até `dias` (JANELA_BLOCO_DIAS), da mais antiga para a mais nova."""
+    dias = dias or JANELA_BLOCO_DIAS
+    while inicio <= fim:
+        b = min(fim, inicio + timedelta(days=dias - 1))
+        yield inicio, b
+        inicio = b + timedelta(days=1)
 
 # UIDs já gravados, carregados uma vez antes da raspagem. Servem para pular o
 # enriquecimento (autores, inteiro teor) do que já está na planilha: sem isso a
@@ -50,7 +101,8 @@ def _ja_gravado(uid: str) -> bool:
     return uid in _UIDS_CONHECIDOS
 
 
-def _resumo_coleta(casa: str, vistas: int, puladas: int, novas: int) -> None:
+def _resumo_coleta(casa: str, vistas: int, puladas: int, novas: int,
+                   inicio: date, fim: date) -> None:
     """Distingue 'a API não devolveu nada' de 'devolveu, mas já tínhamos tudo'.
 
     Sem isso, os dois casos apareciam no log como '0 linhas' e um dia sem
@@ -58,7 +110,7 @@ def _resumo_coleta(casa: str, vistas: int, puladas: int, novas: int) -> None:
     """
     if vistas == 0:
         print(f"[{casa}] a API não devolveu nenhuma proposição na janela "
-              f"{inicio_iso()} a {today_iso()}.")
+              f"{inicio:%Y-%m-%d} a {fim:%Y-%m-%d}.")
     elif novas == 0:
         print(f"[{casa}] {vistas} proposições na janela, todas já gravadas. "
               f"Nada novo.")
@@ -66,6 +118,89 @@ def _resumo_coleta(casa: str, vistas: int, puladas: int, novas: int) -> None:
         print(f"[{casa}] {vistas} proposições na janela: {novas} novas, "
               f"{puladas} já gravadas.")
 
+# Estado persistido entre runs (marcas d'água, fronteiras etc.), num JSON local
+ESTADO_PATH = os.getenv("ESTADO_PATH", ".cache/estado.json").strip()
+
+
+def _estado_ler(chave: str, default=None):
+    try:
+        with open(ESTADO_PATH, encoding="utf-8") as f:
+            return json.load(f).get(chave, default)
+    except Exception:
+        return default
+
+
+def _estado_gravar(chave: str, valor) -> None:
+    try:
+        with open(ESTADO_PATH, encoding="utf-8") as f:
+            estado = json.load(f)
+    except Exception:
+        estado = {}
+    estado[chave] = valor
+    os.makedirs(os.path.dirname(ESTADO_PATH) or ".", exist_ok=True)
+    tmp = ESTADO_PATH + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, ESTADO_PATH)
+
+
+# Estado que só pode ser gravado depois que as linhas do run forem gravadas
+# (ver _gravar_marcas): se o envio ao Sheets cair, o run seguinte refaz tudo.
+_ESTADO_APOS_GRAVAR: dict = {}
+
+# Prazo do run. O job tem timeout-minutes: 30, e quando o GitHub mata o runner
+# nada do que já foi coletado chega ao Sheets (foi o que aconteceu no dia da
+# janela de 30 dias depois da queda da Câmara). PRAZO_RUN_MIN, contado do
+# início do processo, fica abaixo disso, e perto dele o run degrada em vez de
+# morrer:
+#  - faltando PRAZO_DEGRADAR_MIN, deixa de buscar o opcional (partido/UF dos
+#    coautores, autoria na página do Senado, URL e match do inteiro teor) e
+#    anota o UID em "enriquecimento:pendentes" para um run seguinte completar;
+#  - faltando PRAZO_PARAR_MIN, não começa mais nada (proposição, página, bloco)
+#    e grava o que já está completo. A marca d'água fica no último bloco inteiro.
+# O prazo vale para o GET inteiro, não só para cada tentativa: o timeout é
+# cortado ao que resta, uma espera de retry que passaria do prazo levanta
+# PrazoEsgotado em vez de dormir, e depois de PRAZO_DEGRADAR_MIN não há mais
+# retry (a falha volta na hora, como as outras). PRAZO_RUN_MIN=0 desliga.
+PRAZO_RUN_MIN = float(os.getenv("PRAZO_RUN_MIN", "25"))
+PRAZO_DEGRADAR_MIN = float(os.getenv("PRAZO_DEGRADAR_MIN", "8"))
+PRAZO_PARAR_MIN = float(os.getenv("PRAZO_PARAR_MIN", "4"))
+_INICIO_RUN = time.monotonic()
+
+# UID → o que ficou faltando ("autoria", "inteiro_teor") por causa do prazo
+_PENDENTES_ENRIQ: dict[str, set[str]] = {}
+
+
+class PrazoEsgotado(BaseException):
+    """Coleta interrompida pelo prazo; `registros` são as linhas já completas.
+
+    BaseException de propósito: os helpers de enriquecimento tratam qualquer
+    Exception como "sem dado" e seguem, e o prazo tem que chegar a quem decide
+    (a coleta, que devolve as linhas completas, ou o estágio opcional)."""
+
+    def __init__(self, registros=None):
+        super().__init__("prazo do run esgotado")
+        self.registros = registros or []
+
+
+def _resta() -> float:
+    """Segundos até o prazo do run (infinito com PRAZO_RUN_MIN=0)."""
+    if PRAZO_RUN_MIN <= 0:
+        return float("inf")
+    return PRAZO_RUN_MIN * 60 - (time.monotonic() - _INICIO_RUN)
+
+
+def _degradado() -> bool:
+    return _resta() < PRAZO_DEGRADAR_MIN * 60
+
+
+def _parar() -> bool:
+    return _resta() < PRAZO_PARAR_MIN * 60
+
+
+def _pendente(uid: str, o_que: str) -> None:
+    _PENDENTES_ENRIQ.setdefault(uid, set()).add(o_que)
+
 # HTTP
 HDR = {
     "Accept": "application/json,text/html,*/*",
@@ -73,26 +208,51 @@ HDR = {
                   "(KHTML, like Gecko) Chrome/126 Safari/537.36"
 }
 
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-_sess = requests.Session()
-# backoff_factor 0.3 dava esperas de 0,6s e 1,2s: curto demais para as quedas
-# das APIs do Congresso, que duram minutos. Com 2.0 as esperas viram 4s, 8s,
-# 16s e 32s, e o run atravessa uma indisponibilidade curta em vez de morrer.
-# Não adianta subir muito mais: cada tentativa ainda paga o timeout de conexão
-# de 60s, e quedas longas são resolvidas pelo isolamento por casa no main().
-_retry = Retry(total=5, backoff_factor=2.0,
-               status_forcelist=(429, 500, 502, 503, 504))
-_sess.headers.update(HDR)
-_sess.mount("https://", HTTPAdapter(max_retries=_retry))
-_sess.mount("http://",  HTTPAdapter(max_retries=_retry))
-
-# suprimir warning se cair no fallback verify=False
-try:
-    from urllib3.exceptions import InsecureRequestWarning
-    requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)  # type: ignore
-except Exception:
-    pass
+_sess = None
+
+
+def _session():
+    """Session HTTP com retry, criada no primeiro request."""
+    global _sess
+    if _sess is not None:
+        return _sess
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    sess = requests.Session()
+    # backoff_factor 0.3 dava esperas de 0,6s e 1,2s: curto demais para as quedas
+    # das APIs do Congresso, que duram minutos. Com 2.0 as esperas viram 4s, 8s,
+    # 16s e 32s, e o run atravessa uma indisponibilidade curta em vez de morrer.
+    # Não adianta subir muito mais: cada tentativa ainda paga o timeout de conexão
+    # de 60s, e quedas longas são resolvidas pelo isolamento por casa no main().
+    class _RetryNoPrazo(Retry):
+        # o adapter repete sozinho (até 6 tentativas e ~60s de espera): o
+        # prazo do run tem que valer entre as tentativas também
+        def is_exhausted(self) -> bool:
+            return super().is_exhausted() or _degradado()
+
+        def sleep(self, response=None):
+            espera = self.get_backoff_time()
+            if response is not None and self.respect_retry_after_header:
+                espera = max(espera, self.get_retry_after(response) or 0)
+            if espera >= _resta() - 1:
+                raise PrazoEsgotado()
+            super().sleep(response)
+
+    retry = _RetryNoPrazo(total=5, backoff_factor=2.0,
+                          status_forcelist=(429, 500, 502, 503, 504))
+    sess.headers.update(HDR)
+    sess.mount("https://", HTTPAdapter(max_retries=retry))
+    sess.mount("http://",  HTTPAdapter(max_retries=retry))
+
+    # suprimir warning se cair no fallback verify=False
+    try:
+        from urllib3.exceptions import InsecureRequestWarning
+        requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)  # type: ignore
+    except Exception:
+        pass
+    _sess = sess
+    return _sess
 
 def _as_list(x):
     if x is None: return []
@@ -120,16 +280,6 @@ def _last_int_from_uri(u: str|None):
     except Exception:
         return None
 
-def _normalize(text: str) -> str:
-    if text is None: return ""
-    t = unicodedata.normalize("NFD", str(text))
-    t = "".join(c for c in t if unicodedata.category(c) != "Mn")
-    return t.lower().strip()
-
-def _normalize_ws(s: str) -> str:
-    s = _normalize(s)
-    return re.sub(r'[^a-z0-9]+', ' ', s).strip()
-
 def _join_unique(seq):
     return ", ".join(dict.fromkeys([x for x in _as_list(seq) if x]))
 
@@ -151,22 +301,199 @@ def _label_with_party_uf(nome: str|None, partido: str|None=None, uf: str|None=No
     return nome
 
 # ---------------------- GET helpers ----------------------
+def _no_prazo(kw: dict) -> dict:
+    """Corta o timeout do GET ao que resta do prazo do run."""
+    resta = _resta()
+    if resta == float("inf"):
+        return kw
+    if resta <= 1:
+        raise PrazoEsgotado()
+    kw = dict(kw)
+    kw["timeout"] = min(kw.get("timeout") or resta, resta)
+    return kw
+
 def _get_default(url, **kw):
-    return _sess.get(url, **kw)
+    return _get_cache(_get_default_rede, url, kw)
+
+def _get_default_rede(url, **kw):
+    with perfil.trecho("http:GET", url=url):
+        return _session().get(url, **_no_prazo(kw))
 
 def _get_senado(url, **kw):
+    return _get_cache(_get_senado_rede, url, kw)
+
+def _get_senado_rede(url, **kw):
     """
     GET p/ Senado com fallback de SSL:
     - tenta com verificação normal
     - se der SSLError, repete com verify=False (se SENADO_INSECURE_FALLBACK != '0')
     """
+    import requests
+    kw = _no_prazo(kw)
+    with perfil.trecho("http:GET senado", url=url):
+        try:
+            return _session().get(url, **kw)
+        except requests.exceptions.SSLError:
+            if os.getenv("SENADO_INSECURE_FALLBACK", "1") != "1":
+                raise
+            kw2 = dict(kw); kw2["verify"] = False
+            return _session().get(url, **kw2)
+
+#                 CACHE HTTP (disco)
+# Textos e páginas de matéria do Senado, /proposicoes/{id}, /autores e
+# /deputados/{id} da Câmara eram baixados inteiros a cada run (e a cada
+# retry), embora quase nunca mudem. Com HTTP_CACHE_DIR o corpo fica em disco
+# junto com ETag/Last-Modified: dentro do frescor do endpoint (_HTTP_FRESCOR)
+# a resposta sai do disco sem request; passado ele vai um GET condicional, e um
+# 304 reaproveita o corpo guardado. URL fora da tabela, GET com params (listas)
+# e stream não passam pelo cache. O diretório fica abaixo de HTTP_CACHE_MAX_MB,
+# descartando os arquivos usados há mais tempo. Vazio em HTTP_CACHE_DIR desliga.
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".cache/http").strip()
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "200"))
+
+# (padrão do caminho, segundos em que a cópia vale sem perguntar ao servidor);
+# 0 = revalida sempre (só economiza o corpo, com 304)
+_HTTP_FRESCOR = [
+    (re.compile(r"/api/v2/deputados/\d+$"), 24 * 3600),
+    (re.compile(r"/api/v2/proposicoes/\d+/(autores|inteiroTeor|documentos)$"), 24 * 3600),
+    (re.compile(r"/api/v2/proposicoes/\d+$"), 0),  # status muda: tramitação
+    (re.compile(r"/dadosabertos/materia/(textos/\d+|\d+/textos|\d+)\.json$"), 24 * 3600),
+    (re.compile(r"/dadosabertos/materia/situacaoatual/\d+\.json$"), 0),
+    (re.compile(r"/web/atividade/materias/-/materia/\d+$"), 24 * 3600),
+]
+_HTTP_HEADERS_GUARDADOS = ("Content-Type", "ETag", "Last-Modified")
+_HTTP_CONT = {"hit": 0, "revalidado": 0, "miss": 0}
+_HTTP_LOCK = threading.Lock()
+_http_bytes: int | None = None  # tamanho do diretório, medido no primeiro uso
+
+
+def _http_frescor(url: str, kw: dict) -> float | None:
+    if not HTTP_CACHE_DIR or kw.get("params") or kw.get("stream"):
+        return None
+    caminho = urlparse(url).path.rstrip("/")
+    for padrao, segundos in _HTTP_FRESCOR:
+        if padrao.search(caminho):
+            return segundos
+    return None
+
+
+def _http_ler(url: str, base: str, meta: dict):
+    """Response montada da cópia em disco, ou None se o corpo sumiu."""
+    import requests
     try:
-        return _sess.get(url, **kw)
-    except requests.exceptions.SSLError:
-        if os.getenv("SENADO_INSECURE_FALLBACK", "1") != "1":
-            raise
-        kw2 = dict(kw); kw2["verify"] = False
-        return _sess.get(url, **kw2)
+        with open(base + ".body", "rb") as f:
+            corpo = f.read()
+        os.utime(base + ".body")  # "usado agora", para a poda
+    except OSError:
+        return None
+    r = requests.Response()
+    r.status_code, r.url, r._content = 200, url, corpo
+    r.headers = requests.structures.CaseInsensitiveDict(meta.get("headers") or {})
+    r.encoding = meta.get("encoding")
+    return r
+
+
+def _http_gravar_json(caminho: str, dados: dict) -> None:
+    fd, tmp = tempfile.mkstemp(dir=HTTP_CACHE_DIR, suffix=".part")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(dados, f)
+    os.replace(tmp, caminho)
+
+
+def _http_guardar(url: str, base: str, r, frescor: float) -> None:
+    global _http_bytes
+    headers = {h: r.headers[h] for h in _HTTP_HEADERS_GUARDADOS if h in r.headers}
+    if not frescor and "ETag" not in headers and "Last-Modified" not in headers:
+        return  # sem frescor nem validador, a cópia nunca seria usada
+    os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+    corpo = r.content
+    fd, tmp = tempfile.mkstemp(dir=HTTP_CACHE_DIR, suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(corpo)
+    os.replace(tmp, base + ".body")
+    _http_gravar_json(base + ".json", {"url": url, "em": time.time(), "headers": headers,
+                                       "encoding": r.encoding})
+    with _HTTP_LOCK:
+        if _http_bytes is None:
+            _http_bytes = sum(e.stat().st_size for e in os.scandir(HTTP_CACHE_DIR)
+                              if e.name.endswith(".body"))
+        else:
+            _http_bytes += len(corpo)
+        if _http_bytes > HTTP_CACHE_MAX_MB * 2**20:
+            _http_podar()
+
+
+def _http_podar() -> None:
+    """Apaga os corpos usados há mais tempo até ficar em 90% do teto."""
+    global _http_bytes
+    arquivos = sorted((e.stat().st_mtime, e.stat().st_size, e.path)
+                      for e in os.scandir(HTTP_CACHE_DIR) if e.name.endswith(".body"))
+    total = sum(tam for _, tam, _ in arquivos)
+    alvo = HTTP_CACHE_MAX_MB * 2**20 * 0.9
+    for _, tam, caminho in arquivos:
+        if total <= alvo:
+            break
+        for arq in (caminho, caminho[:-len(".body")] + ".json"):
+            try:
+                os.remove(arq)
+            except OSError:
+                pass
+        total -= tam
+    _http_bytes = total
+
+
+def _get_cache(rede, url, kw: dict):
+    """GET pelo cache em disco (ver acima); `rede` é quem faz o request de verdade."""
+    frescor = _http_frescor(url, kw)
+    if frescor is None:
+        return rede(url, **kw)
+    base = os.path.join(HTTP_CACHE_DIR, hashlib.sha1(url.encode("utf-8")).hexdigest())
+    try:
+        with open(base + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = None
+
+    if meta and time.time() - meta["em"] < frescor:
+        r = _http_ler(url, base, meta)
+        if r is not None:
+            _HTTP_CONT["hit"] += 1
+            return r
+
+    kw_rede = kw
+    validadores = {"If-None-Match": (meta or {}).get("headers", {}).get("ETag"),
+                   "If-Modified-Since": (meta or {}).get("headers", {}).get("Last-Modified")}
+    validadores = {h: v for h, v in validadores.items() if v}
+    if validadores:
+        kw_rede = dict(kw, headers={**(kw.get("headers") or {}), **validadores})
+    r = rede(url, **kw_rede)
+    if r.status_code == 304:
+        guardada = _http_ler(url, base, meta)
+        if guardada is not None:
+            _HTTP_CONT["revalidado"] += 1
+            meta["em"] = time.time()
+            try:
+                _http_gravar_json(base + ".json", meta)
+            except OSError:
+                pass
+            return guardada
+        r = rede(url, **kw)  # 304 mas o corpo foi podado no meio: baixa de novo
+    _HTTP_CONT["miss"] += 1
+    if r.status_code == 200:
+        try:
+            _http_guardar(url, base, r, frescor)
+        except OSError as e:
+            print(f"[cache http] não gravou {url} ({type(e).__name__}: {e}).")
+    return r
+
+
+def _log_http_cache() -> None:
+    c = _HTTP_CONT
+    if not any(c.values()):
+        return
+    tam = f"; {_http_bytes / 2**20:.1f} MB em disco" if _http_bytes is not None else ""
+    print(f"[cache http] {c['hit']} do disco, {c['revalidado']} revalidados (304), "
+          f"{c['miss']} baixados{tam}.")
 
 # Mapa: Cliente → Tema → Keywords (whole-word)
 CLIENT_THEME_DATA = """
@@ -216,30 +543,210 @@ def _parse_client_theme_data(text: str):
 
 CLIENT_THEME = _parse_client_theme_data(CLIENT_THEME_DATA)
 
-# Pré-compila padrões para whole-word
-KW_PATTERNS: list[tuple[re.Pattern, str, str, str]] = []
-for cliente, temas in CLIENT_THEME.items():
-    for tema, kws in temas.items():
-        for kw in kws:
-            pat = _compile_kw_pattern(kw)
-            if pat:
-                KW_PATTERNS.append((pat, cliente, tema, kw))
+# Padrões whole-word, compilados no primeiro match (são centenas de regex)
+_KW_PATTERNS: list[tuple[re.Pattern, str, str, str]] | None = None
 
-def _extract_kw_client_theme(texto: str):
-    nt = _normalize_ws(texto or "")
-    matched_kws = []
-    pairs = set()
-    for pat, cliente, tema, original_kw in KW_PATTERNS:
-        if pat.search(nt):
-            matched_kws.append(original_kw)
-            pairs.add((cliente, tema))
-    kw_str = "; ".join(dict.fromkeys(matched_kws).keys())
-    clientes_str = "; ".join(sorted({c for c, _ in pairs}))
-    temas_str = "; ".join(sorted({t for _, t in pairs}))
+def _compilar_kw_patterns(client_theme: dict) -> list[tuple[re.Pattern, str, str, str]]:
+    out = []
+    for cliente, temas in client_theme.items():
+        for tema, kws in temas.items():
+            for kw in kws:
+                pat = _compile_kw_pattern(kw)
+                if pat:
+                    out.append((pat, cliente, tema, kw))
+    return out
+
+def _kw_patterns() -> list[tuple[re.Pattern, str, str, str]]:
+    global _KW_PATTERNS
+    if _KW_PATTERNS is None:
+        _KW_PATTERNS = _compilar_kw_patterns(CLIENT_THEME)
+    return _KW_PATTERNS
+
+# CLIENT_THEME_PATH: arquivo no formato de CLIENT_THEME_DATA que substitui o
+# texto embutido acima. No modo serviço (daemon.py) é relido quando muda; o
+# re-match do histórico vem sozinho no ciclo seguinte (ver rematch_se_mudou).
+CLIENT_THEME_PATH = os.getenv("CLIENT_THEME_PATH", "").strip()
+_client_theme_mtime: float | None = None
+
+def recarregar_client_theme() -> bool:
+    """Relê CLIENT_THEME_PATH se o arquivo mudou. True se o mapa mudou."""
+    global CLIENT_THEME, _KW_PATTERNS, _client_theme_mtime
+    if not CLIENT_THEME_PATH:
+        return False
+    mtime = os.path.getmtime(CLIENT_THEME_PATH)
+    if mtime == _client_theme_mtime:
+        return False
+    with open(CLIENT_THEME_PATH, encoding="utf-8") as f:
+        novo = _parse_client_theme_data(f.read().strip())
+    _client_theme_mtime = mtime
+    if novo == CLIENT_THEME:
+        return False
+    CLIENT_THEME, _KW_PATTERNS = novo, None
+    _fechar_pool()  # os processos foram iniciados com o mapa anterior
+    print(f"CLIENT_THEME recarregado de {CLIENT_THEME_PATH}: {len(novo)} clientes.")
+    return True
+
+def _kw_hits(nt: str) -> set[int]:
+    """Índices (em _kw_patterns()) dos padrões presentes no texto já normalizado."""
+    return {i for i, (pat, *_) in enumerate(_kw_patterns()) if pat.search(nt)}
+
+def _formatar_hits(hits) -> tuple[str, str, str]:
+    pats = _kw_patterns()
+    matched = [pats[i] for i in sorted(hits)]
+    kw_str = "; ".join(dict.fromkeys(kw for *_, kw in matched).keys())
+    clientes_str = "; ".join(sorted({c for _, c, _, _ in matched}))
+    temas_str = "; ".join(sorted({t for _, _, t, _ in matched}))
     return kw_str, clientes_str, temas_str
 
+@perfil.perfilado("match:palavras-chave")
+def _extract_kw_client_theme(texto: str):
+    return _formatar_hits(_kw_hits(_normalize_ws(texto or "")))
+
+#                 PROCESSOS (CPU)
+# Num backfill grande o matcher (normalização + centenas de regex por ementa)
+# e o parse das páginas HTML do Senado rodavam num núcleo só, na mesma thread
+# do I/O. Com PROCESSOS > 1 essas funções puras vão para um pool de processos
+# em blocos de PROCESSOS_BLOCO itens: nas coletas pela API (_EstagioCPU) a
+# thread de I/O só despacha e segue buscando, e o resultado é aplicado às
+# linhas no fim; nos caminhos em massa (arquivos anuais, re-match) é um map
+# em blocos (_mapear_cpu). Abaixo de um bloco tudo roda aqui mesmo: o run
+# normal, de poucas dezenas de linhas, não sobe processo. PROCESSOS=0 usa
+# todos os núcleos. `python benchmark_processos.py` mede o ganho.
+PROCESSOS = int(os.getenv("PROCESSOS", "0") or 0) or (os.cpu_count() or 1)
+PROCESSOS_BLOCO = int(os.getenv("PROCESSOS_BLOCO", "500"))
+
+_POOL = None
+_POOL_FALHOU = False  # um processo morreu: o resto do run fica num núcleo
+
+
+def _iniciar_processo(client_theme: dict) -> None:
+    # spawn: o módulo é reimportado no filho; o mapa vem do pai (CLIENT_THEME_PATH)
+    global CLIENT_THEME, _KW_PATTERNS
+    CLIENT_THEME, _KW_PATTERNS = client_theme, None
+    perfil.desligar()
+
+
+def _pool_cpu():
+    global _POOL
+    if _POOL is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn, não fork: a leitura em streaming do Senado tem thread viva
+        _POOL = ProcessPoolExecutor(PROCESSOS, mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=_iniciar_processo, initargs=(CLIENT_THEME,))
+    return _POOL
+
+
+def _fechar_pool() -> None:
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(cancel_futures=True)
+        _POOL = None
+
+
+# Carga inicial do CLIENT_THEME_PATH, depois do _fechar_pool que ela usa. O
+# módulo importa sem configuração (pipeline, daemon, benchmarks): arquivo
+# ausente ou inválido fica no log e o mapa embutido segue valendo; o daemon
+# tenta de novo a cada ciclo.
+try:
+    recarregar_client_theme()
+except Exception as e:
+    print(f"::warning::CLIENT_THEME_PATH ilegível ({type(e).__name__}: {e}); usando o mapa embutido.")
+
+
+def _rodar_lote(fn, args: list) -> list:
+    return [fn(a) for a in args]
+
+
+def _usar_pool() -> bool:
+    return PROCESSOS > 1 and not _POOL_FALHOU
+
+
+def _pool_falhou(e: Exception) -> None:
+    # processo morto (OOM, script sem o guard de __main__): o run segue num núcleo
+    global _POOL_FALHOU
+    if not _POOL_FALHOU:
+        print(f"::warning::Pool de processos falhou ({type(e).__name__}: {e}); seguindo sem ele.")
+    _POOL_FALHOU = True
+    _fechar_pool()
+
+
+@perfil.perfilado("cpu:mapear")
+def _mapear_cpu(fn, itens: list) -> list:
+    """[fn(x) for x in itens], em blocos no pool quando passa de um bloco."""
+    if not _usar_pool() or len(itens) <= PROCESSOS_BLOCO:
+        return _rodar_lote(fn, itens)
+    blocos = [itens[i:i + PROCESSOS_BLOCO] for i in range(0, len(itens), PROCESSOS_BLOCO)]
+    try:
+        return [r for bloco in _pool_cpu().map(_rodar_lote, [fn] * len(blocos), blocos) for r in bloco]
+    except (BrokenProcessPool, OSError) as e:
+        _pool_falhou(e)
+        return _rodar_lote(fn, itens)
+
+
+class _EstagioCPU:
+    """Funções puras despachadas durante a coleta e aplicadas no fim.
+
+    `enviar(fn, arg, aplicar)` guarda o pedido; a cada PROCESSOS_BLOCO pedidos
+    da mesma função o bloco vai para o pool, sem esperar. `concluir()` roda o
+    resto aqui mesmo, espera o pool e chama `aplicar(resultado)` na ordem de
+    envio (antes de devolver as linhas, inclusive no PrazoEsgotado).
+    """
+
+    def __init__(self):
+        self._abertos: dict = {}   # fn -> [(arg, aplicar)]
+        self._enviados: list = []  # (future, fn, bloco)
+
+    def enviar(self, fn, arg, aplicar) -> None:
+        bloco = self._abertos.setdefault(fn, [])
+        bloco.append((arg, aplicar))
+        if _usar_pool() and len(bloco) >= PROCESSOS_BLOCO:
+            try:
+                fut = _pool_cpu().submit(_rodar_lote, fn, [a for a, _ in bloco])
+            except (BrokenProcessPool, OSError, RuntimeError) as e:
+                _pool_falhou(e)
+                return  # o bloco fica aberto e roda aqui no concluir()
+            self._enviados.append((fut, fn, bloco))
+            self._abertos[fn] = []
+
+    @perfil.perfilado("cpu:concluir")
+    def concluir(self) -> None:
+        for fut, fn, bloco in self._enviados:
+            try:
+                resultados = fut.result()
+            except (BrokenProcessPool, OSError) as e:
+                _pool_falhou(e)
+                resultados = _rodar_lote(fn, [a for a, _ in bloco])
+            for (_, ap), res in zip(bloco, resultados):
+                ap(res)
+        for fn, bloco in self._abertos.items():
+            for (arg, ap), res in zip(bloco, _rodar_lote(fn, [a for a, _ in bloco])):
+                ap(res)
+        self._abertos, self._enviados = {}, []
+
+
+def _aplicar_kw(p: Proposicao, kw: tuple[str, str, str]) -> None:
+    p.palavras_chave, p.clientes, p.temas = kw
+
+
+def _aplicar_autoria(p: Proposicao, autores: dict) -> None:
+    p.autor_principal, p.autor_partido, p.autor_uf = autores["ap_nome"], autores["ap_partido"], autores["ap_uf"]
+    p.autor_tipo, p.coautores, p.qtd_coautores = autores["ap_tipo"], autores["coautores"], autores["qtd_coaut"]
+
+
 # Helpers de DATA/HORA
+_rx_iso_data = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
 def _fmt_date(v) -> str:
+    # caminho rápido para o formato das duas APIs (AAAA-MM-DD[Thh:mm...]):
+    # pd.to_datetime por linha pesava nos backfills
+    if isinstance(v, str) and _rx_iso_data.match(v):
+        try:
+            return datetime.strptime(v[:10], "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            return ""
+    import pandas as pd
     try:
         d = pd.to_datetime(v, errors="coerce")
         if pd.isna(d): return ""
@@ -248,6 +755,9 @@ def _fmt_date(v) -> str:
         return ""
 
 def _fmt_dt(v) -> str:
+    if type(v) is datetime:
+        return v.replace(tzinfo=None).strftime("%Y-%m-%d %H:%M:%S")
+    import pandas as pd
     try:
         d = pd.to_datetime(v, errors="coerce")
         if pd.isna(d): return ""
@@ -270,8 +780,83 @@ def _infer_tipo_autor(nome: str|None) -> str:
     if _rx_exec.search(n):  return "Executivo"
     return "Parlamentar"
 
+# Registro de uma proposição coletada. Antes cada linha era um dict de 19
+# chaves virando DataFrame, e o caminho até o Sheets fazia fillna/astype/copy
+# e um sort_values por aba de destino. Com slots e tudo já em str, a conversão
+# para a ordem do cabeçalho da aba é uma só, direto em lista de listas.
+@dataclass(slots=True)
+class Proposicao:
+    uid: str
+    casa: str
+    sigla: str
+    numero: str
+    ano: str
+    data_apresentacao: str
+    ementa: str
+    palavras_chave: str
+    clientes: str
+    temas: str
+    autor_principal: str
+    autor_partido: str
+    autor_uf: str
+    autor_tipo: str
+    coautores: str
+    qtd_coautores: str
+    link_pagina: str
+    inteiro_teor_url: str
+    ingest_at: str
+    # só com INTEIRO_TEOR_MATCH: palavras-chave achadas no PDF e não na ementa
+    palavras_chave_inteiro_teor: str = ""
+
+    def lista_clientes(self) -> list[str]:
+        return [c for c in self.clientes.split("; ") if c]
+
+
+# Coluna da planilha → atributo do registro, na ordem de NEEDED_COLUMNS
+_COLUNA_ATRIBUTO = dict(zip([
+    "UID","Casa Atual",
+    "Sigla","Número","Ano",
+    "Data Apresentação","Ementa",
+    "Palavras Chave","Clientes","Temas",
+    # autoria granular
+    "Autor Principal","Autor Principal Partido","Autor Principal UF","Autor Principal Tipo",
+    "Coautores","Qtd Coautores",
+    # links e auditoria
+    "Link Página","Inteiro Teor URL",
+    "Ingest At",
+    "Palavras Chave Inteiro Teor",
+], (f.name for f in fields(Proposicao))))
+
+
+def _s(v) -> str:
+    """Mesmo resultado do antigo fillna("").astype(str), campo a campo."""
+    return "" if v is None else str(v)
+
+
+def _ordenar(registros: list[Proposicao]) -> list[Proposicao]:
+    """Mais recentes primeiro. Feito uma vez por run: os filtros por aba/cliente
+    preservam a ordem, então ninguém mais precisa reordenar."""
+    return sorted(registros, key=lambda p: (p.data_apresentacao, p.uid), reverse=True)
+
+
+@perfil.perfilado("linhas:montar")
+def _linhas_no_header(registros: list[Proposicao], header: list[str]) -> list[list[str]]:
+    """Converte os registros para a ordem REAL do cabeçalho da aba.
+
+    Colunas da aba que não existem no registro saem vazias, como antes.
+    """
+    getters = [(lambda p, a=_COLUNA_ATRIBUTO[h]: getattr(p, a)) if h in _COLUNA_ATRIBUTO
+               else (lambda p: "") for h in header]
+    return [[g(p) for g in getters] for p in registros]
+
+
+@perfil.perfilado("dataframe:montar")
+def registros_para_df(registros: list[Proposicao]) -> pd.DataFrame:
+    """DataFrame com NEEDED_COLUMNS (para o CSV de fallback)."""
+    import pandas as pd
+    return pd.DataFrame(_linhas_no_header(registros, NEEDED_COLUMNS), columns=NEEDED_COLUMNS)
+
 #                       SENADO
-from bs4 import BeautifulSoup
 BASE_PESQUISA_SF = "https://legis.senado.leg.br/dadosabertos/materia/pesquisa/lista.json"
 
 def _senado_textos_api(codigo_materia):
@@ -332,6 +917,7 @@ def _senado_inteiro_teor_api(codigo_materia):
 
 def _senado_inteiro_teor_page(codigo_materia):
     page = f"https://www25.senado.leg.br/web/atividade/materias/-/materia/{codigo_materia}"
+    from bs4 import BeautifulSoup
     try:
         r = _get_senado(page, timeout=40)
         if r.status_code != 200:
@@ -352,6 +938,7 @@ def _senado_inteiro_teor_page(codigo_materia):
     except Exception:
         return None, None
 
+@perfil.perfilado("senado:inteiro teor")
 def _senado_inteiro_teor(codigo_materia):
     u, d = _senado_inteiro_teor_api(codigo_materia)
     if u: return u, d
@@ -384,13 +971,21 @@ def _parse_autores_senado_texto(autor_str: str):
             nomes.append(ch); partidos.append(None); ufs.append(None)
     return nomes, partidos, ufs
 
-def _senado_primeira_autoria_da_pagina(codigo_materia) -> str | None:
+@perfil.perfilado("senado:página da matéria")
+def _senado_pagina_materia(codigo_materia) -> str | None:
     url = f"https://www25.senado.leg.br/web/atividade/materias/-/materia/{codigo_materia}"
     try:
         r = _get_senado(url, timeout=45)
-        if r.status_code != 200:
-            return None
-        soup = BeautifulSoup(r.text, "html.parser")
+        return r.text if r.status_code == 200 else None
+    except Exception:
+        return None
+
+@perfil.perfilado("html:autoria")
+def _autoria_da_pagina(html: str) -> str | None:
+    """Campo "Autoria" da página da matéria (parse puro; roda no pool)."""
+    from bs4 import BeautifulSoup
+    try:
+        soup = BeautifulSoup(html, "html.parser")
         holders = soup.select("div.span12.sf-bloco-paragrafos-condensados") or soup.select("div.bg-info-conteudo") or [soup]
         for holder in holders:
             for p in holder.find_all("p"):
@@ -409,118 +1004,430 @@ def _senado_primeira_autoria_da_pagina(codigo_materia) -> str | None:
     except Exception:
         return None
 
-def senado_df_hoje() -> pd.DataFrame:
-    params = {"dataInicioApresentacao": inicio_compact(), "dataFimApresentacao": today_compact()}
-    r = _get_senado(BASE_PESQUISA_SF, params=params, timeout=60); r.raise_for_status()
-    j = r.json()
+def _senado_primeira_autoria_da_pagina(codigo_materia) -> str | None:
+    html = _senado_pagina_materia(codigo_materia)
+    return _autoria_da_pagina(html) if html else None
+
+# Leitura em streaming do lista.json. Numa janela de várias semanas a resposta
+# é grande, e o r.json() montava o documento inteiro em dicts antes da primeira
+# matéria ser processada. Com SENADO_STREAMING=1 (padrão, se o ijson estiver
+# instalado) uma thread lê a resposta e entrega cada Materia assim que ela
+# fecha: a autoria/inteiro teor da primeira começa enquanto o resto ainda está
+# chegando, e a memória é a das matérias ainda na fila, não a do documento.
+# A thread existe para a conexão da listagem não ficar parada (e cair no
+# servidor) durante os minutos de enriquecimento. A fila entre ela e o
+# enriquecimento guarda no máximo SENADO_FILA matérias: cheia, a thread espera
+# (e o TCP segura o servidor), senão a resposta inteira acabaria em dicts na
+# fila, que é o que o streaming evita. Se o servidor derrubar a conexão
+# parada, a sub-janela é pedida de novo em metades (ver SENADO_LISTA_DIAS).
+SENADO_STREAMING = os.getenv("SENADO_STREAMING", "1").strip() in ("1","true","True","yes","on")
+SENADO_FILA = max(1, int(os.getenv("SENADO_FILA", "500")))
+# mesmos caminhos que o _dig abaixo; ".item" quando Materia vem em lista
+_SF_MATERIA = ("PesquisaBasicaMateria.Materias.Materia", "PesquisaBasicaMateria.Materia",
+               "Materias.Materia", "Materia")
+
+
+def _materias_do_json(j: dict) -> list:
     materias = (_dig(j, ("PesquisaBasicaMateria","Materias","Materia"))
                 or _dig(j, ("PesquisaBasicaMateria","Materia"))
                 or _dig(j, ("Materias","Materia"))
                 or j.get("Materia") or [])
-    materias = _as_list(materias)
+    return _as_list(materias)
 
-    rows = []
-    vistas = puladas = 0
-    for m in materias:
-        if not isinstance(m, dict):
-            continue
-        vistas += 1
-        dados = m.get("DadosBasicosMateria", {}) if isinstance(m.get("DadosBasicosMateria"), dict) else {}
-        ident = m.get("IdentificacaoMateria", {}) if isinstance(m.get("IdentificacaoMateria"), dict) else {}
-
-        codigo = _get(m, "Codigo") or _get(ident, "CodigoMateria")
-        # já está na planilha: não gasta chamadas de autoria/inteiro teor
-        if codigo and _ja_gravado(f"Senado:{codigo}"):
-            puladas += 1
+
+def _materias_em_stream(fp):
+    """Gera cada Materia de um lista.json lido de `fp`, sem montar o documento.
+    Materia pode vir como objeto único ou como lista, como no _as_list."""
+    import ijson
+    from ijson.common import ObjectBuilder
+
+    alvos = {*_SF_MATERIA, *(p + ".item" for p in _SF_MATERIA)}
+    builder = raiz = None
+    for prefixo, evento, valor in ijson.parse(fp, use_float=True):
+        if builder is None:
+            if evento != "start_map" or prefixo not in alvos:
+                continue
+            builder, raiz = ObjectBuilder(), prefixo
+        builder.event(evento, valor)
+        if evento == "end_map" and prefixo == raiz:
+            yield builder.value
+            builder = None
+
+
+def _por_na_fila(fila: queue.Queue, item, parar: threading.Event) -> bool:
+    """put numa fila limitada; False se o consumidor parou enquanto esperava."""
+    while not parar.is_set():
+        try:
+            fila.put(item, timeout=0.5)
+            return True
+        except queue.Full:
             continue
-        sigla  = (_get(m, "Sigla") or _get(dados, "SiglaSubtipoMateria", "SiglaMateria")
-                  or _get(ident, "SiglaSubtipoMateria", "SiglaMateria"))
-        numero = _get(m, "Numero") or _get(dados, "NumeroMateria") or _get(ident, "NumeroMateria")
-        ano    = _get(m, "Ano")    or _get(dados, "AnoMateria")    or _get(ident, "AnoMateria")
-        data   = _get(m, "Data")   or _get(dados, "DataApresentacao") or _get(m, "DataApresentacao")
-        ementa = (_get(m, "Ementa") or _get(dados, "EmentaMateria") or _get(m, "EmentaMateria") or "")
-
-        # ---- autores (API + fallback texto) ----
-        autor_str = _get(m, "Autor")
-        nomes, partidos, ufs = [], [], []
-        for bloco in ("Autoria","Autores"):
-            b = m.get(bloco)
-            if isinstance(b, dict):
-                alist = b.get("Autor")
-                alist = alist if isinstance(alist, list) else [alist]
-                for a in alist or []:
-                    if not isinstance(a, dict): 
+    return False
+
+
+@lru_cache(maxsize=None)
+def _tem_ijson() -> bool:
+    try:
+        import ijson  # noqa: F401
+    except ImportError:
+        print("ijson não instalado; lista.json do Senado lido de uma vez.")
+        return False
+    return True
+
+
+def _senado_listar(params: dict):
+    """Matérias da pesquisa do Senado, uma a uma (ver SENADO_STREAMING)."""
+    if SENADO_STREAMING and _tem_ijson():
+        yield from _senado_listar_stream(params)
+        return
+    r = _get_senado(BASE_PESQUISA_SF, params=params, timeout=60); r.raise_for_status()
+    yield from _materias_do_json(r.json())
+
+
+def _senado_listar_stream(params: dict):
+    r = _get_senado(BASE_PESQUISA_SF, params=params, timeout=60, stream=True); r.raise_for_status()
+    r.raw.decode_content = True  # gzip/deflate, como no r.json()
+    fila: queue.Queue = queue.Queue(maxsize=SENADO_FILA)
+    fim, parar = object(), threading.Event()
+
+    def ler():
+        try:
+            for m in _materias_em_stream(r.raw):
+                if not _por_na_fila(fila, m, parar):
+                    return
+            _por_na_fila(fila, fim, parar)
+        except BaseException as e:
+            _por_na_fila(fila, e, parar)
+
+    threading.Thread(target=ler, daemon=True).start()
+    try:
+        while True:
+            m = fila.get()
+            if m is fim:
+                return
+            if isinstance(m, BaseException):
+                raise m
+            yield m
+    finally:
+        # consumidor parou antes (prazo, falha no enriquecimento): solta a conexão
+        parar.set()
+        r.close()
+
+# Janela da pesquisa em pedaços. Num backfill (ou na volta de uma queda) o
+# lista.json da janela inteira era uma resposta só: lenta, e um timeout nela
+# derrubava a coleta do bloco todo; uma resposta com SENADO_LISTA_TETO matérias
+# ou mais pode ter sido cortada pelo servidor. A janela agora é pedida em
+# sub-janelas de até SENADO_LISTA_DIAS, SENADO_LISTA_PARALELO de cada vez, e a
+# sub-janela que falha de um jeito que uma menor evita (timeout, conexão caída,
+# 5xx depois do retry, JSON truncado) ou que volta no teto é dividida ao meio e
+# pedida de novo, até um dia. Cada sub-janela continua em streaming; as matérias
+# saem conforme chegam, sem repetir CodigoMateria (a metade pedida de novo traz
+# as que já tinham saído).
+SENADO_LISTA_DIAS = max(1, int(os.getenv("SENADO_LISTA_DIAS", "3")))
+SENADO_LISTA_PARALELO = max(1, int(os.getenv("SENADO_LISTA_PARALELO", "3")))
+SENADO_LISTA_TETO = int(os.getenv("SENADO_LISTA_TETO", "1000"))  # 0 desliga
+
+
+def _codigo_materia(m: dict) -> str:
+    ident = m.get("IdentificacaoMateria") if isinstance(m.get("IdentificacaoMateria"), dict) else {}
+    return str(_get(m, "Codigo") or _get(ident, "CodigoMateria") or "")
+
+
+def _falha_divisivel(e: BaseException) -> bool:
+    import requests
+    from urllib3.exceptions import HTTPError as Urllib3Error
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and e.response.status_code >= 500
+    truncado: tuple = (ValueError,)
+    if _tem_ijson():
+        import ijson
+        truncado += (ijson.JSONError,)
+    return isinstance(e, (requests.RequestException, Urllib3Error, *truncado))
+
+
+def _senado_listar_janela(inicio: date, fim: date):
+    """Matérias apresentadas de `inicio` a `fim`, por sub-janelas (ver SENADO_LISTA_DIAS)."""
+    # limitada como a do _senado_listar_stream: sub-janelas em paralelo não
+    # podem acumular as listas inteiras à frente do enriquecimento
+    fila: queue.Queue = queue.Queue(maxsize=SENADO_FILA)
+    parar = threading.Event()
+
+    def listar(a: date, b: date):
+        params = {"dataInicioApresentacao": f"{a:%Y%m%d}", "dataFimApresentacao": f"{b:%Y%m%d}"}
+        n = 0
+        try:
+            with perfil.trecho("senado:lista", janela=f"{a:%Y-%m-%d} a {b:%Y-%m-%d}"):
+                for m in _senado_listar(params):
+                    if isinstance(m, dict):
+                        n += 1
+                        if not _por_na_fila(fila, ("materia", m), parar):
+                            return
+            _por_na_fila(fila, ("fim", (a, b), n), parar)
+        except BaseException as e:
+            _por_na_fila(fila, ("erro", (a, b), e), parar)
+
+    ex = ThreadPoolExecutor(max_workers=SENADO_LISTA_PARALELO)
+    pendentes = 0
+
+    def pedir(a: date, b: date):
+        nonlocal pendentes
+        pendentes += 1
+        ex.submit(listar, a, b)
+
+    vistos: set[str] = set()
+    try:
+        for a, b in _blocos(inicio, fim, SENADO_LISTA_DIAS):
+            pedir(a, b)
+        while pendentes:
+            msg = fila.get()
+            if msg[0] == "materia":
+                codigo = _codigo_materia(msg[1])
+                if codigo:
+                    if codigo in vistos:
                         continue
-                    nome = a.get("NomeAutor") or a.get("NomeParlamentar")
-                    partido = (a.get("SiglaPartidoAutor") or a.get("SiglaPartido")
-                               or a.get("PartidoAutor") or a.get("Partido"))
-                    uf = a.get("UfAutor") or a.get("SiglaUF") or a.get("UF")
-                    if nome: nomes.append(nome)
-                    partidos.append(partido if partido else None)
-                    ufs.append(uf if uf else None)
-
-        if _normalize(autor_str) == _normalize("Câmara dos Deputados"):
-            autor_page = _senado_primeira_autoria_da_pagina(codigo)
-            if autor_page:
-                autor_str = autor_page
-
-        if autor_str:
-            n2, p2, u2 = _parse_autores_senado_texto(autor_str)
-            if n2 and not nomes: nomes = n2
-            if any(p2) and not any(partidos): partidos = p2
-            if any(u2) and not any(ufs): ufs = u2
-
-        # granular + coautores "Nome (PARTIDO/UF)"
-        if nomes:
-            ap_nome = nomes[0]
-            ap_part = partidos[0] if len(partidos) else None
-            ap_uf   = ufs[0] if len(ufs) else None
-            co_list = []
-            for i in range(1, len(nomes)):
-                p = partidos[i] if i < len(partidos) else None
-                u = ufs[i] if i < len(ufs) else None
-                co_list.append(_label_with_party_uf(nomes[i], p, u))
-            co_list = _dedup_preserve([x for x in co_list if x])
-            coau = ", ".join(co_list)
-            qtd_coaut = len(co_list)
-        else:
-            ap_nome = autor_str or ""
-            ap_part = None
-            ap_uf   = None
-            coau    = ""
-            qtd_coaut = 0
-        ap_tipo = _infer_tipo_autor(ap_nome)
-
-        it_url, _ = _senado_inteiro_teor(codigo)
-        kw_str, clientes_str, temas_str = _extract_kw_client_theme(ementa)
-
-        rows.append({
-            "UID": f"Senado:{codigo}",
-            "Casa Atual": "Senado",
-            "Sigla": sigla, "Número": numero, "Ano": ano,
-            "Data Apresentação": _fmt_date(data),
-            "Ementa": ementa,
-            "Palavras Chave": kw_str,
-            "Clientes": clientes_str,
-            "Temas": temas_str,
-            # autoria granular
-            "Autor Principal": ap_nome,
-            "Autor Principal Partido": ap_part or "",
-            "Autor Principal UF": ap_uf or "",
-            "Autor Principal Tipo": ap_tipo,
-            "Coautores": coau,
-            "Qtd Coautores": str(qtd_coaut),
-            # links / auditoria
-            "Link Página": f"https://www25.senado.leg.br/web/atividade/materias/-/materia/{codigo}",
-            "Inteiro Teor URL": it_url or "",
-            "Ingest At": _fmt_dt(now_br()),
-        })
+                    vistos.add(codigo)
+                yield msg[1]
+                continue
+            pendentes -= 1
+            tipo, (a, b), res = msg
+            if tipo == "erro":
+                if a == b or not _falha_divisivel(res):
+                    raise res
+                motivo = f"{type(res).__name__}: {res}"
+            elif SENADO_LISTA_TETO and res >= SENADO_LISTA_TETO:
+                if a == b:
+                    print(f"::warning::[Senado] {a:%Y-%m-%d}: {res} matérias, no teto de "
+                          f"SENADO_LISTA_TETO; a lista do dia pode estar incompleta.")
+                    continue
+                motivo = f"{res} matérias, no teto"
+            else:
+                continue
+            meio = a + (b - a) // 2
+            print(f"[Senado] lista {a:%Y-%m-%d} a {b:%Y-%m-%d} ({motivo}): dividindo ao meio.")
+            pedir(a, meio)
+            pedir(meio + timedelta(days=1), b)
+    finally:
+        # consumidor parou antes ou uma sub-janela falhou de vez: as outras param
+        parar.set()
+        ex.shutdown(wait=False, cancel_futures=True)
+
+
+def _autoria_senado(nomes: list, partidos: list, ufs: list, autor_str: str | None) -> dict:
+    """Autor principal e coautores "Nome (PARTIDO/UF)", no formato de
+    _autores_camara_completo. `autor_str` completa o que a API não trouxe."""
+    if autor_str:
+        n2, p2, u2 = _parse_autores_senado_texto(autor_str)
+        if n2 and not nomes: nomes = n2
+        if any(p2) and not any(partidos): partidos = p2
+        if any(u2) and not any(ufs): ufs = u2
+
+    if nomes:
+        ap_nome = nomes[0]
+        ap_part = partidos[0] if len(partidos) else None
+        ap_uf   = ufs[0] if len(ufs) else None
+        co_list = []
+        for i in range(1, len(nomes)):
+            p = partidos[i] if i < len(partidos) else None
+            u = ufs[i] if i < len(ufs) else None
+            co_list.append(_label_with_party_uf(nomes[i], p, u))
+        co_list = _dedup_preserve([x for x in co_list if x])
+    else:
+        ap_nome = autor_str or ""
+        ap_part = None
+        ap_uf   = None
+        co_list = []
+    return {
+        "ap_nome": _s(ap_nome),
+        "ap_partido": ap_part or "",
+        "ap_uf": ap_uf or "",
+        "ap_tipo": _infer_tipo_autor(ap_nome),
+        "coautores": ", ".join(co_list),
+        "qtd_coaut": str(len(co_list)),
+    }
+
+#                 AUTORIA DE ORIGEM (Câmara → Senado)
+# Matéria que chega ao Senado vinda da Câmara tem "Câmara dos Deputados" como
+# Autor, e o autor de verdade saía da página HTML da matéria, raspada uma a uma
+# (a chamada mais lenta e frágil do Senado). Desde a numeração única de 2019,
+# PL, PLP e PDL mantêm sigla/número/ano nas duas casas: o índice abaixo, feito
+# das linhas da Câmara que já coletamos e enriquecemos (arquivo Parquet, aba
+# geral da Câmara e as coletadas por este processo), dá autor principal,
+# partido/UF e coautores sem request. A página fica só para o que não está nele.
+INDICE_CAMARA_SIGLAS = {s.strip().upper() for s in os.getenv("INDICE_CAMARA_SIGLAS", "PL,PLP,PDL").split(",")
+                        if s.strip()}
+
+# antes da numeração única o PL da Câmara ganhava outro número no Senado, e o
+# mesmo sigla/número/ano pode ser outra proposição: essas vão à página
+_NUMERACAO_UNICA_DESDE = 2019
+
+_INDICE_CAMARA: dict[tuple[str, str, str], dict[str, str]] = {}
+_INDICE_CAMARA_CARREGADO = False
+_ORIGEM_CONT = {"indice": 0, "pagina": 0}
+
+
+def _chave_origem(sigla, numero, ano) -> tuple[str, str, str] | None:
+    sigla = str(sigla or "").strip().upper()
+    numero = re.sub(r"\D", "", str(numero or "")).lstrip("0")
+    ano = str(ano or "").strip()
+    if sigla not in INDICE_CAMARA_SIGLAS or not numero or not re.fullmatch(r"\d{4}", ano):
+        return None
+    if int(ano) < _NUMERACAO_UNICA_DESDE:
+        return None
+    return sigla, numero, ano
+
+
+def _indexar_linhas(linhas) -> None:
+    """Linhas {coluna: valor} da Câmara → índice (só as que têm autor)."""
+    for d in linhas:
+        if not str(d.get("UID") or "").startswith("Camara:") or not d.get("Autor Principal"):
+            continue
+        chave = _chave_origem(d.get("Sigla"), d.get("Número"), d.get("Ano"))
+        if chave:
+            _INDICE_CAMARA[chave] = {k: str(d.get(col) or "") for k, col in _AUTORIA_COLUNA.items()}
+
+
+def _indexar_camara(registros: list[Proposicao]) -> None:
+    _indexar_linhas({col: getattr(p, attr) for col, attr in _COLUNA_ATRIBUTO.items()}
+                    for p in registros)
+
+
+@perfil.perfilado("senado:índice de autoria")
+def _carregar_indice_camara() -> None:
+    global _INDICE_CAMARA_CARREGADO
+    _INDICE_CAMARA_CARREGADO = True
+    try:
+        df = ler_arquivo(colunas=["UID", "Sigla", "Número", "Ano", *_AUTORIA_COLUNA.values()])
+        _indexar_linhas(df.to_dict("records"))
+    except Exception as e:
+        print(f"[Senado] índice de autoria: arquivo Parquet ilegível ({type(e).__name__}: {e}).")
+    if SPREADSHEET_ID:
+        try:
+            valores = _open_sheet(SPREADSHEET_ID).worksheet(SHEET_CAMARA).get_all_values()
+            if valores:
+                header = [h.strip() for h in valores[0]]
+                _indexar_linhas(dict(zip(header, row)) for row in valores[1:])
+        except Exception as e:
+            print(f"[Senado] índice de autoria: aba da Câmara ilegível ({type(e).__name__}: {e}).")
+    print(f"[Senado] índice de autoria da Câmara: {len(_INDICE_CAMARA)} proposições.")
+
+
+def _autoria_de_origem(sigla, numero, ano) -> dict[str, str] | None:
+    """Autoria (formato de _autoria_senado) da proposição de origem na Câmara."""
+    chave = _chave_origem(sigla, numero, ano)
+    if chave is None:
+        return None
+    if not _INDICE_CAMARA_CARREGADO:
+        _carregar_indice_camara()
+    return _INDICE_CAMARA.get(chave)
+
+@perfil.perfilado("senado:coleta")
+def senado_registros(inicio: date | None = None, fim: date | None = None) -> list[Proposicao]:
+    inicio, fim = inicio or _dia_inicial(), fim or _base_date()
 
-    _resumo_coleta("Senado", vistas, puladas, len(rows))
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df = df.sort_values(["Data Apresentação","UID"], ascending=[False, False]).reset_index(drop=True)
-    return df
+    rows = []
+    vistas = puladas = 0
+    estagio = _EstagioCPU()
+    try:
+        for m in _senado_listar_janela(inicio, fim):
+            if not isinstance(m, dict):
+                continue
+            if _parar():
+                raise PrazoEsgotado()
+            vistas += 1
+            dados = m.get("DadosBasicosMateria", {}) if isinstance(m.get("DadosBasicosMateria"), dict) else {}
+            ident = m.get("IdentificacaoMateria", {}) if isinstance(m.get("IdentificacaoMateria"), dict) else {}
+
+            codigo = _get(m, "Codigo") or _get(ident, "CodigoMateria")
+            # já está na planilha: não gasta chamadas de autoria/inteiro teor
+            if codigo and _ja_gravado(f"Senado:{codigo}"):
+                puladas += 1
+                continue
+            sigla  = (_get(m, "Sigla") or _get(dados, "SiglaSubtipoMateria", "SiglaMateria")
+                      or _get(ident, "SiglaSubtipoMateria", "SiglaMateria"))
+            numero = _get(m, "Numero") or _get(dados, "NumeroMateria") or _get(ident, "NumeroMateria")
+            ano    = _get(m, "Ano")    or _get(dados, "AnoMateria")    or _get(ident, "AnoMateria")
+            data   = _get(m, "Data")   or _get(dados, "DataApresentacao") or _get(m, "DataApresentacao")
+            ementa = (_get(m, "Ementa") or _get(dados, "EmentaMateria") or _get(m, "EmentaMateria") or "")
+
+            # ---- autores (API + fallback texto) ----
+            autor_str = _get(m, "Autor")
+            nomes, partidos, ufs = [], [], []
+            for bloco in ("Autoria","Autores"):
+                b = m.get(bloco)
+                if isinstance(b, dict):
+                    alist = b.get("Autor")
+                    alist = alist if isinstance(alist, list) else [alist]
+                    for a in alist or []:
+                        if not isinstance(a, dict): 
+                            continue
+                        nome = a.get("NomeAutor") or a.get("NomeParlamentar")
+                        partido = (a.get("SiglaPartidoAutor") or a.get("SiglaPartido")
+                                   or a.get("PartidoAutor") or a.get("Partido"))
+                        uf = a.get("UfAutor") or a.get("SiglaUF") or a.get("UF")
+                        if nome: nomes.append(nome)
+                        partidos.append(partido if partido else None)
+                        ufs.append(uf if uf else None)
+
+            origem = html = None
+            if _normalize(autor_str) == _normalize("Câmara dos Deputados"):
+                origem = _autoria_de_origem(sigla, numero, ano)
+                if origem:
+                    _ORIGEM_CONT["indice"] += 1
+                elif _degradado():
+                    _pendente(f"Senado:{codigo}", "autoria")
+                else:
+                    _ORIGEM_CONT["pagina"] += 1
+                    html = _senado_pagina_materia(codigo)  # o parse vai para o estágio de CPU
+            autores = origem or _autoria_senado(nomes, partidos, ufs, autor_str)
+
+            if _degradado():
+                _pendente(f"Senado:{codigo}", "inteiro_teor")
+                it_url = None
+            else:
+                it_url, _ = _senado_inteiro_teor(codigo)
+
+            p = Proposicao(
+                uid=f"Senado:{codigo}",
+                casa="Senado",
+                sigla=_s(sigla), numero=_s(numero), ano=_s(ano),
+                data_apresentacao=_fmt_date(data),
+                ementa=_s(ementa),
+                # palavras-chave/clientes/temas: preenchidos pelo estágio de CPU
+                palavras_chave="", clientes="", temas="",
+                # autoria granular
+                autor_principal=autores["ap_nome"],
+                autor_partido=autores["ap_partido"],
+                autor_uf=autores["ap_uf"],
+                autor_tipo=autores["ap_tipo"],
+                coautores=autores["coautores"],
+                qtd_coautores=autores["qtd_coaut"],
+                # links / auditoria
+                link_pagina=f"https://www25.senado.leg.br/web/atividade/materias/-/materia/{codigo}",
+                inteiro_teor_url=it_url or "",
+                ingest_at=_fmt_dt(now_br()),
+            )
+            rows.append(p)
+            estagio.enviar(_extract_kw_client_theme, p.ementa, lambda kw, p=p: _aplicar_kw(p, kw))
+            if html:
+                estagio.enviar(_autoria_da_pagina, html,
+                               lambda autor, p=p, a=(nomes, partidos, ufs):
+                               autor and _aplicar_autoria(p, _autoria_senado(*a, autor)))
+    except PrazoEsgotado:
+        # do _parar() acima ou de um GET cortado pelo prazo (_no_prazo) no meio do
+        # enriquecimento: a proposição do meio fica para o próximo run
+        estagio.concluir()
+        raise PrazoEsgotado(rows) from None
+
+    estagio.concluir()
+    _resumo_coleta("Senado", vistas, puladas, len(rows), inicio, fim)
+    if any(_ORIGEM_CONT.values()):
+        print(f"[Senado] autoria de matérias da Câmara: {_ORIGEM_CONT['indice']} pelo índice, "
+              f"{_ORIGEM_CONT['pagina']} pela página.")
+    return rows
+
+
+def senado_df_hoje() -> pd.DataFrame:
+    return registros_para_df(_ordenar(senado_registros()))
 
 #                       CÂMARA
 BASE_CAMARA = "https://dadosabertos.camara.leg.br/api/v2/proposicoes"
@@ -531,14 +1438,24 @@ def _parse_data_apresentacao_camara_text(v: str | None) -> str | None:
     v = str(v).strip()
     if len(v) >= 10 and re.match(r"\d{4}-\d{2}-\d{2}", v):
         return v[:10]
+    import pandas as pd
     try:
         ts = pd.to_datetime(v, errors="raise")
         return ts.strftime("%Y-%m-%d")
     except Exception:
         return None
 
+# Partido/UF por deputado. O mesmo deputado assina dezenas de proposições num
+# run (e, no modo serviço, em todos os ciclos); só respostas boas entram, e
+# valem DEPUTADOS_CACHE_HORAS, para troca de partido aparecer no dia seguinte.
+DEPUTADOS_CACHE_HORAS = float(os.getenv("DEPUTADOS_CACHE_HORAS", "24"))
+_DEPUTADOS: dict[int, tuple[float, str | None, str | None]] = {}
+
 def _get_deputado_partido_uf(dep_id: int):
     if not dep_id: return (None, None)
+    hit = _DEPUTADOS.get(dep_id)
+    if hit and time.monotonic() - hit[0] < DEPUTADOS_CACHE_HORAS * 3600:
+        return hit[1], hit[2]
     try:
         r = _get_default(f"{BASE_DEP}/{dep_id}", timeout=25)
         r.raise_for_status()
@@ -546,11 +1463,15 @@ def _get_deputado_partido_uf(dep_id: int):
         status = dados.get("ultimoStatus", {}) if isinstance(dados.get("ultimoStatus"), dict) else {}
         partido = status.get("siglaPartido") or dados.get("siglaPartido")
         uf = status.get("siglaUf") or dados.get("uf")
+        _DEPUTADOS[dep_id] = (time.monotonic(), partido, uf)
         return partido, uf
     except Exception:
         return (None, None)
 
-def _autores_camara_completo(prop_id:int) -> dict:
+@perfil.perfilado("câmara:autores")
+def _autores_camara_completo(prop_id:int, partidos: bool = True) -> dict:
+    """`partidos=False` pula a consulta de partido/UF de cada deputado (uma
+    chamada por autor), usada quando o run está perto do prazo."""
     out = []
     url = f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{prop_id}/autores"
     try:
@@ -561,7 +1482,7 @@ def _autores_camara_completo(prop_id:int) -> dict:
             tipo = (a.get("tipo") or a.get("tipoAutor") or a.get("tipoAssinatura") or "").strip()
             ordem = a.get("ordemAssinatura") or a.get("ordem")
             dep_id = _last_int_from_uri(uri) if uri and "/deputados/" in uri else None
-            partido, uf = _get_deputado_partido_uf(dep_id) if dep_id else (None, None)
+            partido, uf = _get_deputado_partido_uf(dep_id) if dep_id and partidos else (None, None)
             out.append({
                 "nome": nome,
                 "partido": partido or "",
@@ -611,6 +1532,7 @@ def _autores_camara_completo(prop_id:int) -> dict:
         "qtd_coaut": str(qtd_coaut),
     }
 
+@perfil.perfilado("câmara:inteiro teor")
 def _camara_inteiro_teor(prop_id:int):
     try:
         r = _get_default(f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{prop_id}", timeout=30)
@@ -650,71 +1572,468 @@ def _camara_inteiro_teor(prop_id:int):
         pass
     return None, None
 
-def camara_df_hoje() -> pd.DataFrame:
-    params = {"dataApresentacaoInicio": inicio_iso(),
-              "dataApresentacaoFim": today_iso(),
+# Paginação incremental. A listagem já vem por id decrescente, e nos runs do
+# meio do dia quase toda página depois da primeira é de ids já processados.
+# Para cada janela guardo o maior id de uma listagem que foi até o fim (e cujas
+# linhas foram gravadas); como a ordem é decrescente, a paginação para assim
+# que uma página alcança esse id: as seguintes estão todas abaixo dele.
+# A cada CAMARA_VARREDURA_HORAS uma varredura completa pega o que tiver sido
+# cadastrado fora de ordem. CAMARA_INCREMENTAL=0 desliga.
+CAMARA_INCREMENTAL = os.getenv("CAMARA_INCREMENTAL", "1").strip() in ("1","true","True","yes","on")
+CAMARA_VARREDURA_HORAS = float(os.getenv("CAMARA_VARREDURA_HORAS", "24"))
+
+
+def _camara_fronteiras() -> dict[str, int]:
+    return dict(_ESTADO_APOS_GRAVAR.get("camara:fronteiras")
+                or _estado_ler("camara:fronteiras", {}) or {})
+
+
+def _camara_fronteira(chave: str) -> int | None:
+    """Fronteira da janela, ou None quando a listagem tem que ser completa."""
+    if _DATA_OVERRIDE or not CAMARA_INCREMENTAL:
+        return None
+    ultima = _estado_ler("camara:ultima_varredura")
+    if not ultima or (now_br() - datetime.fromisoformat(ultima)).total_seconds() >= CAMARA_VARREDURA_HORAS * 3600:
+        return None
+    return _camara_fronteiras().get(chave)
+
+
+@perfil.perfilado("câmara:coleta")
+def camara_registros(inicio: date | None = None, fim: date | None = None) -> list[Proposicao]:
+    inicio, fim = inicio or _dia_inicial(), fim or _base_date()
+    params = {"dataApresentacaoInicio": f"{inicio:%Y-%m-%d}",
+              "dataApresentacaoFim": f"{fim:%Y-%m-%d}",
               "ordem":"DESC","ordenarPor":"id","itens":100,"pagina":1}
+    chave = f"{inicio:%Y-%m-%d}:{fim:%Y-%m-%d}"
+    fronteira = _camara_fronteira(chave)
+    maior_id = 0
     rows = []
     vistas = puladas = 0
-    while True:
-        r = _get_default(BASE_CAMARA, params=params, timeout=60); r.raise_for_status()
-        j = r.json()
-        for d in j.get("dados", []):
-            pid = d.get("id")
-            vistas += 1
-            # já está na planilha: não gasta chamadas de autoria/inteiro teor
-            if _ja_gravado(f"Camara:{pid}"):
-                puladas += 1
-                continue
-            data = _parse_data_apresentacao_camara_text(d.get("dataApresentacao"))
-            if data is None:
-                try:
-                    r2 = _get_default(f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{pid}", timeout=20)
-                    if r2.status_code == 200:
-                        det = r2.json().get("dados", {})
-                        data = (_parse_data_apresentacao_camara_text(det.get("dataApresentacao"))
-                                or _parse_data_apresentacao_camara_text((det.get("statusProposicao") or {}).get("dataHora")))
-                except Exception:
-                    pass
-
-            autores = _autores_camara_completo(pid)
-            it_url, _ = _camara_inteiro_teor(pid)
-            ementa = d.get("ementa", "") or ""
-            kw_str, clientes_str, temas_str = _extract_kw_client_theme(ementa)
-
-            rows.append({
-                "UID": f"Camara:{pid}",
-                "Casa Atual": "Camara",
-                "Sigla": d.get("siglaTipo"),
-                "Número": d.get("numero"),
-                "Ano": d.get("ano"),
-                "Data Apresentação": _fmt_date(data),
-                "Ementa": ementa,
-                "Palavras Chave": kw_str,
-                "Clientes": clientes_str,
-                "Temas": temas_str,
-                # autoria granular
-                "Autor Principal": autores.get("ap_nome",""),
-                "Autor Principal Partido": autores.get("ap_partido",""),
-                "Autor Principal UF": autores.get("ap_uf",""),
-                "Autor Principal Tipo": autores.get("ap_tipo",""),
-                "Coautores": autores.get("coautores",""),
-                "Qtd Coautores": autores.get("qtd_coaut","0"),
-                # links / auditoria
-                "Link Página": f"https://www.camara.leg.br/propostas-legislativas/{pid}",
-                "Inteiro Teor URL": it_url or "",
-                "Ingest At": _fmt_dt(now_br()),
-            })
-        next_link = next((lk for lk in j.get("links", []) if lk.get("rel")=="next"), None)
-        if not next_link: break
-        params["pagina"] += 1
-        time.sleep(0.15)
+    estagio = _EstagioCPU()
+    try:
+        while True:
+            r = _get_default(BASE_CAMARA, params=params, timeout=60); r.raise_for_status()
+            j = r.json()
+            dados = j.get("dados", [])
+            ids = [d.get("id") for d in dados if isinstance(d.get("id"), int)]
+            maior_id = max([maior_id, *ids])
+            if fronteira is not None and ids and max(ids) <= fronteira:
+                print(f"[Câmara] página {params['pagina']} toda abaixo da fronteira "
+                      f"{fronteira}; paginação encerrada.")
+                break
+            for d in dados:
+                if _parar():
+                    raise PrazoEsgotado()
+                pid = d.get("id")
+                vistas += 1
+                # já está na planilha (ou abaixo da fronteira, logo já processado):
+                # não gasta chamadas de autoria/inteiro teor
+                if _ja_gravado(f"Camara:{pid}") or (
+                        fronteira is not None and isinstance(pid, int) and pid <= fronteira):
+                    puladas += 1
+                    continue
+                data = _parse_data_apresentacao_camara_text(d.get("dataApresentacao"))
+                if data is None:
+                    try:
+                        r2 = _get_default(f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{pid}", timeout=20)
+                        if r2.status_code == 200:
+                            det = r2.json().get("dados", {})
+                            data = (_parse_data_apresentacao_camara_text(det.get("dataApresentacao"))
+                                    or _parse_data_apresentacao_camara_text((det.get("statusProposicao") or {}).get("dataHora")))
+                    except Exception:
+                        pass
+
+                if _degradado():
+                    _pendente(f"Camara:{pid}", "autoria")
+                    _pendente(f"Camara:{pid}", "inteiro_teor")
+                    autores = _autores_camara_completo(pid, partidos=False)
+                    it_url = None
+                else:
+                    autores = _autores_camara_completo(pid)
+                    it_url, _ = _camara_inteiro_teor(pid)
+                ementa = d.get("ementa", "") or ""
+
+                p = Proposicao(
+                    uid=f"Camara:{pid}",
+                    casa="Camara",
+                    sigla=_s(d.get("siglaTipo")),
+                    numero=_s(d.get("numero")),
+                    ano=_s(d.get("ano")),
+                    data_apresentacao=_fmt_date(data),
+                    ementa=ementa,
+                    # palavras-chave/clientes/temas: preenchidos pelo estágio de CPU
+                    palavras_chave="", clientes="", temas="",
+                    # autoria granular
+                    autor_principal=autores.get("ap_nome",""),
+                    autor_partido=autores.get("ap_partido",""),
+                    autor_uf=autores.get("ap_uf",""),
+                    autor_tipo=autores.get("ap_tipo",""),
+                    coautores=autores.get("coautores",""),
+                    qtd_coautores=autores.get("qtd_coaut","0"),
+                    # links / auditoria
+                    link_pagina=f"https://www.camara.leg.br/propostas-legislativas/{pid}",
+                    inteiro_teor_url=it_url or "",
+                    ingest_at=_fmt_dt(now_br()),
+                )
+                rows.append(p)
+                estagio.enviar(_extract_kw_client_theme, ementa, lambda kw, p=p: _aplicar_kw(p, kw))
+            if fronteira is not None and ids and min(ids) <= fronteira:
+                break  # as próximas páginas estão todas abaixo da fronteira
+            next_link = next((lk for lk in j.get("links", []) if lk.get("rel")=="next"), None)
+            if not next_link: break
+            if _parar():
+                raise PrazoEsgotado()
+            params["pagina"] += 1
+            time.sleep(0.15)
+    except PrazoEsgotado:
+        # do _parar() acima ou de um GET cortado pelo prazo (_no_prazo) no meio do
+        # enriquecimento: a proposição do meio fica para o próximo run
+        estagio.concluir()
+        raise PrazoEsgotado(rows) from None
+
+    if not _DATA_OVERRIDE and CAMARA_INCREMENTAL:
+        fr = _camara_fronteiras()
+        # sai e volta no fim: o dict fica na ordem do último uso, e o corte
+        # (só as janelas recentes interessam) descarta as usadas há mais tempo
+        fr[chave] = max(fr.pop(chave, 0), maior_id, fronteira or 0)
+        _ESTADO_APOS_GRAVAR["camara:fronteiras"] = dict(list(fr.items())[-10:])
+        if fronteira is None:
+            _ESTADO_APOS_GRAVAR.setdefault("camara:ultima_varredura", now_br().isoformat())
+
+    estagio.concluir()
+    _resumo_coleta("Câmara", vistas, puladas, len(rows), inicio, fim)
+    return rows
 
-    _resumo_coleta("Câmara", vistas, puladas, len(rows))
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df = df.sort_values(["Data Apresentação","UID"], ascending=[False, False]).reset_index(drop=True)
-    return df
+
+def camara_df_hoje() -> pd.DataFrame:
+    return registros_para_df(_ordenar(camara_registros()))
+
+
+#                 CÂMARA — ARQUIVOS ANUAIS (carga em lote)
+# Para backfill, paginar /proposicoes e enriquecer id a id é o caminho mais
+# lento: três a dez chamadas por proposição. A Câmara publica por ano um CSV
+# das proposições e outro dos autores (já com partido/UF de cada deputado na
+# data da assinatura). Aqui eles são baixados uma vez para CAMARA_DUMP_DIR
+# (ou colocados lá à mão), cruzados em memória com pandas e passam pelo mesmo
+# matcher e pelo mesmo Proposicao da coleta pela API.
+# Os arquivos são regerados de madrugada, então não têm o dia corrente:
+# com CAMARA_DUMP=auto (padrão) só os blocos da janela que terminam antes de
+# CAMARA_DUMP_DEFASAGEM_DIAS vêm deles (ex.: depois de uma queda longa), o
+# resto continua pela API. "1" usa sempre os arquivos, "0" nunca.
+# Diferença para a API: o partido/UF dos autores é o da data da assinatura
+# (está no arquivo), não o atual do deputado. Um backfill com DATA_OVERRIDE
+# de um dia passado cai no "auto" e sai com o partido da época; CAMARA_DUMP=0
+# mantém o comportamento antigo (partido atual, pela API).
+CAMARA_DUMP = os.getenv("CAMARA_DUMP", "auto").strip().lower()
+CAMARA_DUMP_DIR = os.getenv("CAMARA_DUMP_DIR", ".cache/camara_dumps").strip()
+CAMARA_DUMP_DEFASAGEM_DIAS = max(1, int(os.getenv("CAMARA_DUMP_DEFASAGEM_DIAS", "2")))
+CAMARA_DUMP_MAX_HORAS = float(os.getenv("CAMARA_DUMP_MAX_HORAS", "24"))
+BASE_ARQUIVOS_CAMARA = "https://dadosabertos.camara.leg.br/arquivos"
+
+
+def _camara_dump_arquivo(tipo: str, ano: int) -> str:
+    """Caminho local do CSV anual `tipo` ("proposicoes", "proposicoesAutores").
+
+    O arquivo de um ano fechado é baixado uma última vez depois que o ano
+    acabou (mais CAMARA_DUMP_DEFASAGEM_DIAS, o atraso da geração) e não muda
+    mais. Um arquivo baixado durante o ano é parcial e vale por
+    CAMARA_DUMP_MAX_HORAS, como o do ano corrente.
+    """
+    path = os.path.join(CAMARA_DUMP_DIR, f"{tipo}-{ano}.csv")
+    if os.path.exists(path):
+        mtime = os.path.getmtime(path)
+        fechado = (datetime(ano + 1, 1, 1, tzinfo=TZ_BR)
+                   + timedelta(days=CAMARA_DUMP_DEFASAGEM_DIAS)).timestamp()
+        if mtime >= fechado or time.time() - mtime < CAMARA_DUMP_MAX_HORAS * 3600:
+            return path
+    os.makedirs(CAMARA_DUMP_DIR, exist_ok=True)
+    url = f"{BASE_ARQUIVOS_CAMARA}/{tipo}/csv/{tipo}-{ano}.csv"
+    r = _get_default(url, timeout=120, stream=True); r.raise_for_status()
+    tmp = path + ".part"
+    with open(tmp, "wb") as f:
+        for bloco in r.iter_content(1 << 20):
+            f.write(bloco)
+    os.replace(tmp, path)
+    print(f"[Câmara/arquivos] {tipo}-{ano}.csv baixado ({os.path.getsize(path) / 2**20:.1f} MiB).")
+    return path
+
+
+def _camara_dump_ler(tipo: str, anos, colunas: list[str]) -> pd.DataFrame:
+    import pandas as pd
+    return pd.concat([pd.read_csv(_camara_dump_arquivo(tipo, ano), sep=";", dtype=str,
+                                  keep_default_na=False, encoding="utf-8-sig", usecols=colunas)
+                      for ano in anos], ignore_index=True)
+
+
+def _camara_dump_autoria(aut: pd.DataFrame) -> pd.DataFrame:
+    """Por idProposicao, as colunas de autoria de _autores_camara_completo.
+
+    Mesma escolha do autor principal (ordem de assinatura 1; senão tipo
+    "autor"; senão o primeiro deputado; senão o primeiro da lista) e mesmos
+    rótulos "Nome (PARTIDO/UF)" para os coautores, na ordem do arquivo.
+    """
+    import numpy as np
+    import pandas as pd
+
+    aut = aut[aut["nomeAutor"].str.strip() != ""].copy()
+    aut["is_dep"] = aut["uriAutor"].str.contains("/deputados/", regex=False)
+    tipo = aut["tipoAutor"].str
+    aut["rank"] = np.select(
+        [aut["ordemAssinatura"].str.strip() == "1",
+         tipo.contains(r"(?i)\bautor\b") & ~tipo.contains(r"(?i)\bcoautor\b"),
+         aut["is_dep"]],
+        [0, 1, 2], 3)
+    parenteses = (aut["siglaPartidoAutor"].str.strip() + "/"
+                  + aut["siglaUFAutor"].str.strip()).str.strip("/")
+    aut["rotulo"] = aut["nomeAutor"].str.strip() + np.where(parenteses != "", " (" + parenteses + ")", "")
+
+    ap = aut.sort_values(["idProposicao", "rank"], kind="stable").drop_duplicates("idProposicao")
+    co = (aut.drop(index=ap.index).drop_duplicates(["idProposicao", "rotulo"])
+          .groupby("idProposicao", sort=False)["rotulo"])
+    out = pd.DataFrame({
+        "ap_nome": ap["nomeAutor"].values,
+        "ap_partido": ap["siglaPartidoAutor"].values,
+        "ap_uf": ap["siglaUFAutor"].values,
+        "ap_tipo": np.where(ap["is_dep"], "Parlamentar",
+                            ap["nomeAutor"].map(_infer_tipo_autor)),
+    }, index=ap["idProposicao"].values)
+    out["coautores"] = co.agg(", ".join).reindex(out.index, fill_value="")
+    out["qtd_coaut"] = co.size().reindex(out.index, fill_value=0).astype(str)
+    return out
+
+
+@perfil.perfilado("câmara:arquivos anuais")
+def camara_registros_dump(inicio: date | None = None, fim: date | None = None) -> list[Proposicao]:
+    """Proposições da Câmara apresentadas entre `inicio` e `fim`, a partir dos
+    arquivos anuais, sem chamadas por proposição. Mesma saída de
+    camara_registros (já gravadas ficam de fora)."""
+    inicio, fim = inicio or _dia_inicial(), fim or _base_date()
+    import pandas as pd
+
+    anos = range(inicio.year, fim.year + 1)
+    props = _camara_dump_ler("proposicoes", anos, [
+        "id", "siglaTipo", "numero", "ano", "ementa", "dataApresentacao", "urlInteiroTeor"])
+    dia = props["dataApresentacao"].str[:10]
+    props = props[(dia >= f"{inicio:%Y-%m-%d}") & (dia <= f"{fim:%Y-%m-%d}")]
+    vistas = len(props)
+    props = props[~("Camara:" + props["id"]).map(_ja_gravado)]
+
+    aut = _camara_dump_ler("proposicoesAutores", anos, [
+        "idProposicao", "uriAutor", "tipoAutor", "nomeAutor", "siglaPartidoAutor",
+        "siglaUFAutor", "ordemAssinatura"])
+    autoria = _camara_dump_autoria(aut[aut["idProposicao"].isin(props["id"])])
+    # proposição sem autor no arquivo: autoria vazia, como na API
+    props = props.join(autoria, on="id").fillna({c: "" for c in autoria.columns} | {"qtd_coaut": "0"})
+    props["data"] = (pd.to_datetime(props["dataApresentacao"], errors="coerce")
+                     .dt.strftime("%Y-%m-%d").fillna(""))
+    ementas = list(props["ementa"].unique())
+    kw = dict(zip(ementas, _mapear_cpu(_extract_kw_client_theme, ementas)))
+
+    ingest = _fmt_dt(now_br())
+    rows = []
+    for d in props.itertuples(index=False):
+        kw_str, clientes_str, temas_str = kw[d.ementa]
+        rows.append(Proposicao(
+            uid=f"Camara:{d.id}",
+            casa="Camara",
+            sigla=d.siglaTipo, numero=d.numero, ano=d.ano,
+            data_apresentacao=d.data,
+            ementa=d.ementa,
+            palavras_chave=kw_str,
+            clientes=clientes_str,
+            temas=temas_str,
+            # autoria granular
+            autor_principal=d.ap_nome,
+            autor_partido=d.ap_partido,
+            autor_uf=d.ap_uf,
+            autor_tipo=d.ap_tipo,
+            coautores=d.coautores,
+            qtd_coautores=d.qtd_coaut,
+            # links / auditoria
+            link_pagina=f"https://www.camara.leg.br/propostas-legislativas/{d.id}",
+            inteiro_teor_url=d.urlInteiroTeor,
+            ingest_at=ingest,
+        ))
+    _resumo_coleta("Câmara/arquivos", vistas, vistas - len(rows), len(rows), inicio, fim)
+    return rows
+
+
+def _camara_coleta(inicio: date, fim: date) -> list[Proposicao]:
+    """Bloco da janela da Câmara: arquivos anuais ou API (ver CAMARA_DUMP)."""
+    limite = _base_date() - timedelta(days=CAMARA_DUMP_DEFASAGEM_DIAS)
+    if CAMARA_DUMP == "1" or (CAMARA_DUMP == "auto" and fim < limite):
+        return camara_registros_dump(inicio, fim)
+    return camara_registros(inicio, fim)
+
+
+#                 INTEIRO TEOR (match no texto completo)
+# Muitos PLs relevantes têm ementa genérica ("Altera a Lei nº ..."), e o match
+# só via ementa não os pega. Com INTEIRO_TEOR_MATCH=1 o PDF de cada linha nova
+# é baixado em streaming (com teto de tamanho) para um cache local endereçado
+# pelo sha256 do conteúdo, o texto é extraído página a página para um .txt
+# normalizado e o mesmo matcher roda sobre ele. O que só aparece no texto
+# completo vai para "Palavras Chave Inteiro Teor" e entra em Clientes/Temas.
+INTEIRO_TEOR_MATCH = os.getenv("INTEIRO_TEOR_MATCH", "0").strip() in ("1","true","True","yes","on")
+INTEIRO_TEOR_CACHE_DIR = os.getenv("INTEIRO_TEOR_CACHE_DIR", ".cache/inteiro_teor").strip()
+INTEIRO_TEOR_MAX_MB = float(os.getenv("INTEIRO_TEOR_MAX_MB", "15"))
+INTEIRO_TEOR_WORKERS = max(1, int(os.getenv("INTEIRO_TEOR_WORKERS", "4")))
+
+# quantos caracteres da página anterior entram na seguinte, para não perder
+# uma palavra-chave quebrada na virada de página
+_IT_CAUDA = 300
+_IT_INDICE_LOCK = threading.Lock()
+
+
+def _it_path(nome: str) -> str:
+    return os.path.join(INTEIRO_TEOR_CACHE_DIR, nome)
+
+
+def _it_carregar_indice() -> dict[str, str]:
+    """URL → sha256 do conteúdo já baixado."""
+    try:
+        with open(_it_path("urls.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _it_salvar_indice(indice: dict[str, str]) -> None:
+    tmp = _it_path("urls.json.part")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(indice, f)
+    os.replace(tmp, _it_path("urls.json"))
+
+
+def _it_baixar(url: str, indice: dict[str, str]) -> str | None:
+    """Baixa o documento para o cache e devolve o sha256, ou None se não deu.
+
+    O corpo vai direto para um arquivo temporário enquanto é hasheado; passou
+    do teto, a transferência é abortada. Conteúdo repetido (mesmo PDF em duas
+    URLs) fica guardado uma vez só.
+    """
+    sha = indice.get(url)
+    if sha and os.path.exists(_it_path(f"{sha}.pdf")):
+        return sha
+    limite = int(INTEIRO_TEOR_MAX_MB * 1024 * 1024)
+    get = _get_senado if "senado.leg.br" in url else _get_default
+    fd, tmp = tempfile.mkstemp(dir=INTEIRO_TEOR_CACHE_DIR, suffix=".part")
+    try:
+        h, total = hashlib.sha256(), 0
+        with os.fdopen(fd, "wb") as f, get(url, stream=True, timeout=60) as r:
+            if r.status_code != 200:
+                return None
+            if "html" in (r.headers.get("Content-Type") or "").lower():
+                return None  # página de navegação, não o documento
+            tam = r.headers.get("Content-Length") or ""
+            if tam.isdigit() and int(tam) > limite:
+                print(f"[inteiro teor] {url} tem {int(tam) // 2**20} MB; acima do teto, pulando.")
+                return None
+            for chunk in r.iter_content(64 * 1024):
+                total += len(chunk)
+                if total > limite:
+                    print(f"[inteiro teor] {url} passou de {INTEIRO_TEOR_MAX_MB:g} MB; abortado.")
+                    return None
+                h.update(chunk)
+                f.write(chunk)
+        sha = h.hexdigest()
+        destino = _it_path(f"{sha}.pdf")
+        if not os.path.exists(destino):
+            os.replace(tmp, destino)
+        with _IT_INDICE_LOCK:
+            indice[url] = sha
+        return sha
+    except Exception as e:
+        print(f"[inteiro teor] falha ao baixar {url}: {type(e).__name__}: {e}")
+        return None
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _it_texto(sha: str) -> str | None:
+    """Caminho do .txt normalizado (uma linha por página), extraindo se preciso."""
+    txt = _it_path(f"{sha}.txt")
+    if os.path.exists(txt):
+        return txt
+    from pypdf import PdfReader
+    tmp = txt + ".part"
+    try:
+        # com um caminho, o PdfReader copia o arquivo inteiro para um BytesIO;
+        # com o arquivo aberto, ele lê os objetos sob demanda (seek/read). Cada
+        # página é escrita assim que extraída, então o documento nunca fica
+        # inteiro em memória. O arquivo fica aberto enquanto as páginas são lidas.
+        with open(_it_path(f"{sha}.pdf"), "rb") as pdf, open(tmp, "w", encoding="utf-8") as out:
+            for page in PdfReader(pdf).pages:
+                out.write(_normalize_ws(page.extract_text() or "") + "\n")
+        os.replace(tmp, txt)
+        return txt
+    except Exception as e:
+        print(f"[inteiro teor] não deu para extrair o texto de {sha[:12]}: {type(e).__name__}: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None
+
+
+def _it_hits(txt_path: str) -> set[int]:
+    """Roda o matcher página a página; padrão achado sai da lista de pendentes."""
+    pendentes = dict(enumerate(_kw_patterns()))
+    hits: set[int] = set()
+    cauda = ""
+    with open(txt_path, encoding="utf-8") as f:
+        for linha in f:
+            pagina = linha.rstrip("\n")
+            trecho = f"{cauda} {pagina}" if cauda else pagina
+            for i, (pat, *_) in list(pendentes.items()):
+                if pat.search(trecho):
+                    hits.add(i)
+                    del pendentes[i]
+            if not pendentes:
+                break
+            cauda = pagina[-_IT_CAUDA:]
+    return hits
+
+
+@perfil.perfilado("inteiro teor:match")
+def enriquecer_inteiro_teor(registros: list[Proposicao]) -> None:
+    """Estágio opcional: match de palavras-chave no texto completo dos PDFs."""
+    if not INTEIRO_TEOR_MATCH:
+        return
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        print("pypdf não instalado; match no inteiro teor desligado.")
+        return
+    alvos = [p for p in registros if p.inteiro_teor_url]
+    if not alvos:
+        return
+    os.makedirs(INTEIRO_TEOR_CACHE_DIR, exist_ok=True)
+    indice = _it_carregar_indice()
+    no_cache = sum(1 for p in alvos if p.inteiro_teor_url in indice)
+
+    # download é I/O: concorrência limitada; extração e match são CPU, em série
+    with ThreadPoolExecutor(max_workers=INTEIRO_TEOR_WORKERS) as ex:
+        shas = list(ex.map(lambda p: _it_baixar(p.inteiro_teor_url, indice), alvos))
+    _it_salvar_indice(indice)
+
+    hits_por_sha: dict[str, set[int]] = {}
+    for sha in dict.fromkeys(s for s in shas if s):
+        txt = _it_texto(sha)
+        hits_por_sha[sha] = _it_hits(txt) if txt else set()
+
+    so_no_texto = 0
+    for p, sha in zip(alvos, shas):
+        if not sha:
+            continue
+        hits_ementa = _kw_hits(_normalize_ws(p.ementa))
+        extras = hits_por_sha[sha] - hits_ementa
+        if not extras:
+            continue
+        so_no_texto += 1
+        p.palavras_chave_inteiro_teor = _formatar_hits(extras)[0]
+        _, p.clientes, p.temas = _formatar_hits(hits_ementa | extras)
+
+    print(f"[inteiro teor] {len(hits_por_sha)} documentos lidos de {len(alvos)} linhas "
+          f"({no_cache} já no cache); {so_no_texto} com palavras-chave só no texto completo.")
 
 
 #                 INSERÇÃO no Google Sheets (dedupe, topo)
@@ -727,35 +2046,21 @@ SPREADSHEET_ID_CLIENTES = os.environ.get("SPREADSHEET_ID_CLIENTES")
 
 CREDENTIALS_JSON = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "credentials.json")
 
-NEEDED_COLUMNS = [
-    "UID","Casa Atual",
-    "Sigla","Número","Ano",
-    "Data Apresentação","Ementa",
-    "Palavras Chave","Clientes","Temas",
-    # autoria granular
-    "Autor Principal","Autor Principal Partido","Autor Principal UF","Autor Principal Tipo",
-    "Coautores","Qtd Coautores",
-    # links e auditoria
-    "Link Página","Inteiro Teor URL",
-    "Ingest At",
-]
+NEEDED_COLUMNS = list(_COLUNA_ATRIBUTO)
 
-def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    for col in NEEDED_COLUMNS:
-        if col not in df.columns:
-            df[col] = ""
-    for c in NEEDED_COLUMNS:
-        df[c] = df[c].fillna("").astype(str)
-    return df[NEEDED_COLUMNS].copy()
+_gc = None
 
 def _open_sheet(spreadsheet_id: str):
-    import gspread
-    from google.oauth2.service_account import Credentials
-    scopes = ["https://www.googleapis.com/auth/spreadsheets",
-              "https://www.googleapis.com/auth/drive"]
-    creds = Credentials.from_service_account_file(CREDENTIALS_JSON, scopes=scopes)
-    gc = gspread.authorize(creds)
-    return gc.open_by_key(spreadsheet_id)
+    # cliente autenticado uma vez por processo (o token se renova sozinho)
+    global _gc
+    if _gc is None:
+        import gspread
+        from google.oauth2.service_account import Credentials
+        scopes = ["https://www.googleapis.com/auth/spreadsheets",
+                  "https://www.googleapis.com/auth/drive"]
+        creds = Credentials.from_service_account_file(CREDENTIALS_JSON, scopes=scopes)
+        _gc = gspread.authorize(creds)
+    return _gc.open_by_key(spreadsheet_id)
 
 def ensure_headers(spreadsheet_id: str, sheet_names: list[str]):
     """NO-OP: não cria abas e não altera cabeçalhos. Apenas checa se existem."""
@@ -776,19 +2081,7 @@ def _sheet_header(ws) -> list[str]:
     except Exception:
         return []
 
-def _align_df_to_ws_header(df: pd.DataFrame, ws) -> pd.DataFrame:
-    """Reordena/completa df conforme o cabeçalho REAL da aba."""
-    header = _sheet_header(ws)
-    if not header:
-        header = NEEDED_COLUMNS[:]  # fallback passivo (sem escrever nada no sheet)
-    out = df.copy()
-    for h in header:
-        if h not in out.columns:
-            out[h] = ""
-    out = out[header]
-    out = out.fillna("").astype(str)
-    return out
-
+@perfil.perfilado("sheets:ler UIDs")
 def _existing_uids(ws) -> set[str]:
     """UIDs existentes (coluna A, da linha 2 em diante)."""
     try:
@@ -799,6 +2092,7 @@ def _existing_uids(ws) -> set[str]:
         vals = ws.col_values(1)[1:]
         return set(v for v in vals if v)
 
+@perfil.perfilado("sheets:inserir")
 def _insert_rows_top(ws, rows: list[list], chunk_size: int = 500):
     """Insere as linhas na posição 2 preservando a ordem fornecida."""
     idx = 0
@@ -806,9 +2100,48 @@ def _insert_rows_top(ws, rows: list[list], chunk_size: int = 500):
         ws.insert_rows(rows[idx:idx+chunk_size], row=2, value_input_option="USER_ENTERED")
         idx += chunk_size
 
-def insert_dedupe_top(df: pd.DataFrame, sheet_name: str):
-    """Insere (não append) somente linhas novas (por UID) no TOPO (linha 2)."""
-    if df is None or df.empty:
+def _inserir_novos(ws, registros: list[Proposicao], sheet_name: str, classificar=None,
+                   exists: set[str] | None = None):
+    """Filtra por UID já existente na aba e insere o resto no topo, na ordem dada.
+
+    `classificar(sheet_name, header, novos)` (ver pipeline.py) devolve
+    ({uid: {coluna: valor}}, {uids a não inserir}); os valores entram nas
+    colunas que existirem no cabeçalho, no mesmo insert das linhas.
+    `exists`: UIDs da aba, quando quem chama já os leu.
+    """
+    if exists is None:
+        exists = _existing_uids(ws)
+    novos = [p for p in registros if p.uid not in exists]
+    if not novos:
+        print(f"[{sheet_name}] nada novo para inserir.")
+        return
+    header = _sheet_header(ws) or NEEDED_COLUMNS  # fallback passivo (sem escrever nada no sheet)
+    valores = {}
+    if classificar is not None:
+        valores, descartar = classificar(sheet_name, header, novos)
+        if descartar:
+            novos = [p for p in novos if p.uid not in descartar]
+            print(f"[{sheet_name}] {len(descartar)} linhas novas descartadas na classificação.")
+    rows = _linhas_no_header(novos, header)
+    if valores:
+        pos = {h: i for i, h in enumerate(header)}
+        for row, p in zip(rows, novos):
+            for col, v in valores.get(p.uid, {}).items():
+                if col in pos:
+                    row[pos[col]] = v
+    if not rows:
+        return
+    _insert_rows_top(ws, rows)
+    _UIDS_CONHECIDOS.update(p.uid for p in novos)
+    feed.publicar("insercao", sheet_name, {p.uid: dict(zip(header, row)) for p, row in zip(novos, rows)})
+    print(f"[{sheet_name}] inseridas {len(rows)} linhas novas no topo.")
+
+def insert_dedupe_top(registros: list[Proposicao], sheet_name: str):
+    """Insere (não append) somente linhas novas (por UID) no TOPO (linha 2).
+
+    `registros` já vem ordenado (ver _ordenar).
+    """
+    if not registros:
         print(f"[{sheet_name}] nenhum dado para enviar.")
         return
     if not SPREADSHEET_ID:
@@ -822,40 +2155,36 @@ def insert_dedupe_top(df: pd.DataFrame, sheet_name: str):
         print(f"[{sheet_name}] aba inexistente na planilha geral — pulando (não crio automaticamente).")
         return
 
-    df = _normalize_columns(df)
-    exists = _existing_uids(ws)
-    new_df = df[~df["UID"].isin(exists)].copy()
+    _inserir_novos(ws, registros, sheet_name)
 
-    if new_df.empty:
-        print(f"[{sheet_name}] nada novo para inserir.")
-        return
+def _por_cliente(registros: list[Proposicao]) -> dict[str, list[Proposicao]]:
+    """Uma passada só, preservando a ordem de `registros` dentro de cada cliente."""
+    out: dict[str, list[Proposicao]] = {c: [] for c in CLIENT_THEME}
+    for p in registros:
+        for c in p.lista_clientes():
+            if c in out:
+                out[c].append(p)
+    return out
 
-    new_df = new_df.sort_values(["Data Apresentação","UID"], ascending=[False, False]).reset_index(drop=True)
-    aligned = _align_df_to_ws_header(new_df, ws)
-    rows = aligned.values.tolist()
-    _insert_rows_top(ws, rows)
-    print(f"[{sheet_name}] inseridas {len(rows)} linhas novas no topo.")
+def insert_por_cliente_top(registros: list[Proposicao], classificar=None, preclassificar=None):
+    """Envio p/ SPREADSHEET_ID_CLIENTES, uma aba por cliente, inserindo no topo (linha 2).
 
-def insert_por_cliente_top(df_total: pd.DataFrame):
-    """Envio p/ SPREADSHEET_ID_CLIENTES, uma aba por cliente, inserindo no topo (linha 2)."""
+    `preclassificar({aba: (header, novos)})` (ver pipeline.py) recebe as
+    linhas novas de todas as abas antes do primeiro insert, para que uma
+    proposição que entra em várias abas seja classificada uma vez só.
+    """
     if not SPREADSHEET_ID_CLIENTES:
         print("SPREADSHEET_ID_CLIENTES não definido; pulando planilha por cliente.")
         return
 
-    if df_total is None or df_total.empty:
+    if not registros:
         print("[clientes] nada a enviar.")
         return
 
     sh = _open_sheet(SPREADSHEET_ID_CLIENTES)
-    df_total = _normalize_columns(df_total)
-
-    all_clients = list(CLIENT_THEME.keys())
-    for client in all_clients:
-        mask = df_total["Clientes"].str.contains(rf'(^|;\s*){re.escape(client)}(\s*;|$)', case=False, na=False)
-        sub = df_total[mask].copy()
-        sheet_name = client
-
-        if sub.empty:
+    abas = {}
+    for sheet_name, sub in _por_cliente(registros).items():
+        if not sub:
             print(f"[{sheet_name}] sem linhas novas hoje.")
             continue
 
@@ -865,19 +2194,571 @@ def insert_por_cliente_top(df_total: pd.DataFrame):
             print(f"[{sheet_name}] aba inexistente na planilha de clientes — pulando (não crio automaticamente).")
             continue
 
-        exists = _existing_uids(ws)
-        new_df = sub[~sub["UID"].isin(exists)].copy()
-        if new_df.empty:
-            print(f"[{sheet_name}] nada novo para inserir.")
+        exists = _existing_uids(ws) if preclassificar is not None else None
+        abas[sheet_name] = (ws, sub, exists)
+
+    if preclassificar is not None:
+        preclassificar({nome: (_sheet_header(ws) or NEEDED_COLUMNS,
+                               [p for p in sub if p.uid not in exists])
+                        for nome, (ws, sub, exists) in abas.items()})
+
+    for sheet_name, (ws, sub, exists) in abas.items():
+        _inserir_novos(ws, sub, sheet_name, classificar, exists)
+
+#                 ARQUIVO LOCAL (Parquet)
+# Cópia colunar de tudo o que é coletado, para análise histórica e re-matching
+# sem passar pela API do Sheets (lenta e com cota). Dataset particionado por
+# data de apresentação (dia=AAAA-MM-DD); cada run grava arquivos novos com nome
+# único e nunca reescreve partições existentes. Vazio em ARQUIVO_DIR desliga.
+ARQUIVO_DIR = os.getenv("ARQUIVO_DIR", "arquivo").strip()
+
+# colunas de baixa cardinalidade: gravadas com dictionary encoding
+_COLUNAS_DICIONARIO = (
+    "Casa Atual", "Sigla", "Ano",
+    "Autor Principal Partido", "Autor Principal UF", "Autor Principal Tipo",
+    "Clientes", "Temas",
+)
+
+def _particionamento():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([("dia", pa.string())]), flavor="hive")
+
+def _tabela_arrow(registros: list[Proposicao]):
+    import pyarrow as pa
+    cols = {}
+    for col, attr in _COLUNA_ATRIBUTO.items():
+        arr = pa.array([getattr(p, attr) for p in registros], type=pa.string())
+        cols[col] = arr.dictionary_encode() if col in _COLUNAS_DICIONARIO else arr
+    cols["dia"] = pa.array([p.data_apresentacao or "sem-data" for p in registros], type=pa.string())
+    return pa.table(cols)
+
+@perfil.perfilado("parquet:gravar")
+def arquivar_parquet(registros: list[Proposicao], base_dir: str = ARQUIVO_DIR) -> int:
+    """Acrescenta os registros do run ao dataset. Devolve quantos gravou."""
+    if not base_dir or not registros:
+        return 0
+    try:
+        import pyarrow.dataset as ds
+    except ImportError:
+        print("pyarrow não instalado; arquivo Parquet desligado.")
+        return 0
+    stamp = now_br().strftime("%Y%m%dT%H%M%S%f")
+    ds.write_dataset(
+        _tabela_arrow(registros), base_dir, format="parquet",
+        partitioning=_particionamento(),
+        basename_template=f"run-{stamp}-{{i}}.parquet",
+        # só acrescenta arquivos; os de runs anteriores ficam intocados
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return len(registros)
+
+def ler_arquivo(base_dir: str = ARQUIVO_DIR, colunas: list[str] | None = None,
+                desde: str | None = None) -> pd.DataFrame:
+    """Lê o dataset (opcionalmente só dias >= `desde`), um registro por UID.
+
+    Sem planilha configurada a pré-carga de UIDs não acontece e a mesma
+    proposição pode ser arquivada por mais de um run; fica a mais recente.
+    """
+    import pandas as pd
+    if not base_dir or not os.path.isdir(base_dir):
+        return pd.DataFrame(columns=colunas or NEEDED_COLUMNS)
+    import pyarrow.dataset as ds
+    # schema explícito: colunas criadas depois (ex.: Palavras Chave Inteiro
+    # Teor) vêm vazias dos arquivos antigos em vez de sumirem do dataset
+    dset = ds.dataset(base_dir, format="parquet", partitioning=_particionamento(),
+                      schema=_tabela_arrow([]).schema)
+    pedidas = None if colunas is None else list(dict.fromkeys(["UID", "Ingest At", *colunas]))
+    # "sem-data" ordena depois de qualquer dígito: fica de fora quando há corte
+    filtro = ((ds.field("dia") >= desde) & (ds.field("dia") != "sem-data")) if desde else None
+    df = dset.to_table(columns=pedidas, filter=filtro).to_pandas()
+    if "Palavras Chave Inteiro Teor" in df.columns:
+        df["Palavras Chave Inteiro Teor"] = df["Palavras Chave Inteiro Teor"].fillna("")
+    # estável: no mesmo segundo (cópia das abas e correção do re-match) vale a
+    # ordem dos arquivos, que é a de gravação
+    df = df.sort_values("Ingest At", kind="stable").drop_duplicates("UID", keep="last")
+    if colunas is not None:
+        df = df[colunas]
+    return df.reset_index(drop=True)
+
+#                 TRAMITAÇÃO (acompanhamento incremental)
+# Uma proposição era coletada uma vez, na apresentação, e nunca mais olhada.
+# Com TRAMITACAO=1, cada run pergunta às casas o que tramitou desde a última
+# verificação (Câmara: /proposicoes filtrado por data de tramitação; Senado:
+# /materia/atualizadas), cruza com os UIDs das abas de clientes e só busca o
+# detalhe do que de fato andou. O custo segue o volume de mudanças, não o
+# tamanho da lista acompanhada. As colunas abaixo só são escritas nas abas
+# que já as têm no cabeçalho (não altero cabeçalhos).
+TRAMITACAO = os.getenv("TRAMITACAO", "0").strip() in ("1","true","True","yes","on")
+COL_SITUACAO = os.getenv("COL_SITUACAO", "Situação")
+COL_ULTIMA_TRAMITACAO = os.getenv("COL_ULTIMA_TRAMITACAO", "Última Tramitação")
+COL_DATA_TRAMITACAO = os.getenv("COL_DATA_TRAMITACAO", "Data Última Tramitação")
+BASE_ATUALIZADAS_SF = "https://legis.senado.leg.br/dadosabertos/materia/atualizadas.json"
+
+
+def _achar(j, chave: str):
+    """Primeiro valor de `chave` em qualquer nível do JSON (os formatos do
+    Senado variam entre versões da API)."""
+    if isinstance(j, dict):
+        if chave in j:
+            return j[chave]
+        j = list(j.values())
+    if isinstance(j, list):
+        for v in j:
+            achado = _achar(v, chave)
+            if achado is not None:
+                return achado
+    return None
+
+
+def _todos(j, chave: str, out: list | None = None) -> list:
+    """Todos os valores de `chave`, em qualquer nível."""
+    out = [] if out is None else out
+    if isinstance(j, dict):
+        for k, v in j.items():
+            if k == chave and not isinstance(v, (dict, list)):
+                out.append(v)
+            else:
+                _todos(v, chave, out)
+    elif isinstance(j, list):
+        for v in j:
+            _todos(v, chave, out)
+    return out
+
+
+def _camara_movimentadas(desde: str) -> set[str]:
+    """UIDs da Câmara com tramitação entre `desde` e hoje."""
+    params = {"dataInicio": desde, "dataFim": today_iso(),
+              "ordem": "DESC", "ordenarPor": "id", "itens": 100, "pagina": 1}
+    out = set()
+    while True:
+        r = _get_default(BASE_CAMARA, params=params, timeout=60); r.raise_for_status()
+        j = r.json()
+        out.update(f"Camara:{d.get('id')}" for d in j.get("dados", []) if d.get("id"))
+        if not any(lk.get("rel") == "next" for lk in j.get("links", [])):
+            return out
+        params["pagina"] += 1
+        time.sleep(0.15)
+
+
+def _senado_movimentadas(desde: str) -> set[str]:
+    """UIDs do Senado atualizados desde `desde` (o endpoint aceita só N dias)."""
+    dias = (_base_date() - datetime.strptime(desde, "%Y-%m-%d").date()).days + 1
+    r = _get_senado(BASE_ATUALIZADAS_SF, params={"numdias": max(1, dias)}, timeout=60)
+    r.raise_for_status()
+    return {f"Senado:{c}" for c in _todos(r.json(), "CodigoMateria") if c}
+
+
+def _camara_situacao(pid: str) -> tuple[str, str, str]:
+    r = _get_default(f"{BASE_CAMARA}/{pid}", timeout=30); r.raise_for_status()
+    st = r.json().get("dados", {}).get("statusProposicao") or {}
+    orgao = st.get("siglaOrgao") or ""
+    tram = st.get("descricaoTramitacao") or ""
+    despacho = st.get("despacho") or ""
+    ultima = " — ".join(x for x in (f"{orgao}: {tram}" if orgao else tram, despacho) if x)
+    return st.get("descricaoSituacao") or "", ultima, _fmt_dt(st.get("dataHora"))
+
+
+def _senado_situacao(codigo: str) -> tuple[str, str, str]:
+    u = f"https://legis.senado.leg.br/dadosabertos/materia/situacaoatual/{codigo}.json"
+    r = _get_senado(u, timeout=30); r.raise_for_status()
+    j = r.json()
+    situacao = _achar(j, "DescricaoSituacao") or ""
+    local = _achar(j, "NomeLocal") or _achar(j, "SiglaLocal") or ""
+    data = _achar(j, "DataSituacao") or _achar(j, "DataAutuacao")
+    return situacao, (f"{local}: {situacao}" if local else situacao), _fmt_dt(data)
+
+
+def _uids_nas_abas(sh, nomes) -> dict[str, list]:
+    """Aba → (ws, header, {UID: nº da linha}), pulando as abas que não existem."""
+    out = {}
+    for nome in nomes:
+        try:
+            ws = sh.worksheet(nome)
+        except Exception:
+            continue
+        header = _sheet_header(ws)
+        rng = ws.batch_get(["A2:A"], value_render_option="UNFORMATTED_VALUE")
+        col = rng[0] if rng and rng[0] else []
+        linhas = {str(v[0]): i + 2 for i, v in enumerate(col) if v and v[0]}
+        out[nome] = (ws, header, linhas)
+    return out
+
+
+def _uids_nas_abas_clientes(sh) -> dict[str, list]:
+    return _uids_nas_abas(sh, CLIENT_THEME)
+
+
+@perfil.perfilado("sheets:atualizar")
+def _atualizar_celulas(abas: dict[str, list], valores: dict[str, dict[str, str]],
+                       evento: str = "atualizacao") -> dict[str, int]:
+    """Grava {UID: {coluna: valor}} nas linhas desses UIDs, um batch_update
+    por aba. Colunas fora do cabeçalho da aba são ignoradas. Devolve aba → nº
+    de linhas atualizadas. `evento`: tipo no feed de mudanças."""
+    from gspread.utils import rowcol_to_a1
+
+    out = {}
+    for aba, (ws, header, linhas) in abas.items():
+        updates, gravados = [], {}
+        for uid, cols in valores.items():
+            if uid not in linhas:
+                continue
+            cols = {c: v for c, v in cols.items() if c in header}
+            if cols:
+                updates += [{"range": rowcol_to_a1(linhas[uid], header.index(c) + 1), "values": [[v]]}
+                            for c, v in cols.items()]
+                gravados[uid] = cols
+        if updates:
+            ws.batch_update(updates, value_input_option="USER_ENTERED")
+            out[aba] = len(gravados)
+            feed.publicar(evento, aba, gravados)
+    return out
+
+
+@perfil.perfilado("tramitação")
+def acompanhar_tramitacao() -> None:
+    if not SPREADSHEET_ID_CLIENTES:
+        print("[tramitação] SPREADSHEET_ID_CLIENTES não definido; pulando.")
+        return
+
+    abas = _uids_nas_abas_clientes(_open_sheet(SPREADSHEET_ID_CLIENTES))
+    acompanhados = set().union(*(linhas for _, _, linhas in abas.values())) if abas else set()
+    if not acompanhados:
+        print("[tramitação] nenhuma proposição nas abas de clientes.")
+        return
+
+    ontem = (_base_date() - timedelta(days=1)).strftime("%Y-%m-%d")
+    situacoes: dict[str, tuple[str, str, str]] = {}
+    marcas: dict[str, str] = {}  # gravadas só depois das células (ver abaixo)
+    for casa, listar, detalhar in (("Camara", _camara_movimentadas, _camara_situacao),
+                                   ("Senado", _senado_movimentadas, _senado_situacao)):
+        desde = _estado_ler(f"tramitacao:{casa}", ontem)
+        try:
+            movidas = listar(desde) & acompanhados
+        except Exception as e:
+            # marca d'água não anda: o próximo run cobre este intervalo
+            print(f"[tramitação/{casa}] listagem falhou: {type(e).__name__}: {e}")
+            continue
+        falhas = 0
+        for uid in sorted(movidas):
+            if _parar():
+                falhas += 1  # o resto fica para o próximo run
+                print(f"[tramitação/{casa}] prazo do run; parando.")
+                break
+            try:
+                situacoes[uid] = detalhar(uid.split(":", 1)[1])
+            except PrazoEsgotado:
+                falhas += 1
+                print(f"[tramitação/{casa}] prazo do run; parando.")
+                break
+            except Exception as e:
+                falhas += 1
+                print(f"[tramitação/{casa}] {uid}: {type(e).__name__}: {e}")
+        print(f"[tramitação/{casa}] desde {desde}: {len(movidas)} acompanhadas andaram.")
+        if not falhas:
+            marcas[f"tramitacao:{casa}"] = today_iso()
+
+    colunas = (COL_SITUACAO, COL_ULTIMA_TRAMITACAO, COL_DATA_TRAMITACAO)
+    valores = {uid: dict(zip(colunas, s)) for uid, s in situacoes.items()}
+    for aba, n in _atualizar_celulas(abas, valores).items():
+        print(f"[{aba}] tramitação atualizada em {n} linhas.")
+    # se um batch_update levantou, a marca d'água não anda e o próximo run
+    # busca de novo as mesmas mudanças (regravar a mesma situação é inócuo)
+    for chave, valor in marcas.items():
+        _estado_gravar(chave, valor)
+
+#                 RE-MATCH (quando CLIENT_THEME_DATA muda)
+# Palavra-chave ou cliente novo só valia para as linhas futuras. Agora cada run
+# compara a configuração com a impressão digital gravada no run anterior e,
+# se mudou, aplica só a diferença ao histórico: os padrões acrescentados rodam
+# sobre as ementas guardadas (arquivo Parquet ou uma leitura das abas gerais)
+# e os removidos são resolvidos pelas "Palavras Chave" já gravadas, sem regex.
+# Saem inclusões e remoções por cliente; inclusões vão para as abas, remoções
+# só com REMATCH_REMOVER=1 (apagam linhas, junto com a classificação).
+# As inclusões entram no topo da aba, como as linhas novas de um run, e passam
+# pelo mesmo `classificar` do pipeline: a aba fica na ordem de chegada, não na
+# de apresentação. Sem o pipeline (monitor avulso) ficam sem classificação até
+# a varredura do alinhamento (PIPELINE_VARREDURA_HORAS).
+# O arquivo Parquet só serve de histórico quando cobre o histórico: tem o
+# marcador _cobertura.json, gravado depois de uma carga das abas gerais. Sem ele
+# (arquivo novo ou cache perdido, e aí só há o que os últimos runs coletaram)
+# as abas gerais são lidas e copiadas para o arquivo. A configuração
+# (kw:config) só avança quando o histórico lido estava completo, e depois que
+# as linhas corrigidas (Palavras Chave, Clientes, Temas) voltam ao arquivo e às
+# abas gerais: o diff seguinte compara com o que o re-match deixou.
+# KW_REMATCH=0 desliga; REMATCH_FONTE: "auto", "arquivo" ou "planilha".
+KW_REMATCH = os.getenv("KW_REMATCH", "1").strip() in ("1","true","True","yes","on")
+REMATCH_FONTE = os.getenv("REMATCH_FONTE", "auto").strip().lower()
+REMATCH_REMOVER = os.getenv("REMATCH_REMOVER", "0").strip() in ("1","true","True","yes","on")
+
+
+def _kw_chave(cliente: str, tema: str, kw: str) -> str:
+    return f"{cliente}|{tema}|{_normalize_ws(kw)}"
+
+
+def _kw_config(client_theme: dict) -> set[str]:
+    return {_kw_chave(c, t, kw) for c, temas in client_theme.items()
+            for t, kws in temas.items() for kw in kws if _kw_tokens(kw)}
+
+
+_ARQUIVO_COBERTURA = "_cobertura.json"  # prefixo "_": o pyarrow não lê como dado
+
+
+def _arquivo_cobre_historico(base_dir: str = ARQUIVO_DIR) -> bool:
+    return bool(base_dir) and os.path.exists(os.path.join(base_dir, _ARQUIVO_COBERTURA))
+
+
+def _semear_arquivo(historico: list[Proposicao], base_dir: str = ARQUIVO_DIR) -> None:
+    """Copia o histórico das abas gerais para o arquivo e marca a cobertura."""
+    if not base_dir:
+        return
+    try:
+        if not arquivar_parquet(historico, base_dir):
+            return
+        with open(os.path.join(base_dir, _ARQUIVO_COBERTURA), "w", encoding="utf-8") as f:
+            json.dump({"desde": now_br().isoformat(), "linhas": len(historico)}, f)
+        print(f"[re-match] {len(historico)} linhas das abas gerais copiadas para {base_dir}/; "
+              f"os próximos re-matches leem o arquivo.")
+    except Exception as e:
+        # o arquivo continua sem o marcador: o próximo re-match lê as abas de novo
+        print(f"[re-match] não deu para copiar o histórico para o arquivo ({type(e).__name__}: {e}).")
+
+
+def _historico_para_rematch() -> tuple[list[Proposicao], bool]:
+    """Linhas já gravadas e se elas são o histórico inteiro: do arquivo
+    Parquet quando ele cobre o histórico, senão das abas gerais."""
+    if REMATCH_FONTE in ("auto", "arquivo"):
+        cobre = _arquivo_cobre_historico()
+        if cobre or REMATCH_FONTE == "arquivo":
+            if not cobre:
+                print(f"::warning::[re-match] {ARQUIVO_DIR}/ sem {_ARQUIVO_COBERTURA}: o histórico "
+                      f"pode estar incompleto, e a mudança de palavras-chave será refeita no próximo run.")
+            df = ler_arquivo()
+            cols = list(_COLUNA_ATRIBUTO.items())
+            return [Proposicao(**{a: _s(v) for (_, a), v in zip(cols, linha)})
+                    for linha in df[[c for c, _ in cols]].itertuples(index=False)], cobre
+    if not SPREADSHEET_ID:
+        return [], False
+    sh = _open_sheet(SPREADSHEET_ID)
+    out = []
+    for aba in (SHEET_SENADO, SHEET_CAMARA):
+        valores = sh.worksheet(aba).get_all_values()  # uma leitura por aba
+        if not valores:
+            continue
+        header = [h.strip() for h in valores[0]]
+        pos = {c: header.index(c) for c in _COLUNA_ATRIBUTO if c in header}
+        for linha in valores[1:]:
+            out.append(Proposicao(**{a: (linha[pos[c]] if c in pos and pos[c] < len(linha) else "")
+                                     for c, a in _COLUNA_ATRIBUTO.items()}))
+    if REMATCH_FONTE == "auto":
+        _semear_arquivo(out)  # antes do _rematch, que altera os registros
+    return out, True
+
+
+@lru_cache(maxsize=8)
+def _compilar_padroes(padroes: tuple) -> list:
+    return [(re.compile(pat), kw) for pat, kw in padroes]
+
+
+def _kws_presentes(padroes: tuple, texto: str) -> list[str]:
+    """Palavras-chave de `padroes` ((regex, kw), ...) presentes no texto."""
+    nt = _normalize_ws(texto)
+    return [kw for pat, kw in _compilar_padroes(padroes) if pat.search(nt)]
+
+
+def _rematch(historico: list[Proposicao], adicionadas: set[str], removidas: set[str]):
+    """Aplica o diff de configuração. Devolve ({cliente: [registros a incluir]},
+    {cliente: {uids a remover}}, [registros alterados]); os registros
+    devolvidos já vêm corrigidos."""
+    novos_pats = [e for e in _kw_patterns() if _kw_chave(e[1], e[2], e[3]) in adicionadas]
+    kws_removidas = {k.split("|", 2)[2] for k in removidas}
+    # palavra-chave normalizada → pares (cliente, tema) na configuração nova
+    pares_por_kw: dict[str, set[tuple[str, str]]] = {}
+    originais: dict[str, str] = {}
+    for _, c, t, kw in _kw_patterns():
+        pares_por_kw.setdefault(_normalize_ws(kw), set()).add((c, t))
+        originais.setdefault(_normalize_ws(kw), kw)
+
+    incluir: dict[str, list[Proposicao]] = {}
+    remover: dict[str, set[str]] = {}
+    alterados: list[Proposicao] = []
+    achados = (_mapear_cpu(partial(_kws_presentes, tuple((pat.pattern, kw) for pat, _, _, kw in novos_pats)),
+                           [p.ementa for p in historico])
+               if novos_pats else [[]] * len(historico))
+    for p, novos_kws in zip(historico, achados):
+        kws = [k for k in p.palavras_chave.split("; ") if k]
+        kws_it = [k for k in p.palavras_chave_inteiro_teor.split("; ") if k]
+        norm = {_normalize_ws(k) for k in kws + kws_it}
+        if not novos_kws and not (norm & kws_removidas):
+            continue  # linha fora do diff: nada a refazer
+        norm |= {_normalize_ws(k) for k in novos_kws}
+        norm = {k for k in norm if k in pares_por_kw}
+        pares = set().union(*(pares_por_kw[k] for k in norm)) if norm else set()
+        antes, depois = set(p.lista_clientes()), {c for c, _ in pares}
+        gravado = (p.palavras_chave, p.clientes, p.temas)
+        p.palavras_chave = "; ".join(dict.fromkeys(
+            [k for k in kws if _normalize_ws(k) in norm] + novos_kws))
+        p.clientes = "; ".join(sorted(depois))
+        p.temas = "; ".join(sorted({t for _, t in pares}))
+        if (p.palavras_chave, p.clientes, p.temas) != gravado:
+            alterados.append(p)
+        for c in depois - antes:
+            incluir.setdefault(c, []).append(p)
+        for c in antes - depois:
+            remover.setdefault(c, set()).add(p.uid)
+    return incluir, remover, alterados
+
+
+def _gravar_rematch(alterados: list[Proposicao]) -> None:
+    """Devolve ao histórico (arquivo Parquet e abas gerais) as Palavras Chave,
+    Clientes e Temas corrigidos: o próximo diff parte deles, e não dos de
+    antes (uma palavra-chave acrescentada e depois removida precisa constar
+    nas linhas em que entrou)."""
+    if not alterados:
+        return
+    # Ingest At novo: ler_arquivo fica com a linha mais recente de cada UID
+    agora = _fmt_dt(now_br())
+    arquivar_parquet([replace(p, ingest_at=agora) for p in alterados])
+    if not SPREADSHEET_ID:
+        return
+    abas = _uids_nas_abas(_open_sheet(SPREADSHEET_ID), (SHEET_SENADO, SHEET_CAMARA))
+    valores = {p.uid: {"Palavras Chave": p.palavras_chave, "Clientes": p.clientes, "Temas": p.temas}
+               for p in alterados}
+    for aba, n in _atualizar_celulas(abas, valores).items():
+        print(f"[{aba}] re-match: Palavras Chave/Clientes/Temas atualizados em {n} linhas.")
+
+
+@perfil.perfilado("sheets:remover")
+def _remover_das_abas(sh, remover: dict[str, set[str]]) -> None:
+    """Uma chamada batch_update para todas as remoções, de baixo para cima."""
+    pedidos, removidas = [], {}
+    for cliente, uids in remover.items():
+        try:
+            ws = sh.worksheet(cliente)
+        except Exception:
             continue
+        rng = ws.batch_get(["A2:A"], value_render_option="UNFORMATTED_VALUE")
+        col = rng[0] if rng and rng[0] else []
+        achadas = {i + 2: str(v[0]) for i, v in enumerate(col) if v and str(v[0]) in uids}
+        pedidos += [{"deleteDimension": {"range": {
+            "sheetId": ws.id, "dimension": "ROWS", "startIndex": n - 1, "endIndex": n}}}
+            for n in sorted(achadas, reverse=True)]
+        removidas[cliente] = {uid: {} for uid in achadas.values()}
+        print(f"[{cliente}] {len(achadas)} linhas removidas pelo re-match.")
+    if pedidos:
+        sh.batch_update({"requests": pedidos})
+        for cliente, uids in removidas.items():
+            feed.publicar("remocao", cliente, uids)
+
+
+@perfil.perfilado("re-match")
+def rematch_se_mudou(classificar=None) -> None:
+    """`classificar`: o hook do pipeline, o mesmo das linhas novas (ver _inserir_novos)."""
+    atual = _kw_config(CLIENT_THEME)
+    anterior = _estado_ler("kw:config")
+    if anterior is None:
+        _estado_gravar("kw:config", sorted(atual))  # primeira vez: só registra
+        return
+    anterior = set(anterior)
+    adicionadas, removidas = atual - anterior, anterior - atual
+    if not adicionadas and not removidas:
+        return
+    print(f"[re-match] configuração mudou: {len(adicionadas)} padrões novos, "
+          f"{len(removidas)} removidos.")
+    historico, completo = _historico_para_rematch()
+    incluir, remover, alterados = _rematch(historico, adicionadas, removidas)
+    print(f"[re-match] {len(historico)} linhas no histórico{'' if completo else ' (parcial)'}; inclusões: "
+          + (", ".join(f"{c}={len(v)}" for c, v in sorted(incluir.items())) or "nenhuma")
+          + "; remoções: "
+          + (", ".join(f"{c}={len(v)}" for c, v in sorted(remover.items())) or "nenhuma"))
+
+    if SPREADSHEET_ID_CLIENTES and (incluir or (remover and REMATCH_REMOVER)):
+        sh = _open_sheet(SPREADSHEET_ID_CLIENTES)
+        for cliente, regs in sorted(incluir.items()):
+            try:
+                ws = sh.worksheet(cliente)
+            except Exception:
+                print(f"[{cliente}] aba inexistente na planilha de clientes — pulando (não crio automaticamente).")
+                continue
+            _inserir_novos(ws, _ordenar(regs), cliente, classificar)
+        if remover and REMATCH_REMOVER:
+            _remover_das_abas(sh, remover)
+    if remover and not REMATCH_REMOVER:
+        print("[re-match] remoções só listadas; REMATCH_REMOVER=1 para aplicar.")
+    _gravar_rematch(alterados)  # antes de kw:config andar
+    if completo:
+        _estado_gravar("kw:config", sorted(atual))
+
+#                 ENRIQUECIMENTO PENDENTE
+# Linhas gravadas sem o opcional porque o run anterior chegou perto do prazo
+# (ver PRAZO_RUN_MIN). O primeiro run com folga busca o que faltou e atualiza
+# só essas células, nas abas gerais e nas de clientes.
+_AUTORIA_COLUNA = {
+    "ap_nome": "Autor Principal", "ap_partido": "Autor Principal Partido",
+    "ap_uf": "Autor Principal UF", "ap_tipo": "Autor Principal Tipo",
+    "coautores": "Coautores", "qtd_coaut": "Qtd Coautores",
+}
+
+
+def _completar(uid: str, falta: list[str]) -> dict[str, str]:
+    """Colunas → valores que faltavam para `uid` (vazios não sobrescrevem)."""
+    casa, cod = uid.split(":", 1)
+    out = {}
+    if "autoria" in falta:
+        if casa == "Camara":
+            autores = _autores_camara_completo(int(cod))
+        else:
+            autor_page = _senado_primeira_autoria_da_pagina(cod)
+            autores = _autoria_senado([], [], [], autor_page) if autor_page else {}
+        out.update({_AUTORIA_COLUNA[k]: v for k, v in autores.items() if v})
+    if "inteiro_teor" in falta:
+        it_url, _ = (_camara_inteiro_teor(int(cod)) if casa == "Camara"
+                     else _senado_inteiro_teor(cod))
+        if it_url:
+            out["Inteiro Teor URL"] = it_url
+    return out
+
+
+@perfil.perfilado("enriquecimento pendente")
+def completar_enriquecimento() -> None:
+    pendentes: dict[str, list[str]] = _estado_ler("enriquecimento:pendentes", {}) or {}
+    if not pendentes:
+        return
+    valores, feitos = {}, []
+    for uid, falta in pendentes.items():
+        if _degradado():
+            break
+        try:
+            valores[uid] = _completar(uid, falta)
+        except PrazoEsgotado:
+            break  # grava o que já foi completado
+        except Exception as e:
+            print(f"[enriquecimento] {uid}: {type(e).__name__}: {e}")
+            continue
+        if _degradado():
+            break  # as chamadas podem ter sido cortadas pelo prazo; refaz depois
+        feitos.append(uid)
+    valores = {uid: v for uid, v in valores.items() if uid in feitos and v}
+
+    for sid, nomes in ((SPREADSHEET_ID, [SHEET_SENADO, SHEET_CAMARA]),
+                       (SPREADSHEET_ID_CLIENTES, list(CLIENT_THEME))):
+        if sid and valores:
+            for aba, n in _atualizar_celulas(_uids_nas_abas(_open_sheet(sid), nomes), valores).items():
+                print(f"[{aba}] enriquecimento completado em {n} linhas.")
+    restantes = {uid: f for uid, f in pendentes.items() if uid not in feitos}
+    _estado_gravar("enriquecimento:pendentes", restantes)
+    print(f"[enriquecimento] {len(feitos)} pendentes completadas; {len(restantes)} ficam para depois.")
 
-        new_df = new_df.sort_values(["Data Apresentação","UID"], ascending=[False, False]).reset_index(drop=True)
-        aligned = _align_df_to_ws_header(new_df, ws)
-        rows = aligned.values.tolist()
-        _insert_rows_top(ws, rows)
-        print(f"[{sheet_name}] inseridas {len(rows)} linhas novas no topo.")
 
 #                        MAIN
+# No modo serviço os UIDs ficam em memória entre os ciclos (cada insert os
+# acrescenta) e a planilha só é relida a cada UIDS_RECARGA_HORAS, para pegar
+# linhas apagadas à mão. 0 (padrão do script avulso) relê sempre.
+UIDS_RECARGA_HORAS = float(os.getenv("UIDS_RECARGA_HORAS", "0"))
+_UIDS_CARREGADOS_EM: float | None = None
+
+
+@perfil.perfilado("sheets:pré-carga de UIDs")
 def _preload_uids():
     """Carrega os UIDs já gravados antes de raspar.
 
@@ -885,41 +2766,121 @@ def _preload_uids():
     Sem esta pré-carga, cada uma delas gastaria de novo as chamadas de autoria e
     de inteiro teor antes de ser descartada na deduplicação.
     """
+    global _UIDS_CARREGADOS_EM
     if not SPREADSHEET_ID:
         return
+    if (_UIDS_CARREGADOS_EM is not None and UIDS_RECARGA_HORAS > 0
+            and time.monotonic() - _UIDS_CARREGADOS_EM < UIDS_RECARGA_HORAS * 3600):
+        return
     try:
         sh = _open_sheet(SPREADSHEET_ID)
+        lidos, completo = set(), True
         for aba in (SHEET_SENADO, SHEET_CAMARA):
             try:
-                _UIDS_CONHECIDOS.update(_existing_uids(sh.worksheet(aba)))
+                lidos.update(_existing_uids(sh.worksheet(aba)))
             except Exception as e:
+                completo = False
                 print(f"[{aba}] não deu para ler os UIDs existentes: {e}")
+        if completo:
+            _UIDS_CONHECIDOS.clear()
+            _UIDS_CARREGADOS_EM = time.monotonic()
+        _UIDS_CONHECIDOS.update(lidos)
         print(f"{len(_UIDS_CONHECIDOS)} proposições já gravadas serão puladas.")
     except Exception as e:
         # sem a pré-carga o run continua: só fica mais lento, não fica errado
         print(f"Pré-carga de UIDs falhou ({e}); seguindo sem ela.")
 
 
-def _coleta_isolada(nome: str, fn):
+def _iniciar_run() -> None:
+    """Zera o que é de um run só. No script avulso é o estado inicial; no modo
+    serviço, cada ciclo começa sem sobras de um ciclo que caiu no meio."""
+    global _INICIO_RUN, _POOL_FALHOU
+    _INICIO_RUN = time.monotonic()
+    _POOL_FALHOU = False
+    _ESTADO_APOS_GRAVAR.clear()
+    _PENDENTES_ENRIQ.clear()
+    for cont in (_HTTP_CONT, _ORIGEM_CONT):
+        for k in cont:
+            cont[k] = 0
+
+
+def _coleta_isolada(nome: str, casa: str, fn):
     """
     Roda a coleta de uma casa sem deixar a queda da API dela derrubar a outra.
     As APIs do Congresso caem em horários diferentes, e antes disso um
     ConnectTimeout na Câmara jogava fora a coleta do Senado que já tinha dado
-    certo. Devolve (df, ok).
+    certo. Devolve (registros, ok, marca): `marca` é o último dia coberto por
+    blocos sem falha, ou None. Um bloco que falha interrompe os seguintes,
+    para a marca nunca pular um buraco. O prazo do run também interrompe, mas
+    não é falha: as linhas completas seguem e a marca fica no último bloco.
+    """
+    inicio, fim = _janela(casa)
+    print(f"[{nome}] janela {inicio:%Y-%m-%d} a {fim:%Y-%m-%d}"
+          + (" (backfill)" if _DATA_OVERRIDE else ""))
+    registros, marca = [], None
+    for a, b in _blocos(inicio, fim):
+        if _parar():
+            print(f"::warning::[{nome}] prazo do run: a coleta a partir de "
+                  f"{a:%Y-%m-%d} fica para o próximo run.")
+            break
+        try:
+            registros += fn(a, b)
+        except PrazoEsgotado as e:
+            registros += e.registros
+            print(f"::warning::[{nome}] prazo do run: bloco {a:%Y-%m-%d} a {b:%Y-%m-%d} "
+                  f"interrompido com {len(e.registros)} linhas completas; o resto fica "
+                  f"para o próximo run.")
+            break
+        except Exception as e:
+            print(f"[{nome}] coleta falhou ({a:%Y-%m-%d} a {b:%Y-%m-%d}): {type(e).__name__}: {e}")
+            return registros, False, marca
+        marca = b
+    return registros, True, marca
+
+
+def _gravar_marcas(marcas: dict[str, date | None]) -> None:
+    """Avança a marca de cada casa (e o resto de _ESTADO_APOS_GRAVAR).
+    Só depois que as linhas foram gravadas."""
+    if _PENDENTES_ENRIQ:
+        pend = _estado_ler("enriquecimento:pendentes", {}) or {}
+        for uid, falta in _PENDENTES_ENRIQ.items():
+            pend[uid] = sorted(set(pend.get(uid, [])) | falta)
+        _ESTADO_APOS_GRAVAR["enriquecimento:pendentes"] = pend
+        _PENDENTES_ENRIQ.clear()
+    # backfill de um dia não diz nada sobre os dias seguintes
+    for casa, marca in marcas.items():
+        if marca is not None and not _DATA_OVERRIDE:
+            _estado_gravar(f"coleta:{casa}", f"{marca:%Y-%m-%d}")
+    for chave, valor in _ESTADO_APOS_GRAVAR.items():
+        _estado_gravar(chave, valor)
+    _ESTADO_APOS_GRAVAR.clear()
+
+
+def main(classificar=None, preclassificar=None):
+    """`classificar`/`preclassificar`: hooks do pipeline.py para classificar
+    as linhas novas das abas de clientes no próprio insert (ver
+    insert_por_cliente_top e _inserir_novos).
+
+    Devolve o resumo da coleta ({"Senado": {"linhas", "ok"}, "Camara": ...}),
+    usado pelas métricas do daemon.py.
     """
     try:
-        return fn(), True
-    except Exception as e:
-        print(f"[{nome}] coleta falhou: {type(e).__name__}: {e}")
-        return pd.DataFrame(), False
+        return _executar(classificar, preclassificar)
+    finally:
+        _log_http_cache()
 
 
-def main():
-    print(f"Janela consultada: {inicio_iso()} a {today_iso()}"
-          + (" (backfill)" if _DATA_OVERRIDE else ""))
+@perfil.perfilado("monitor:run")
+def _executar(classificar, preclassificar):
+    _iniciar_run()
     _preload_uids()
-    senado, ok_senado = _coleta_isolada("Senado", senado_df_hoje)
-    camara, ok_camara = _coleta_isolada("Câmara", camara_df_hoje)
+    senado, ok_senado, marca_senado = _coleta_isolada("Senado", "Senado", senado_registros)
+    camara, ok_camara, marca_camara = _coleta_isolada("Câmara", "Camara", _camara_coleta)
+    # o próximo ciclo (modo serviço) já acha estas no índice de autoria do Senado
+    _indexar_camara(camara)
+    marcas = {"Senado": marca_senado, "Camara": marca_camara}
+    resumo = {"Senado": {"linhas": len(senado), "ok": ok_senado},
+              "Camara": {"linhas": len(camara), "ok": ok_camara}}
 
     if not ok_senado and not ok_camara:
         # nada coletado: é falha de verdade, o run tem que ficar vermelho
@@ -931,9 +2892,30 @@ def main():
         # para o passo de alinhamento ainda rodar sobre o que foi gravado
         caiu = "Senado" if not ok_senado else "Câmara"
         print(f"::warning::Coleta parcial: a API do {caiu} não respondeu. "
-              f"O run seguinte cobre a janela, que é de {_JANELA_DIAS} dias.")
+              f"O run seguinte retoma da última coleta completa.")
 
     print(f"Senado: {len(senado)} linhas | Câmara: {len(camara)} linhas")
+    # ordenação única do run; as abas recebem fatias que preservam a ordem
+    todos = _ordenar(senado + camara)
+
+    try:
+        if INTEIRO_TEOR_MATCH and _degradado():
+            print("[inteiro teor] perto do prazo do run; match no texto completo pulado.")
+        else:
+            enriquecer_inteiro_teor(todos)
+    except PrazoEsgotado:
+        print("[inteiro teor] prazo do run; match no texto completo interrompido.")
+    except Exception as e:
+        # opcional: sem ele as linhas seguem só com o match da ementa
+        print(f"Match no inteiro teor falhou ({type(e).__name__}: {e}); seguindo.")
+
+    try:
+        n = arquivar_parquet(todos)
+        if n:
+            print(f"Arquivo Parquet: {n} linhas acrescentadas em {ARQUIVO_DIR}/.")
+    except Exception as e:
+        # o arquivo é auxiliar: se falhar, o envio ao Sheets segue normalmente
+        print(f"Arquivo Parquet falhou ({type(e).__name__}: {e}); seguindo.")
 
     # Checa existência das abas (não cria / não altera cabeçalho)
     if SPREADSHEET_ID:
@@ -943,25 +2925,49 @@ def main():
 
     if not SPREADSHEET_ID and not SPREADSHEET_ID_CLIENTES:
         stamp = today_compact()
-        senado.to_csv(f"senado_{stamp}.csv", index=False)
-        camara.to_csv(f"camara_{stamp}.csv", index=False)
+        registros_para_df([p for p in todos if p.casa == "Senado"]).to_csv(f"senado_{stamp}.csv", index=False)
+        registros_para_df([p for p in todos if p.casa == "Camara"]).to_csv(f"camara_{stamp}.csv", index=False)
         print("Sem IDs de planilha; arquivos CSV salvos.")
-        return
+        _gravar_marcas(marcas)
+        return resumo
 
     # 1) Planilha geral — INSERÇÃO NO TOPO
     if SPREADSHEET_ID:
-        insert_dedupe_top(senado, SHEET_SENADO)
-        insert_dedupe_top(camara, SHEET_CAMARA)
+        insert_dedupe_top([p for p in todos if p.casa == "Senado"], SHEET_SENADO)
+        insert_dedupe_top([p for p in todos if p.casa == "Camara"], SHEET_CAMARA)
 
     # 2) Planilha por cliente (Câmara + Senado combinados) — INSERÇÃO NO TOPO
     if SPREADSHEET_ID_CLIENTES:
-        if senado is None or senado.empty:
-            total = camara.copy()
-        elif camara is None or camara.empty:
-            total = senado.copy()
-        else:
-            total = pd.concat([senado, camara], ignore_index=True)
-        insert_por_cliente_top(total)
+        insert_por_cliente_top(todos, classificar, preclassificar)
+
+    _gravar_marcas(marcas)
+
+    if _parar():
+        print("::warning::Prazo do run: re-match, tramitação e enriquecimento "
+              "pendente ficam para o próximo run.")
+        return resumo
+
+    # 3) Histórico, quando as palavras-chave mudaram desde o último run
+    if KW_REMATCH:
+        try:
+            rematch_se_mudou(classificar)
+        except (Exception, PrazoEsgotado) as e:
+            print(f"[re-match] falhou ({type(e).__name__}: {e}); tenta de novo no próximo run.")
+
+    # 4) Tramitação do que já está nas abas de clientes (opcional)
+    if TRAMITACAO:
+        try:
+            acompanhar_tramitacao()
+        except (Exception, PrazoEsgotado) as e:
+            print(f"[tramitação] falhou ({type(e).__name__}: {e}); a coleta já foi gravada.")
+
+    # 5) O que ficou sem autoria/inteiro teor num run que bateu no prazo
+    if not _degradado():
+        try:
+            completar_enriquecimento()
+        except (Exception, PrazoEsgotado) as e:
+            print(f"[enriquecimento] falhou ({type(e).__name__}: {e}); tenta de novo no próximo run.")
+    return resumo
 
 if __name__ == "__main__":
     main()
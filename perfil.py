@@ -0,0 +1,160 @@
+"""Perfil de um run: onde foi o tempo, por etapa.
+
+O log do run só tem contagens, e quando um run fica lento não dá para saber
+quanto foi listagem, enriquecimento, parse de HTML, match de palavras-chave,
+montagem de linhas/DataFrame ou escrita no Sheets. Com PERFIL=1 as etapas
+principais do monitor_legislativo.py e do alinhamento.py viram trechos
+nomeados (`trecho()`/`perfilado()`), e cada run grava em PERFIL_DIR um
+<hora>.trace.json no formato Chrome trace. O arquivo abre em ui.perfetto.dev
+ou em chrome://tracing, com uma linha por thread. O log traz os trechos que
+mais somaram tempo. PERFIL=amostras também liga um amostrador que, a cada
+PERFIL_AMOSTRA_MS, guarda a pilha de cada thread. O resultado vai para
+<hora>.folded (pilhas colapsadas, para flamegraph.pl ou speedscope), em tempo
+de parede: espera de rede aparece.
+
+Desligado (padrão), `perfilado` devolve a própria função e `trecho` um
+contexto vazio compartilhado, então não há custo mensurável. Processos do pool
+(PROCESSOS) não são perfilados; no pai aparece o trecho que espera por eles.
+"""
+import atexit
+import collections
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+PERFIL = os.getenv("PERFIL", "0").strip().lower()
+PERFIL = "" if PERFIL in ("", "0", "false", "no", "off") else PERFIL
+PERFIL_DIR = os.getenv("PERFIL_DIR", ".cache/perfil").strip()
+PERFIL_AMOSTRA_MS = float(os.getenv("PERFIL_AMOSTRA_MS", "10"))
+
+_T0 = time.perf_counter_ns()
+_NADA = contextlib.nullcontext()
+_EVENTOS: list = []  # (nome, início ns, duração ns, thread, args)
+_THREADS: dict[int, str] = {}  # as de listagem já terminaram quando o trace é gravado
+_PILHAS: collections.Counter = collections.Counter()
+_AMOSTRADOR: threading.Thread | None = None
+_PARAR = threading.Event()
+
+
+class _Trecho:
+    __slots__ = ("nome", "args", "t0")
+
+    def __init__(self, nome: str, args: dict):
+        self.nome, self.args = nome, args
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter_ns()
+        if PERFIL:
+            tid = threading.get_ident()
+            if tid not in _THREADS:
+                _THREADS[tid] = threading.current_thread().name
+            _EVENTOS.append((self.nome, self.t0, t1 - self.t0, tid, self.args))
+        return False
+
+
+def trecho(nome: str, **args):
+    """`with trecho("senado:lista", janela=...)`: um intervalo na linha do tempo."""
+    return _Trecho(nome, args) if PERFIL else _NADA
+
+
+def perfilado(nome: str):
+    """Decorador: a função inteira vira um trecho `nome`. Desligado, devolve a função."""
+    def decorar(fn):
+        if not PERFIL:
+            return fn
+
+        @functools.wraps(fn)
+        def medida(*a, **kw):
+            with _Trecho(nome, {}):
+                return fn(*a, **kw)
+        return medida
+    return decorar
+
+
+def desligar() -> None:
+    """Nos processos do pool (ver _iniciar_processo): o que medirem não seria gravado."""
+    global PERFIL
+    PERFIL = ""
+    _PARAR.set()
+
+
+def _amostrar() -> None:
+    eu = threading.get_ident()
+    while not _PARAR.wait(PERFIL_AMOSTRA_MS / 1000):
+        nomes = {t.ident: t.name for t in threading.enumerate()}
+        for tid, frame in sys._current_frames().items():
+            if tid == eu:
+                continue
+            pilha = []
+            while frame is not None:
+                co = frame.f_code
+                pilha.append(f"{co.co_name} ({os.path.basename(co.co_filename)}:{co.co_firstlineno})")
+                frame = frame.f_back
+            pilha.append(nomes.get(tid, str(tid)))
+            _PILHAS[";".join(reversed(pilha))] += 1
+
+
+def _iniciar() -> None:
+    global _AMOSTRADOR
+    if PERFIL == "amostras" and _AMOSTRADOR is None:
+        _AMOSTRADOR = threading.Thread(target=_amostrar, name="perfil", daemon=True)
+        _AMOSTRADOR.start()
+    atexit.register(gravar)
+
+
+def _trace(eventos: list) -> dict:
+    pid = os.getpid()
+    out = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+            "args": {"name": _THREADS.get(tid, f"thread {tid}")}}
+           for tid in {e[3] for e in eventos}]
+    out += [{"name": nome, "ph": "X", "pid": pid, "tid": tid,
+             "ts": (t0 - _T0) / 1000, "dur": dur / 1000, "args": args}
+            for nome, t0, dur, tid, args in eventos]
+    return {"traceEvents": out, "displayTimeUnit": "ms"}
+
+
+def gravar() -> None:
+    """Grava (e zera) o que foi medido desde a última gravação: uma por run.
+    O daemon.py chama a cada ciclo; nos scripts avulsos vai no atexit."""
+    global _EVENTOS
+    if not PERFIL:
+        return
+    eventos, _EVENTOS = _EVENTOS, []
+    pilhas = dict(_PILHAS)
+    _PILHAS.clear()
+    if not eventos and not pilhas:
+        return
+    try:
+        os.makedirs(PERFIL_DIR, exist_ok=True)
+        base = os.path.join(PERFIL_DIR, datetime.now().strftime("%Y%m%dT%H%M%S"))
+        with open(base + ".trace.json", "w", encoding="utf-8") as f:
+            json.dump(_trace(eventos), f, ensure_ascii=False)
+        if pilhas:
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                f.writelines(f"{p} {n}\n" for p, n in sorted(pilhas.items()))
+    except Exception as e:
+        print(f"::warning::Perfil não gravado ({type(e).__name__}: {e}).")
+        return
+
+    soma: dict[str, list] = {}
+    for nome, _, dur, _, _ in eventos:
+        s = soma.setdefault(nome, [0, 0])
+        s[0] += dur
+        s[1] += 1
+    print(f"[perfil] {len(eventos)} trechos em {base}.trace.json"
+          + (f"; {sum(pilhas.values())} amostras em {base}.folded" if pilhas else "") + ".")
+    for nome, (dur, n) in sorted(soma.items(), key=lambda x: -x[1][0])[:15]:
+        print(f"[perfil]   {nome:<32} {dur / 1e9:8.2f}s  {n:6d}x")
+
+
+if PERFIL:
+    _iniciar()
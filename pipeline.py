@@ -0,0 +1,21 @@
+"""Coleta e alinhamento num processo só.
+
+Antes o workflow rodava monitor_legislativo.py e depois alinhamento.py, que
+se autenticava de novo e relia cada aba de cliente inteira só para achar as
+linhas que o coletor tinha acabado de inserir. Aqui o coletor entrega as
+linhas novas de cada aba ao alinhamento em memória e a classificação vai no
+mesmo insert. Releitura de abas só para o que sobrar (PIPELINE_BACKLOG).
+"""
+import alinhamento
+import monitor_legislativo
+
+
+def main():
+    resumo = monitor_legislativo.main(classificar=alinhamento.classificar_novos,
+                                      preclassificar=alinhamento.preclassificar_novos)
+    alinhamento.processar_backlog()
+    return resumo
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Re-match do histórico em duas mudanças seguidas de configuração.
+
+Sem Sheets: o histórico vem do arquivo Parquet (REMATCH_FONTE=arquivo) num
+diretório temporário, e as inclusões/remoções são lidas do que _rematch
+devolve.
+
+    python -m pytest -q test_rematch.py
+"""
+import pytest
+
+import monitor_legislativo as ml
+
+pytest.importorskip("pyarrow")
+
+
+def _registro(uid: str, ementa: str, kws: str, clientes: str, temas: str) -> ml.Proposicao:
+    return ml.Proposicao(
+        uid=uid, casa="Senado", sigla="PL", numero=uid.split(":")[1], ano="2025",
+        data_apresentacao="2025-03-10", ementa=ementa, palavras_chave=kws, clientes=clientes,
+        temas=temas, autor_principal="Autor", autor_partido="PX", autor_uf="DF",
+        autor_tipo="Parlamentar", coautores="", qtd_coautores="0",
+        link_pagina="", inteiro_teor_url="", ingest_at="2025-03-10 10:00:00",
+    )
+
+
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    # ARQUIVO_DIR ("arquivo") e ESTADO_PATH são relativos ao diretório do run
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ml, "ESTADO_PATH", str(tmp_path / "estado.json"))
+    monkeypatch.setattr(ml, "REMATCH_FONTE", "arquivo")
+    monkeypatch.setattr(ml, "SPREADSHEET_ID", "")
+    monkeypatch.setattr(ml, "SPREADSHEET_ID_CLIENTES", "")
+    monkeypatch.setattr(ml, "_KW_PATTERNS", None)
+    monkeypatch.setattr(ml.feed, "FEED_DIR", "")
+
+    diffs = []
+    original = ml._rematch
+
+    def espiar(*a):
+        diffs.append(original(*a))
+        return diffs[-1]
+
+    monkeypatch.setattr(ml, "_rematch", espiar)
+
+    def configurar(client_theme):
+        monkeypatch.setattr(ml, "CLIENT_THEME", client_theme)
+        monkeypatch.setattr(ml, "_KW_PATTERNS", None)
+
+    return configurar, diffs
+
+
+def test_palavra_chave_acrescentada_e_depois_removida(ambiente):
+    configurar, diffs = ambiente
+    sem_x = {"C": {"Saúde": ["hospital"]}}
+    com_x = {"C": {"Saúde": ["hospital", "vacina"]}}
+    ml._semear_arquivo([
+        _registro("Senado:1", "Dispõe sobre hospital universitário.", "hospital", "C", "Saúde"),
+        _registro("Senado:2", "Institui o calendário nacional de vacina.", "", "", ""),
+    ])
+
+    configurar(sem_x)
+    ml.rematch_se_mudou()  # primeira vez: só registra a configuração
+
+    configurar(com_x)
+    ml.rematch_se_mudou()
+    incluir, remover = diffs[-1][:2]
+    assert [p.uid for p in incluir["C"]] == ["Senado:2"]
+    assert not remover
+    arquivo = ml.ler_arquivo().set_index("UID")
+    assert arquivo.at["Senado:2", "Palavras Chave"] == "vacina"
+    assert arquivo.at["Senado:2", "Clientes"] == "C"
+
+    configurar(sem_x)
+    ml.rematch_se_mudou()
+    incluir, remover = diffs[-1][:2]
+    assert not incluir
+    assert remover == {"C": {"Senado:2"}}
+    arquivo = ml.ler_arquivo().set_index("UID")
+    assert arquivo.at["Senado:2", "Palavras Chave"] == ""
+    assert arquivo.at["Senado:2", "Clientes"] == ""
+    assert arquivo.at["Senado:1", "Clientes"] == "C"
+    assert ml._estado_ler("kw:config") == sorted(ml._kw_config(sem_x))
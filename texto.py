@@ -0,0 +1,22 @@
+"""Normalização de texto compartilhada entre o coletor e o alinhamento.
+
+O match de palavras-chave (monitor_legislativo.py) e as assinaturas de
+ementas quase iguais (alinhamento.py) precisam ver o mesmo texto: sem
+acentos, em minúsculas e, em `normalize_ws`, só com letras, dígitos e um
+espaço entre as palavras. Mudar a regra aqui muda as assinaturas já gravadas
+em ALIGN_SIMILARES_DIR, que deixam de bater com as novas.
+"""
+import re
+import unicodedata
+
+
+def normalize(text: str) -> str:
+    if text is None: return ""
+    t = unicodedata.normalize("NFD", str(text))
+    t = "".join(c for c in t if unicodedata.category(c) != "Mn")
+    return t.lower().strip()
+
+
+def normalize_ws(s: str) -> str:
+    s = normalize(s)
+    return re.sub(r'[^a-z0-9]+', ' ', s).strip()